@@ -0,0 +1,74 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Thumbnail decode benchmark.
+
+Compares the old thumbnail path (full decode + ImageOps.scale) with
+octopydash.thumbnails.decode for large slicer style PNGs and a JPEG.
+
+Run from the repository root: python extras/bench_thumbnails.py
+"""
+import sys
+import timeit
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageOps
+
+sys.path.insert(0, '.')
+from octopydash.thumbnails import decode
+
+def slicer_png(size):
+    # slicer thumbnails are mostly flat background with a shaded model, RGBA
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for i in range(0, size // 2, 4):
+        c = 80 + (i * 160) // size
+        draw.ellipse((size // 4 + i // 2, size // 4 + i // 2, size - size // 4 - i // 2, size - size // 4 - i // 2), fill=(c, c // 2, 255 - c, 255))
+    noise = Image.effect_noise((size, size), 20).convert('L')
+    img.putalpha(Image.composite(img.getchannel('A'), noise, img.getchannel('A')))
+    out = BytesIO()
+    img.save(out, 'PNG')
+    return out.getvalue()
+
+def jpeg(size):
+    img = Image.effect_mandelbrot((size, size), (-2, -1.5, 1, 1.5), 100).convert('RGB')
+    out = BytesIO()
+    img.save(out, 'JPEG', quality=90)
+    return out.getvalue()
+
+def old(data, width, height):
+    img = Image.open(BytesIO(data))
+    return ImageOps.scale(img, min(width / img.width, height / img.height))
+
+def main():
+    samples = [
+        ('png 400x400', slicer_png(400)),
+        ('png 1200x1200', slicer_png(1200)),
+        ('png 2400x2400', slicer_png(2400)),
+        ('jpeg 1920x1920', jpeg(1920)),
+    ]
+    targets = [(80, 80), (400, 380)]
+
+    print(f'{"sample":<16} {"target":>8} {"old ms":>8} {"new ms":>8} {"speedup":>8}')
+    for name, data in samples:
+        for w, h in targets:
+            n = 5
+            t_old = timeit.timeit(lambda: old(data, w, h), number=n) / n * 1000
+            t_new = timeit.timeit(lambda: decode(data, w, h), number=n) / n * 1000
+            print(f'{name:<16} {w:>4}x{h:<3} {t_old:>8.1f} {t_new:>8.1f} {t_old / t_new:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Subscription churn check.
+
+Creates and destroys many short lived subscribers on an OctoSocket and
+a PrinterState, the way dialogs and per printer widgets do, and checks
+that the number of callbacks, the dispatch time and the memory in use
+go back to where they started. Three kinds of subscriber are churned:
+weak bound methods that are simply dropped, strong callbacks whose
+handle is cancelled, and Tk frames that are destroyed (skipped when
+there is no display).
+
+Run from the repository root: python extras/churn_subscriptions.py
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, '.')
+from octopydash.octosocket import OctoSocket
+from octopydash.state import PrinterState
+
+ROUNDS = 20
+PER_ROUND = 500
+
+class Subscriber:
+    def __init__(self, socket, state):
+        self.calls = 0
+        # payload keeps each subscriber big enough for a leak to show
+        self.payload = bytearray(1024)
+        socket.add_callback('current', self.on_current, weak=True)
+        state.subscribe(('flags',), self.on_state, weak=True)
+
+    def on_current(self, data):
+        self.calls += 1
+
+    def on_state(self, state, changed):
+        self.calls += 1
+
+def callback_count(socket, state):
+    return sum(len(cbs) for cbs in socket._callbacks.values()) + len(state._subscribers)
+
+def dispatch_time(socket, n=2000):
+    msg = {'state': {'text': 'Operational', 'flags': {'operational': True}}}
+    start = time.perf_counter()
+    for _ in range(n): socket._dispatch_message('current', msg)
+    return (time.perf_counter() - start) / n * 1e6
+
+def churn_weak(socket, state):
+    for _ in range(PER_ROUND): Subscriber(socket, state)
+
+def churn_cancelled(socket, state):
+    subs = []
+    for _ in range(PER_ROUND):
+        payload = bytearray(1024)
+        subs.append(socket.add_callback('current', lambda data, p=payload: None))
+        subs.append(state.subscribe(('flags',), lambda s, c, p=payload: None))
+    for sub in subs: sub.cancel()
+
+def churn_tk(socket, state, root):
+    import tkinter as tk
+    for _ in range(PER_ROUND // 10):
+        frame = tk.Frame(root)
+        payload = bytearray(1024)
+        socket.add_callback('current', lambda data, p=payload: None).bind_to(frame)
+        state.subscribe(('flags',), lambda s, c, p=payload: None).bind_to(frame)
+        frame.destroy()
+    root.update()
+
+def main():
+    socket = OctoSocket('http://localhost')
+    state = PrinterState('churn', socket)
+    socket.add_callback('current', state.apply_current)
+
+    root = None
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as e:
+        print(f'no display, skipping Tk churn ({e})')
+
+    tracemalloc.start()
+    gc.collect()
+    base_count = callback_count(socket, state)
+    base_time = dispatch_time(socket)
+    base_mem = tracemalloc.get_traced_memory()[0]
+
+    print(f'{"round":>5} {"callbacks":>10} {"dispatch us":>12} {"memory KB":>10}')
+    print(f'{"start":>5} {base_count:>10} {base_time:>12.1f} {base_mem / 1024:>10.0f}')
+    for i in range(ROUNDS):
+        churn_weak(socket, state)
+        churn_cancelled(socket, state)
+        if root is not None: churn_tk(socket, state, root)
+        gc.collect()
+        count = callback_count(socket, state)
+        mem = tracemalloc.get_traced_memory()[0]
+        if (i + 1) % 5 == 0: print(f'{i + 1:>5} {count:>10} {dispatch_time(socket):>12.1f} {mem / 1024:>10.0f}')
+
+    count = callback_count(socket, state)
+    growth = tracemalloc.get_traced_memory()[0] - base_mem
+    # one round leaking would be at least PER_ROUND KB
+    ok = count == base_count and growth < PER_ROUND * 1024
+    print(f'callbacks {base_count} -> {count}, memory growth {growth / 1024:.0f} KB: {"OK" if ok else "LEAK"}')
+    if root is not None: root.destroy()
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+A stand-in MJPEG webcam server for testing the webcam view.
+
+Serves a generated 1280x720 stream at /?action=stream and a single
+frame at /?action=snapshot, like mjpg-streamer.
+
+Usage: python extras/mjpeg_server.py [port] [fps]
+"""
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+def frame(n, size=(1280, 720)):
+    img = Image.new('RGB', size, (20, 20, 40))
+    draw = ImageDraw.Draw(img)
+    x = (n * 8) % size[0]
+    draw.rectangle((x, size[1] // 3, x + 120, size[1] // 3 * 2), fill=(255, 204, 102))
+    draw.text((20, 20), f'frame {n}  {time.strftime("%H:%M:%S")}', fill=(255, 255, 255))
+    out = BytesIO()
+    img.save(out, 'JPEG', quality=80)
+    return out.getvalue()
+
+class Handler(BaseHTTPRequestHandler):
+    fps = 15
+
+    def do_GET(self):
+        if 'snapshot' in self.path:
+            data = frame(int(time.time() * self.fps))
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        self.end_headers()
+        n = 0
+        try:
+            while True:
+                data = frame(n)
+                self.wfile.write(b'--frame\r\nContent-Type: image/jpeg\r\n')
+                self.wfile.write(f'Content-Length: {len(data)}\r\n\r\n'.encode())
+                self.wfile.write(data + b'\r\n')
+                n += 1
+                time.sleep(1 / self.fps)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    Handler.fps = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+    print(f'Serving on http://localhost:{port}/?action=stream')
+    ThreadingHTTPServer(('', port), Handler).serve_forever()
@@ -0,0 +1,87 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Offscreen dashboard check.
+
+Runs the offscreen dashboard against fake OctoPrint servers (see
+soak.py) with a recording sink, then reports how often it pushed, how
+much of the screen each push covered and the shortest time between
+pushes, which must not be under the minimum interval. The last image is
+saved so it can be looked at.
+
+Run from the repository root: python extras/offscreen_check.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from soak import FakeOctoPrint
+from octopydash.laststate import LastStateStore
+from octopydash.offscreen import OffscreenDashboard, RecordingSink
+from octopydash.printer import Printer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--printers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--speed', type=float, default=600, help='simulated seconds per second')
+    parser.add_argument('--interval', type=float, default=2.0, help='minimum seconds between pushes')
+    parser.add_argument('--size', default='1024x600')
+    parser.add_argument('--out', default='offscreen.png', help='where the last image is saved')
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split('x'))
+
+    fakes = [FakeOctoPrint(f'Printer {i + 1}', args.speed, seed=i) for i in range(args.printers)]
+    for fake in fakes: fake.start()
+    printers = [Printer(fake.name, fake.url, 'CHECKAPIKEY') for fake in fakes]
+
+    # start from a snapshot, as after a restart
+    last_state = LastStateStore(tempfile.mkdtemp(prefix='octopydash-last-'), interval=5)
+    for p in printers: last_state.attach(p)
+
+    sink = RecordingSink()
+    dash = OffscreenDashboard(printers, sink, size[0], size[1], args.interval, last_state)
+    dash.start()
+    for p in printers: p.socket.connect()
+    time.sleep(args.seconds)
+    for p in printers: p.socket.close()
+    # before the fakes go, a socket that loses its server reconnects forever
+    for p in printers: p.socket.thread.join(10)
+    dash.close()
+    last_state.close()
+    for fake in fakes: fake.stop()
+
+    total = size[0] * size[1]
+    pushes = sink.pushes[1:]
+    areas = [sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects) / total for (t, rects) in pushes]
+    gaps = [b[0] - a[0] for (a, b) in zip(sink.pushes, sink.pushes[1:])]
+    print(f'pushes after the first: {len(pushes)}')
+    if pushes:
+        print(f'screen pushed per update: mean {sum(areas) / len(areas):.1%}, max {max(areas):.1%}')
+        print(f'rectangles per update: mean {sum(len(rects) for (t, rects) in pushes) / len(pushes):.1f}')
+        print(f'shortest time between pushes: {min(gaps):.2f}s (minimum {args.interval}s)')
+    sink.image.save(args.out)
+    print(f'last image saved to {args.out}')
+    ok = bool(pushes) and min(gaps) >= args.interval * 0.99
+    print('OK' if ok else 'FAIL')
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
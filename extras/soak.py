@@ -0,0 +1,703 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Soak test for memory, Tk object and thread growth.
+
+Runs the real printer pipeline and widgets (PrinterStatus,
+PSUControlPower, CurrentJob, FileList, Terminal) against local fake
+OctoPrint servers for a long time, at accelerated speed:
+
+ - each fake printer goes through days of idle time, print jobs (some
+   cancelled) and nights with the PSU off, sending 'current' messages
+   with terminal lines many times faster than OctoPrint would
+ - the websocket is dropped every so often, and now and then a server
+   goes away completely for a while, tripping the client's breaker
+ - file browser and terminal sessions are opened, paged, browsed into
+   folders and closed, loading thumbnails and G-code previews
+
+Process RSS, the Python heap (tracemalloc), Tk widgets, images, fonts
+and pending afters, threads and open files are sampled over time. After
+a warm up the growth of each is checked against a limit, and the run
+fails (exit code 1) if any is over, listing the allocation sites that
+grew the most.
+
+The widgets need an X display. Without one, Xvfb is started if it is
+installed. --headless runs only the socket and REST pipeline.
+
+Run from the repository root, ie. for two simulated weeks in about half
+an hour: python extras/soak.py --duration 1800 --speed 672
+"""
+import argparse
+import base64
+import csv
+import gc
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, '.')
+from octopydash.printer import Printer
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+def make_files(name, folders=3, per_folder=30):
+    # a root folder of files and a few sub folders, every 5th file without a thumbnail
+    def entry(path, i):
+        info = {
+            'name': path.split('/')[-1],
+            'display': path.split('/')[-1],
+            'path': path,
+            'origin': 'local',
+            'type': 'machinecode',
+            'typePath': ['machinecode', 'gcode'],
+            'size': 20000 + i,
+            'date': 1660000000 + i,
+            'prints': {'success': i % 3, 'failure': int(i % 4 == 0), 'last': {'success': i % 4 != 0}},
+            'gcodeAnalysis': {'printingArea': {'minX': 0, 'minY': 0, 'minZ': 0, 'maxX': 40, 'maxY': 40, 'maxZ': 10}},
+        }
+        if i % 5: info['thumbnail'] = f'plugin/soak/thumbnail/{path[:-6]}.png?{info["date"]}'
+        return info
+
+    root = [entry(f'{name.lower()}_part{i:02}.gcode', i) for i in range(per_folder)]
+    for f in range(folders):
+        children = [entry(f'folder{f}/part{i:02}.gcode', f * 100 + i) for i in range(per_folder)]
+        root.append({'name': f'folder{f}', 'display': f'folder{f}', 'path': f'folder{f}', 'origin': 'local', 'type': 'folder', 'typePath': ['folder'], 'children': children})
+    return root
+
+def make_thumbnail(path, size=300):
+    n = int(hashlib.md5(path.encode()).hexdigest()[:6], 16)
+    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size // 5, size // 5, size - size // 5, size - size // 5), fill=(n & 255, (n >> 8) & 255, (n >> 16) & 255, 255))
+    out = BytesIO()
+    img.save(out, 'PNG')
+    return out.getvalue()
+
+def make_gcode(path, layers=20):
+    n = int(hashlib.md5(path.encode()).hexdigest()[:2], 16) % 10 + 10
+    lines = ['; generated by extras/soak.py', 'G28', 'G90', 'M82']
+    e = 0.0
+    for layer in range(layers):
+        lines.append(f'G1 Z{0.2 * (layer + 1):.2f} F600')
+        for (x, y) in ((5, 5), (5 + n, 5), (5 + n, 5 + n), (5, 5 + n), (5, 5)):
+            e += 0.5
+            lines.append(f'G1 X{x} Y{y} E{e:.3f} F1800')
+    return ('\n'.join(lines) + '\n').encode()
+
+class Simulation:
+    """
+    A printer's days, at accelerated speed.
+
+    The printer idles, prints a random file now and then (some prints
+    are cancelled) and has its PSU turned off at night. The state moves
+    forward whenever it is read.
+    """
+
+    def __init__(self, files, speed, seed):
+        self.speed = speed
+        self.start_time = 8 * 3600.0
+        self.sim_time = self.start_time
+        self.psu_on = True
+        self.printing = False
+        self.job = None
+        self._files = files
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+        self._next_job = self.sim_time + self._rng.uniform(600, 2400)
+        self._job_start = 0
+        self._job_length = 1
+        self._job_end = 1
+        self._line = 0
+
+    @property
+    def days(self):
+        return (self.sim_time - self.start_time) / 86400
+
+    def _advance(self):
+        now = time.monotonic()
+        self.sim_time += (now - self._last) * self.speed
+        self._last = now
+        hour = self.sim_time / 3600 % 24
+        night = hour >= 22 or hour < 6
+
+        if self.printing:
+            if self.sim_time - self._job_start >= self._job_length * self._job_end:
+                self.printing = False
+                self._next_job = self.sim_time + self._rng.uniform(600, 2400)
+        elif night and self.psu_on:
+            self.psu_on = False
+        elif not night and not self.psu_on:
+            self.psu_on = True
+            self._next_job = self.sim_time + self._rng.uniform(600, 2400)
+        elif self.psu_on and self.sim_time >= self._next_job:
+            self.job = self._rng.choice(self._files)
+            self.printing = True
+            self._job_start = self.sim_time
+            self._job_length = self._rng.uniform(1800, 4 * 3600)
+            self._job_end = self._rng.uniform(0.1, 0.9) if self._rng.random() < 0.1 else 1.0
+
+    def current(self):
+        """Return a 'current' message for the state as of now."""
+        with self._lock:
+            self._advance()
+            on = self.psu_on
+            flags = {
+                'operational': on, 'ready': on and not self.printing, 'printing': self.printing,
+                'paused': False, 'pausing': False, 'cancelling': False, 'finishing': False,
+                'closedOrError': not on, 'error': False, 'sdReady': False,
+            }
+            text = 'Printing' if self.printing else 'Operational' if on else 'Offline'
+            if self.job is not None:
+                file = {k: self.job[k] for k in ('name', 'display', 'path', 'origin', 'size', 'date')}
+            else:
+                file = {'name': None, 'display': None, 'path': None, 'origin': None, 'size': None, 'date': None}
+            if self.printing:
+                elapsed = self.sim_time - self._job_start
+                progress = {'completion': min(elapsed / self._job_length, 1) * 100, 'printTime': int(elapsed), 'printTimeLeft': int(self._job_length - elapsed), 'filepos': None}
+            else:
+                progress = {'completion': None, 'printTime': None, 'printTimeLeft': None, 'filepos': None}
+            logs = []
+            if on:
+                for _ in range(3):
+                    self._line += 1
+                    logs.append('Send: M105')
+                    logs.append(f'Recv: ok T:{200 + self._line % 5}.0 /210.0 B:{60 + self._line % 3}.0 /60.0')
+                    if self.printing: logs.append(f'Send: N{self._line} G1 X{self._line % 200} Y{self._line % 180} E{self._line * 0.01:.2f}*{self._line % 97}')
+            return {
+                'state': {'text': text, 'flags': flags},
+                'job': {'file': file, 'estimatedPrintTime': None},
+                'progress': progress,
+                'currentZ': None,
+                'offsets': {},
+                'temps': [],
+                'logs': logs,
+                'messages': [],
+                'busyFiles': [],
+            }
+
+class WebSocket:
+    """Just enough of a websocket server connection for OctoSocket."""
+
+    def __init__(self, sock, rfile):
+        self._sock = sock
+        self._rfile = rfile
+        self._lock = threading.Lock()
+        self.closed = threading.Event()
+
+    def _send(self, opcode, payload):
+        n = len(payload)
+        if n < 126: head = struct.pack('!BB', 0x80 | opcode, n)
+        elif n < 65536: head = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else: head = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        with self._lock: self._sock.sendall(head + payload)
+
+    def send_text(self, text):
+        self._send(0x1, text.encode())
+
+    def send_messages(self, messages):
+        # SockJS framing, an array of messages prefixed with 'a'
+        self.send_text('a' + json.dumps(messages))
+
+    def read_loop(self):
+        # client messages (auth, subscribe, throttle) are read and ignored
+        try:
+            while True:
+                head = self._rfile.read(2)
+                if len(head) < 2: break
+                opcode = head[0] & 0x0f
+                n = head[1] & 0x7f
+                if n == 126: n = struct.unpack('!H', self._rfile.read(2))[0]
+                elif n == 127: n = struct.unpack('!Q', self._rfile.read(8))[0]
+                mask = self._rfile.read(4) if head[1] & 0x80 else b'\0\0\0\0'
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._rfile.read(n)))
+                if opcode == 0x8: break
+                if opcode == 0x9: self._send(0xA, payload)
+        except (OSError, ValueError):
+            pass
+        self.closed.set()
+
+    def close(self, code=1000):
+        try:
+            if not self.closed.is_set(): self._send(0x8, struct.pack('!H', code))
+        except OSError:
+            pass
+        self.closed.wait(2)
+
+class Handler(BaseHTTPRequestHandler):
+    # websockets only accepts an HTTP/1.1 handshake
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', content_type='application/json'):
+        if isinstance(body, (dict, list)): body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(n) if n else b''
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(url.path)
+        if path.endswith('/websocket') and self.headers.get('Upgrade', '').lower() == 'websocket': return self._websocket()
+        fake.requests += 1
+
+        if path == '/api/version': return self._reply(200, {'api': '0.1', 'server': '1.9.0', 'text': 'OctoPrint 1.9.0'})
+        if path == '/api/settings': return self._reply(200, {'webcam': {'webcamEnabled': False}})
+        if path == '/api/files/local': return self._reply(200, {'files': fake.files, 'free': 10**10, 'total': 10**11})
+        if path.startswith('/api/files/local/'):
+            info = fake.lookup(path[len('/api/files/local/'):])
+            return self._reply(200, info) if info is not None else self._reply(404)
+        if path.startswith('/plugin/soak/thumbnail/'):
+            return self._reply(200, fake.thumbnail(path[len('/plugin/soak/thumbnail/'):]), 'image/png')
+        if path.startswith('/downloads/files/local/'):
+            # Range is ignored, like some proxies do
+            return self._reply(200, fake.gcode(path[len('/downloads/files/local/'):]), 'text/plain')
+        self._reply(404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        fake.requests += 1
+        self._body()
+        path = urllib.parse.urlsplit(self.path).path
+        if path == '/api/login': return self._reply(200, {'name': 'soak', 'session': 'soak-session', 'active': True})
+        if path == '/api/plugin/psucontrol': return self._reply(200, {'isPSUOn': fake.sim.psu_on})
+        self._reply(204)
+
+    def do_DELETE(self):
+        self.server.fake.requests += 1
+        self._reply(204)
+
+    def _websocket(self):
+        fake = self.server.fake
+        key = self.headers['Sec-WebSocket-Key']
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        ws = WebSocket(self.connection, self.rfile)
+        threading.Thread(target=ws.read_loop, name='fake-ws-read', daemon=True).start()
+        fake.connections += 1
+        drop_at = time.monotonic() + fake.drop_interval * random.uniform(0.5, 1.5)
+        heartbeat = time.monotonic()
+        psu = None
+        try:
+            ws.send_text('o')
+            ws.send_messages([{'connected': {'version': '1.9.0', 'display_version': '1.9.0', 'branch': 'master', 'plugin_hash': 'soak', 'config_hash': 'soak', 'safe_mode': False}}])
+            ws.send_messages([{'history': fake.sim.current()}])
+            while not ws.closed.is_set() and not fake.stopping.is_set() and time.monotonic() < drop_at:
+                messages = [{'current': fake.sim.current()}]
+                if fake.sim.psu_on != psu:
+                    psu = fake.sim.psu_on
+                    messages.append({'plugin': {'plugin': 'psucontrol', 'data': {'isPSUOn': psu}}})
+                ws.send_messages(messages)
+                if time.monotonic() - heartbeat > 25:
+                    ws.send_text('h')
+                    heartbeat = time.monotonic()
+                time.sleep(fake.tick)
+            ws.close()
+        except OSError:
+            pass
+
+class FakeOctoPrint:
+    """
+    A local stand-in for an OctoPrint server.
+
+    Serves the REST calls OctoPyDash makes, thumbnails, G-code and a
+    SockJS websocket fed from a Simulation. The websocket is dropped
+    about every `drop_interval` seconds, and `stop`/`start` take the
+    whole server away and bring it back on the same port.
+    """
+
+    def __init__(self, name, speed, tick=0.1, drop_interval=60, seed=0):
+        self.name = name
+        self.files = make_files(name)
+        self.sim = Simulation([f for f in self._walk(self.files)], speed, seed)
+        self.tick = tick
+        self.drop_interval = drop_interval
+        self.stopping = threading.Event()
+        self.connections = 0
+        self.requests = 0
+        self.port = None
+        self._server = None
+        self._thumbnails = {}
+        self._gcode = {}
+
+    def _walk(self, files):
+        for f in files:
+            if f['type'] == 'folder': yield from self._walk(f['children'])
+            else: yield f
+
+    def lookup(self, path):
+        path = path.strip('/')
+        for f in self.files:
+            if f['path'] == path: return f
+            if f['type'] == 'folder':
+                for c in f['children']:
+                    if c['path'] == path: return c
+        return None
+
+    def thumbnail(self, path):
+        if path not in self._thumbnails: self._thumbnails[path] = make_thumbnail(path)
+        return self._thumbnails[path]
+
+    def gcode(self, path):
+        if path not in self._gcode: self._gcode[path] = make_gcode(path)
+        return self._gcode[path]
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        self.stopping.clear()
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port or 0), Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name=f'fake-{self.name}', daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f: return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # peak rather than current, still shows growth
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def open_files():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return 0
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(c) for c in widget.winfo_children())
+
+def start_xvfb(width, height):
+    """Start Xvfb on a free display and point DISPLAY at it, returns the process."""
+    if shutil.which('Xvfb') is None: return None
+    for n in range(99, 140):
+        if not os.path.exists(f'/tmp/.X11-unix/X{n}') and not os.path.exists(f'/tmp/.X{n}-lock'): break
+    proc = subprocess.Popen(['Xvfb', f':{n}', '-screen', '0', f'{width}x{height}x24', '-nolisten', 'tcp'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(50):
+        if os.path.exists(f'/tmp/.X11-unix/X{n}'): break
+        time.sleep(0.1)
+    os.environ['DISPLAY'] = f':{n}'
+    return proc
+
+class Soak:
+    """Drives the printers and widgets, samples resource use and checks growth."""
+
+    COLORS = ('#88ccff', '#ffcc66', '#cc99cc', '#99cc99')
+
+    def __init__(self, args):
+        self.args = args
+        self.log = logging.getLogger('soak')
+        self.fakes = [FakeOctoPrint(f'Soak {chr(65 + i)}', args.speed, args.tick, args.drop_interval, seed=i) for i in range(args.printers)]
+        for fake in self.fakes: fake.start()
+        self.printers = [Printer(fake.name, fake.url, 'SOAKAPIKEY') for fake in self.fakes]
+        self.connected = [0] * len(self.printers)
+        for i, p in enumerate(self.printers):
+            p.socket.add_callback('connected', lambda data, i=i: self._count_connect(i))
+        self.samples = []
+        self.baseline = None
+        self.snapshot = None
+        self.root = None
+        self.jobs = []
+        self._rng = random.Random(1)
+        self._start = None
+        self._outage = None
+        self._session = 0
+
+    def _count_connect(self, i):
+        self.connected[i] += 1
+
+    def build(self):
+        import tkinter as tk
+        from octopydash.thumbnails import ThumbnailLoader
+        from octopydash.widgets import PrinterStatus, Frame, PSUControlPower, CurrentJob
+
+        self.root = tk.Tk()
+        width, height = self.args.width, self.args.height
+        self.root.geometry(f'{width}x{height}+0+0')
+        self.root['bg'] = '#000000'
+        self.root.update()
+        # keep rendered previews out of the real cache
+        self.preview_dir = tempfile.mkdtemp(prefix='octopydash-soak-')
+        ThumbnailLoader._shared[self.root] = ThumbnailLoader(self.root, preview_dir=self.preview_dir)
+
+        col = width / len(self.printers)
+        for i, p in enumerate(self.printers):
+            color = self.COLORS[i % len(self.COLORS)]
+            x = col * i
+            Frame(self.root, col - 4, height, 'right', color=color).place(x=x, y=0)
+            PrinterStatus(self.root, p, 40, color=color).place(x=x + 20, y=0)
+            PSUControlPower(self.root, p, 80).place(x=x + 20, y=height - 80)
+            job = CurrentJob(self.root, p, col - 32, height - 140, color=color)
+            job.show_command = lambda job=job, x=x: job.place(x=x + 10, y=50)
+            job.hide_command = lambda job=job: job.place_forget()
+            self.jobs.append(job)
+
+    def _fit(self, toplevel):
+        # fullscreen needs a window manager, Xvfb doesn't have one
+        toplevel.geometry(f'{self.args.width}x{self.args.height}+0+0')
+
+    def file_session(self, job):
+        from octopydash.widgets.files import FileList
+        if not job.files.enabled: return
+        if job._file_list is None:
+            job._file_list = FileList(job, job.printer)
+            self._fit(job._file_list)
+        files = job._file_list
+        folder = self._rng.randrange(3)
+        steps = [
+            lambda: job.on_files_click(None),
+            lambda: files.on_down(None),
+            lambda: files.goto_path('local', f'folder{folder}'),
+            lambda: files.on_down(None),
+            lambda: files.on_back(None),
+            lambda: files.hide(),
+        ]
+        self._run_steps(steps)
+
+    def terminal_session(self, job):
+        from octopydash.widgets.terminal import Terminal
+        if not job.term.enabled: return
+        if job._terminal is None:
+            job._terminal = Terminal(job, job.printer)
+            self._fit(job._terminal)
+        terminal = job._terminal
+        steps = [
+            lambda: job.on_term_click(None),
+            lambda: terminal.on_filter('temp'),
+            lambda: terminal.on_filter('temp'),
+            lambda: terminal.hide(),
+        ]
+        self._run_steps(steps)
+
+    def _run_steps(self, steps, delay=1500):
+        def step(i):
+            try:
+                steps[i]()
+            except Exception:
+                self.log.exception('Session step failed')
+            if i + 1 < len(steps): self.root.after(delay, step, i + 1)
+        step(0)
+
+    def on_session(self):
+        job = self.jobs[self._session % len(self.jobs)]
+        if self._session % 3 == 2: self.terminal_session(job)
+        else: self.file_session(job)
+        self._session += 1
+        self.root.after(int(self.args.session_interval * 1000), self.on_session)
+
+    def outage(self):
+        # take one server away entirely for a while, then bring it back
+        if self._outage is None:
+            self._outage = self._rng.choice(self.fakes)
+            self.log.info('Outage: %s down', self._outage.name)
+            self._outage.stop()
+            return self.args.outage_length
+        self.log.info('Outage: %s back', self._outage.name)
+        self._outage.start()
+        self._outage = None
+        return self.args.outage_interval
+
+    def sample(self):
+        gc.collect()
+        s = {
+            'elapsed': time.monotonic() - self._start,
+            'sim_days': min(f.sim.days for f in self.fakes),
+            'rss_mb': rss() / 2**20,
+            'heap_mb': tracemalloc.get_traced_memory()[0] / 2**20,
+            'threads': threading.active_count(),
+            'files': open_files(),
+            'connects': sum(self.connected),
+        }
+        if self.root is not None:
+            s['widgets'] = count_widgets(self.root)
+            s['images'] = len(self.root.image_names())
+            s['fonts'] = len(self.root.tk.splitlist(self.root.tk.call('font', 'names')))
+            s['afters'] = len(self.root.tk.splitlist(self.root.tk.call('after', 'info')))
+        self.samples.append(s)
+        if self.baseline is None and s['elapsed'] >= self.args.warmup:
+            self.baseline = s
+            self.snapshot = tracemalloc.take_snapshot()
+        print('  '.join(f'{k} {v:.1f}' if isinstance(v, float) else f'{k} {v}' for k, v in s.items()), flush=True)
+
+    def check(self):
+        """Return the list of limits exceeded between the baseline and the last sample."""
+        if self.baseline is None or len(self.samples) < 2: return ['ran too short to get past the warm up']
+        last = self.samples[-1]
+        limits = {
+            'rss_mb': self.args.max_rss,
+            'heap_mb': self.args.max_heap,
+            'threads': self.args.max_threads,
+            'files': self.args.max_files,
+            'widgets': self.args.max_widgets,
+            'images': self.args.max_images,
+            'fonts': self.args.max_fonts,
+            'afters': self.args.max_afters,
+        }
+        failed = []
+        for key, limit in limits.items():
+            if key not in last: continue
+            growth = last[key] - self.baseline[key]
+            if growth > limit: failed.append(f'{key} grew by {growth:.1f}, limit {limit}')
+        return failed
+
+    def report(self):
+        print(f'\n{self.samples[-1]["sim_days"]:.1f} simulated days, {sum(self.connected)} connects, {sum(f.requests for f in self.fakes)} REST requests')
+        if self.snapshot is not None:
+            print('Top allocation growth since the warm up:')
+            for stat in tracemalloc.take_snapshot().compare_to(self.snapshot, 'lineno')[:self.args.top]:
+                print(f'  {stat}')
+        if self.args.csv:
+            with open(self.args.csv, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.samples[-1]))
+                writer.writeheader()
+                writer.writerows(self.samples)
+
+    def run(self):
+        tracemalloc.start(self.args.frames)
+        self._start = time.monotonic()
+        if not self.args.headless: self.build()
+        for p in self.printers: p.socket.connect()
+
+        end = self._start + self.args.duration
+        next_sample = self._start
+        next_outage = self._start + self.args.outage_interval
+        if self.root is not None:
+            def tick():
+                nonlocal next_sample, next_outage
+                now = time.monotonic()
+                if now >= next_outage: next_outage = now + self.outage()
+                if now >= next_sample:
+                    self.sample()
+                    next_sample = now + self.args.interval
+                if now >= end: self.root.quit()
+                else: self.root.after(250, tick)
+            self.root.after(250, tick)
+            self.root.after(int(self.args.session_interval * 1000), self.on_session)
+            self.root.mainloop()
+        else:
+            while time.monotonic() < end:
+                now = time.monotonic()
+                if now >= next_outage: next_outage = now + self.outage()
+                if now >= next_sample:
+                    self.sample()
+                    next_sample = now + self.args.interval
+                time.sleep(0.25)
+        self.sample()
+
+        failed = self.check()
+        self.report()
+        self.close()
+        if failed:
+            print('FAIL: ' + '; '.join(failed))
+            return 1
+        print('OK')
+        return 0
+
+    def close(self):
+        if self._outage is not None: self._outage.start()
+        for p in self.printers: p.socket.close()
+        for p in self.printers: p.socket.thread.join(10)
+        if self.root is not None:
+            self.root.destroy()
+            shutil.rmtree(self.preview_dir, ignore_errors=True)
+        for fake in self.fakes: fake.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test OctoPyDash against fake OctoPrint servers.')
+    parser.add_argument('--duration', type=float, default=600, help='seconds to run, default 600')
+    parser.add_argument('--speed', type=float, default=720, help='simulated seconds per second, default 720 (a day every 2 minutes)')
+    parser.add_argument('--printers', type=int, default=2, help='number of fake printers, default 2')
+    parser.add_argument('--headless', action='store_true', help='no widgets, only the socket and REST pipeline')
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=600)
+    parser.add_argument('--tick', type=float, default=0.1, help='seconds between socket messages, default 0.1')
+    parser.add_argument('--drop-interval', type=float, default=60, help='average seconds between websocket drops, default 60')
+    parser.add_argument('--outage-interval', type=float, default=180, help='seconds between server outages, default 180')
+    parser.add_argument('--outage-length', type=float, default=20, help='seconds a server stays down, default 20')
+    parser.add_argument('--session-interval', type=float, default=15, help='seconds between file browser/terminal sessions, default 15')
+    parser.add_argument('--interval', type=float, default=30, help='seconds between samples, default 30')
+    parser.add_argument('--warmup', type=float, default=120, help='seconds before the baseline sample, default 120')
+    parser.add_argument('--frames', type=int, default=1, help='tracemalloc traceback depth, default 1')
+    parser.add_argument('--top', type=int, default=15, help='allocation sites listed, default 15')
+    parser.add_argument('--csv', help='write the samples to this file')
+    parser.add_argument('--max-rss', type=float, default=25, help='allowed RSS growth in MB, default 25')
+    parser.add_argument('--max-heap', type=float, default=10, help='allowed Python heap growth in MB, default 10')
+    parser.add_argument('--max-threads', type=int, default=2)
+    parser.add_argument('--max-files', type=int, default=8)
+    parser.add_argument('--max-widgets', type=int, default=40)
+    parser.add_argument('--max-images', type=int, default=20)
+    parser.add_argument('--max-fonts', type=int, default=2)
+    parser.add_argument('--max-afters', type=int, default=10)
+    parser.add_argument('-v', '--verbose', action='store_true', help='show OctoPyDash logging')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='{asctime} - {name} - {levelname} - {message}', style='{')
+    # Soak's own messages are always shown
+    logging.getLogger('soak').setLevel(logging.INFO)
+
+    xvfb = None
+    if not args.headless and not os.environ.get('DISPLAY'):
+        xvfb = start_xvfb(args.width, args.height)
+        if xvfb is None:
+            print('No display and Xvfb is not installed, install it or use --headless')
+            return 2
+    try:
+        return Soak(args).run()
+    finally:
+        if xvfb is not None: xvfb.terminate()
+
+if __name__ == '__main__':
+    sys.exit(main())
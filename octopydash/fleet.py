@@ -0,0 +1,173 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import logging
+import threading
+
+def is_idle(printer):
+    """Return True if `printer` is operational and not printing or paused."""
+    flags = printer.state.flags
+    return bool(flags.get('operational')) and not flags.get('printing') and not flags.get('paused')
+
+def is_printing(printer):
+    """Return True if `printer` is printing."""
+    return bool(printer.state.flags.get('printing'))
+
+def is_paused(printer):
+    """Return True if `printer` is paused."""
+    return bool(printer.state.flags.get('paused'))
+
+def is_busy(printer):
+    """Return True if `printer` is printing or paused."""
+    return is_printing(printer) or is_paused(printer)
+
+# name : (description, OctoClient method, printer filter)
+COMMANDS = {
+    'pause': ('PAUSE ALL', 'pause_job', is_printing),
+    'resume': ('RESUME ALL', 'resume_job', is_paused),
+    'cancel': ('CANCEL ALL', 'cancel_job', is_busy),
+    'psu_off_idle': ('PSU OFF IDLE', 'psucontrol_turn_off', is_idle),
+    'psu_on': ('PSU ON ALL', 'psucontrol_turn_on', None),
+}
+
+class Fleet:
+    """
+    Runs OctoClient commands on many printers at once.
+
+    Each command is sent to all selected printers concurrently, and the
+    results are collected into a single list, so a command on the whole
+    fleet takes about as long as a command on the slowest printer.
+
+    Methods
+    -------
+    run : run a command and wait for the results
+    run_async : run a command in the background
+    summary : return a text summary of results
+    """
+
+    def __init__(self, printers, timeout=10, max_workers=32):
+        """
+        Runs OctoClient commands on many printers at once.
+
+        Parameters
+        ----------
+        printers : list of Printer
+            the printers in the fleet
+        timeout : float
+            seconds to wait for each printer, or None to wait as long as it
+            takes. default 10
+        max_workers : int
+            the maximum number of concurrent requests, default 32
+        """
+        self.printers = printers
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._log = logging.getLogger(__name__)
+
+    def run(self, command, select=None, timeout=None):
+        """
+        Run a command on the fleet and wait for the results.
+
+        Parameters
+        ----------
+        command : str or function
+            a name from COMMANDS, an OctoClient method name or a function
+            that is called with a Printer and returns (success, data)
+        select : function
+            called with each Printer, only printers it returns True for are
+            included. default None, all printers or the command's filter
+        timeout : float
+            seconds to wait for each printer, default is the fleet timeout
+
+        Returns
+        -------
+        list of tuples
+            (printer, success, data) for each selected printer. data is
+            'timed out' for printers that didn't answer in time
+        """
+        if isinstance(command, str):
+            if command in COMMANDS:
+                (_, method, default_select) = COMMANDS[command]
+                if select is None: select = default_select
+            else:
+                method = command
+            func = lambda p: getattr(p.client, method)()
+        else:
+            func = command
+
+        printers = [p for p in self.printers if select is None or select(p)]
+        if not printers: return []
+        timeout = timeout if timeout is not None else self.timeout
+
+        pool = concurrent.futures.ThreadPoolExecutor(min(len(printers), self.max_workers), thread_name_prefix='fleet')
+        futures = {p: pool.submit(func, p) for p in printers}
+        concurrent.futures.wait(futures.values(), timeout)
+        # don't wait for stragglers, they are reported as timed out
+        pool.shutdown(wait=False)
+
+        results = []
+        for p, f in futures.items():
+            if not f.done():
+                results.append((p, False, 'timed out'))
+                continue
+            try:
+                (r, data) = f.result()
+            except Exception as ex:
+                self._log.exception("%s: command failed", p.name)
+                (r, data) = (False, str(ex))
+            results.append((p, r, data))
+
+        self._log.info("%s: %d/%d succeeded", command, sum(1 for r in results if r[1]), len(results))
+        return results
+
+    def run_async(self, command, select=None, timeout=None):
+        """
+        Run a command on the fleet in a background thread.
+
+        See `run` for the parameters.
+
+        Returns
+        -------
+        Future
+            a future for the results of `run`
+        """
+        future = concurrent.futures.Future()
+        def run():
+            try: future.set_result(self.run(command, select, timeout))
+            except Exception as ex: future.set_exception(ex)
+        threading.Thread(target=run, name='fleet', daemon=True).start()
+        return future
+
+    @staticmethod
+    def summary(results):
+        """
+        Return a text summary of `results`.
+
+        Parameters
+        ----------
+        results : list of tuples
+            results from `run`
+
+        Returns
+        -------
+        str
+        """
+        if not results: return 'No printers selected.'
+        ok = [p.name for p, r, d in results if r]
+        lines = [f'{len(ok)} of {len(results)} succeeded.']
+        for p, r, d in results:
+            if not r: lines.append(f'{p.name}: {d if d is not None else "unreachable"}')
+        return '\n'.join(lines)
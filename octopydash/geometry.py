@@ -0,0 +1,221 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+LCARS polygon geometry, shared by the Tk widgets and the offscreen
+renderer. Nothing here needs Tk.
+
+The polygons are given the way Tk draws them with `smooth='raw'`: every
+third point is a knot and the two points between knots are the control
+points of a cubic Bezier curve. `flatten` turns them into plain polygons
+for drawing without Tk.
+
+Functions
+---------
+frame_coords : return the polygon for a Frame
+job_bar_coords : return the polygon for the bar around a job thumbnail
+file_item_bar_coords : return the polygon for the right bar of a file item
+flatten : return a 'raw' smoothed polygon as a list of points
+"""
+import functools
+
+def _mirror(coords, width):
+    return tuple(width - c if i % 2 == 0 else c for i, c in enumerate(coords))
+
+@functools.lru_cache(maxsize=32)
+def frame_coords(width, height, side_loc='right', top_width=40, side_width=10, bottom_width=80):
+    """
+    Return the polygon coordinates of an LCARS frame.
+
+    See `Frame` for a description of the parameters.
+
+    Returns
+    -------
+    tuple
+        coordinates for `create_polygon` with `smooth='raw'`
+    """
+    radius = 10
+
+    coords = (
+        radius, 0, # knot
+        radius, 0, # control
+        width-radius, 0, # control
+        width-radius, 0, # knot
+        width-(radius/2), 0, # control
+        width, (radius/2), # control
+        width, radius, # knot
+        width, radius, # control
+        width, height-radius, # control
+        width, height-radius, # knot
+        width, height-(radius/2), # control
+        width-(radius/2), height, # control
+        width-radius, height, # knot
+        width-radius, height, # control
+        radius, height, # control
+        radius, height, # knot
+        radius/2, height, # control
+        0, height-(radius/2), # control
+        0, height-radius, # knot
+        0, height-radius, # control
+        0, height - bottom_width + radius, # control
+        0, height - bottom_width + radius, # knot
+        0, height - bottom_width + (radius/2), # control
+        radius/2, height - bottom_width, #control
+        radius, height - bottom_width, # knot
+        radius, height - bottom_width, # control
+        width - side_width - radius, height - bottom_width, # control
+        width - side_width - radius, height - bottom_width, # knot
+        width - side_width - (radius/2), height - bottom_width, # control
+        width - side_width, height - bottom_width - (radius/2), # control
+        width - side_width, height - bottom_width - radius, # knot
+        width - side_width, height - bottom_width - radius, # control
+        width - side_width, top_width + radius, # control
+        width - side_width, top_width + radius, # knot
+        width - side_width, top_width + (radius/2), # control
+        width - side_width - (radius/2), top_width, # control
+        width - side_width - radius, top_width, # knot
+        width - side_width - radius, top_width, # control
+        radius, top_width, # control
+        radius, top_width, # knot
+        radius/2, top_width, # control
+        0, top_width - (radius/2), # control
+        0, top_width -radius, # knot
+        0, top_width -radius, # control
+        0, radius, # control
+        0, radius, # knot
+        0, (radius/2), # control
+        (radius/2), 0, # control
+        radius, 0, # knot
+    )
+    return _mirror(coords, width) if side_loc == 'left' else coords
+
+@functools.lru_cache(maxsize=16)
+def job_bar_coords(width, height, bar_loc='left'):
+    """
+    Return the polygon coordinates of the bar around a job thumbnail.
+
+    See `CurrentJob` for a description of the parameters.
+
+    Returns
+    -------
+    tuple
+        coordinates for `create_polygon` with `smooth='raw'`
+    """
+    coords = (
+        30, 10, # knot
+        30, 10, # control
+        10, 10, # control
+        10, 10, # knot
+        5, 10, # control
+        0, 15, # control
+        0, 20, # knot
+        0, 20, # control
+        0, height - 50 - 20, # control
+        0, height - 50 - 20, # knot
+        0, height - 50 - 15, # control
+        5, height - 50 - 10, # control
+        10, height - 50 - 10, # knot
+        10, height - 50 - 10, # control
+        30, height - 50 - 10, # control
+        30, height - 50 - 10, # knot
+        30, height - 50 - 10, # control
+        30, height - 50 - 20, # control
+        30, height - 50 - 20, # knot
+        30, height - 50 - 20, # control
+        20, height - 50 - 20, # control
+        20, height - 50 - 20, # knot
+        15, height - 50 - 20, # control
+        10, height - 50 - 25, # control
+        10, height - 50 - 30, # knot
+        10, height - 50 - 30, # control
+        10, 30, # control
+        10, 30, # knot
+        10, 25, # control
+        15, 20, # control
+        20, 20, # knot
+        20, 20, # control
+        30, 20, # control
+        30, 20, # knot
+    )
+    return _mirror(coords, width) if bar_loc == 'right' else coords
+
+@functools.lru_cache(maxsize=16)
+def file_item_bar_coords(width, height):
+    """
+    Return the polygon coordinates of the right bar of a file item.
+
+    See `FileItem` for a description of the parameters.
+
+    Returns
+    -------
+    tuple
+        coordinates for `create_polygon` with `smooth='raw'`
+    """
+    return (
+        width-225,0, # knot
+        width-225,0, # control
+        width-10,0, # control
+        width-10,0, # knot
+        width-5,0, # control
+        width, 5, # control
+        width, 10, # knot
+        width, 10, # control
+        width, height-10, #control
+        width, height-10, # knot
+        width, height-5, # control
+        width-5, height, # control
+        width-10, height, # knot
+        width-10, height, # control
+        width-225, height, # control
+        width-225, height # knot
+    )
+
+@functools.lru_cache(maxsize=32)
+def flatten(coords, steps=6, x=0, y=0):
+    """
+    Return a polygon drawn with `smooth='raw'` as a list of points.
+
+    Parameters
+    ----------
+    coords : tuple
+        polygon coordinates, ie. from `frame_coords`
+    steps : int
+        the number of line segments each curve is split into, default 6
+    x : float
+        added to every x coordinate, default 0
+    y : float
+        added to every y coordinate, default 0
+
+    Returns
+    -------
+    list of tuple
+        (x, y) points, for `ImageDraw.polygon`
+    """
+    points = [(coords[i] + x, coords[i+1] + y) for i in range(0, len(coords), 2)]
+    out = [points[0]]
+    for k in range(0, len(points) - 3, 3):
+        (p0, p1, p2, p3) = points[k:k+4]
+        # straight segments are given with the controls on the knots
+        if p0 == p1 and p2 == p3:
+            out.append(p3)
+            continue
+        for s in range(1, steps + 1):
+            t = s / steps
+            u = 1 - t
+            out.append((
+                u*u*u*p0[0] + 3*u*u*t*p1[0] + 3*u*t*t*p2[0] + t*t*t*p3[0],
+                u*u*u*p0[1] + 3*u*u*t*p1[1] + 3*u*t*t*p2[1] + t*t*t*p3[1],
+            ))
+    return out
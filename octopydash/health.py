@@ -0,0 +1,132 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import threading
+
+class CircuitBreaker:
+    """
+    Tracks whether a printer can be reached.
+
+    The circuit opens after `threshold` consecutive failed requests, or
+    right away when `trip` is called (ie. when the socket is lost).
+    While it is open, requests should fail immediately instead of
+    waiting for a timeout. A background thread calls `probe` every
+    `probe_interval` seconds and closes the circuit once it succeeds.
+
+    Methods
+    -------
+    allow : return True if requests should be made
+    record_success : record a request that got an answer
+    record_failure : record a request that couldn't be made
+    trip : open the circuit now
+    reset : close the circuit now
+    add_callback : call a function when the circuit opens or closes
+    """
+
+    def __init__(self, name, probe, threshold=3, probe_interval=10):
+        """
+        Tracks whether a printer can be reached.
+
+        Parameters
+        ----------
+        name : str
+            the name used for logging
+        probe : function
+            called without arguments from the probe thread, returns True
+            if the printer can be reached
+        threshold : int
+            consecutive failures before the circuit opens, default 3
+        probe_interval : float
+            seconds between probes while open, default 10
+        """
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self._probe = probe
+        self._log = logging.getLogger(f'{__name__} - {name}')
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open = False
+        self._closed = threading.Event()
+        self._closed.set()
+        self._callbacks = []
+
+    @property
+    def is_open(self):
+        """True while the printer is considered unreachable."""
+        return self._open
+
+    def allow(self):
+        """Return True if requests should be made."""
+        return not self._open
+
+    def add_callback(self, callback):
+        """
+        Call `callback` when the circuit opens or closes.
+
+        Parameters
+        ----------
+        callback : function
+            called as callback(online) from the thread that changed the
+            circuit, `online` is False when it opened
+        """
+        self._callbacks.append(callback)
+
+    def record_success(self):
+        """Record a request that got an answer, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+        if self._open: self._set_open(False)
+
+    def record_failure(self):
+        """Record a request that couldn't be made."""
+        with self._lock:
+            self._failures += 1
+            trip = self._failures >= self.threshold
+        if trip and not self._open: self._set_open(True)
+
+    def trip(self):
+        """Open the circuit now."""
+        if not self._open: self._set_open(True)
+
+    def reset(self):
+        """Close the circuit now."""
+        with self._lock:
+            self._failures = 0
+        if self._open: self._set_open(False)
+
+    def _set_open(self, open):
+        with self._lock:
+            if open == self._open: return
+            self._open = open
+            if open: self._closed.clear()
+            else: self._closed.set()
+        if open:
+            self._log.warning("Unreachable, failing requests until it answers again")
+            threading.Thread(target=self._run_probe, name='breaker-probe', daemon=True).start()
+        else:
+            self._log.info("Reachable again")
+        for cb in self._callbacks:
+            try: cb(not open)
+            except Exception: self._log.exception("Callback failed")
+
+    def _run_probe(self):
+        # returns as soon as the circuit is closed, by a probe or otherwise
+        while not self._closed.wait(self.probe_interval):
+            try: ok = self._probe()
+            except Exception: ok = False
+            if ok:
+                self.reset()
+                return
@@ -0,0 +1,305 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    printer TEXT NOT NULL,
+    origin TEXT,
+    path TEXT,
+    started REAL NOT NULL,
+    ended REAL,
+    outcome TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_printer_started ON jobs (printer, started);
+CREATE INDEX IF NOT EXISTS jobs_printer_ended ON jobs (printer, ended);
+CREATE INDEX IF NOT EXISTS jobs_started ON jobs (started);
+
+CREATE TABLE IF NOT EXISTS temps (
+    printer TEXT NOT NULL,
+    ts REAL NOT NULL,
+    tool0_actual REAL,
+    tool0_target REAL,
+    bed_actual REAL,
+    bed_target REAL,
+    chamber_actual REAL,
+    chamber_target REAL
+);
+CREATE INDEX IF NOT EXISTS temps_printer_ts ON temps (printer, ts);
+
+CREATE TABLE IF NOT EXISTS daily (
+    printer TEXT NOT NULL,
+    day TEXT NOT NULL,
+    jobs INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    print_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (printer, day)
+);
+'''
+
+# event type -> outcome
+END_EVENTS = {
+    'PrintDone': 'completed',
+    'PrintFailed': 'failed',
+    'PrintCancelled': 'cancelled',
+}
+
+class HistoryStore:
+    """
+    A local SQLite history of jobs and temperatures.
+
+    Job starts and ends come from socket events, temperatures from
+    'current' messages, downsampled to one sample per printer every
+    `temp_interval` seconds. Everything is written by a single
+    background thread in batched transactions, so the socket threads
+    only queue rows. The database is in WAL mode, so the statistics
+    screen can read while the writer writes.
+
+    Each finished job also updates a daily rollup per printer, which
+    is what `summary` and `daily` read, so their cost depends on the
+    number of days asked for, not the number of jobs.
+
+    Methods
+    -------
+    attach : record the history of a printer
+    summary : return per printer totals for the last days
+    daily : return the daily rollups of the last days
+    jobs : return the last jobs
+    close : write what is queued and stop the writer
+    """
+
+    def __init__(self, filename, flush_interval=2, temp_interval=60, temp_retention_days=90):
+        """
+        A local SQLite history of jobs and temperatures.
+
+        Parameters
+        ----------
+        filename : str
+            the database file, created if needed
+        flush_interval : float
+            seconds queued rows may wait before they are written, default 2
+        temp_interval : float
+            seconds between temperature samples per printer, default 60
+        temp_retention_days : int
+            days temperature samples are kept, default 90. jobs and
+            rollups are kept forever
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.temp_interval = temp_interval
+        self.temp_retention_days = temp_retention_days
+        self._log = logging.getLogger(__name__)
+        self._queue = queue.Queue()
+        # printer name -> (started, origin, path) of the job in progress
+        self._open_jobs = {}
+        # printer name -> time of the last temperature sample
+        self._last_temp = {}
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        conn = sqlite3.connect(filename)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._thread = threading.Thread(target=self._run, name='history', daemon=True)
+        self._thread.start()
+
+    def attach(self, printer):
+        """
+        Record the history of a printer.
+
+        Call before the printer's socket is connected.
+
+        Parameters
+        ----------
+        printer : Printer
+        """
+        name = printer.name
+        # event messages are {'type': ..., 'payload': {...}}
+        printer.socket.add_callback('event', lambda data: self._on_started(name, data.get('payload') or {}), 'PrintStarted')
+        for event in END_EVENTS:
+            printer.socket.add_callback('event', lambda data, e=event: self._on_ended(name, e, data.get('payload') or {}), event)
+        printer.socket.add_callback('current', lambda data: self._on_current(name, data))
+
+    def _on_started(self, name, data):
+        started = time.time()
+        self._open_jobs[name] = (started, data.get('origin'), data.get('path'))
+        self._queue.put(('INSERT INTO jobs (printer, origin, path, started) VALUES (?, ?, ?, ?)', (name, data.get('origin'), data.get('path'), started)))
+
+    def _on_ended(self, name, event, data):
+        outcome = END_EVENTS[event]
+        # OctoPrint sends PrintFailed after PrintCancelled, only the first end counts
+        if event == 'PrintFailed' and data.get('reason') == 'cancelled': outcome = 'cancelled'
+        ended = time.time()
+        job = self._open_jobs.pop(name, None)
+        duration = data.get('time')
+
+        if job is None:
+            if event == 'PrintFailed' and outcome == 'cancelled': return
+            # started before the dashboard was, record it from the end
+            started = ended - duration if duration is not None else ended
+            self._queue.put(('INSERT INTO jobs (printer, origin, path, started, ended, outcome, duration) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             (name, data.get('origin'), data.get('path'), started, ended, outcome, duration)))
+        else:
+            started = job[0]
+            if duration is None: duration = ended - started
+            self._queue.put(('UPDATE jobs SET ended = ?, outcome = ?, duration = ? WHERE printer = ? AND started = ?',
+                             (ended, outcome, duration, name, started)))
+
+        day = time.strftime('%Y-%m-%d', time.localtime(ended))
+        self._queue.put((f'''INSERT INTO daily (printer, day, jobs, {outcome}, print_seconds) VALUES (?, ?, 1, 1, ?)
+                             ON CONFLICT (printer, day) DO UPDATE SET jobs = jobs + 1, {outcome} = {outcome} + 1,
+                             print_seconds = print_seconds + excluded.print_seconds''', (name, day, duration or 0)))
+
+    def _on_current(self, name, data):
+        temps = data.get('temps')
+        if not temps: return
+        now = time.time()
+        if now - self._last_temp.get(name, 0) < self.temp_interval: return
+        self._last_temp[name] = now
+        t = temps[-1]
+        row = [name, t.get('time', now)]
+        for key in ('tool0', 'bed', 'chamber'):
+            value = t.get(key) or {}
+            row += [value.get('actual'), value.get('target')]
+        self._queue.put(('INSERT INTO temps VALUES (?, ?, ?, ?, ?, ?, ?, ?)', tuple(row)))
+
+    def _run(self):
+        conn = sqlite3.connect(self.filename)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        last_prune = 0
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None:
+                try: batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            if batch[-1] is None:
+                batch.pop()
+                stop = True
+
+            if time.time() - last_prune > 86400:
+                last_prune = time.time()
+                batch.append(('DELETE FROM temps WHERE ts < ?', (last_prune - self.temp_retention_days * 86400,)))
+            try:
+                with conn:
+                    for sql, params in batch: conn.execute(sql, params)
+            except sqlite3.Error:
+                self._log.exception("Couldn't write %d history rows", len(batch))
+        conn.close()
+
+    def close(self):
+        """Write what is queued and stop the writer."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _read(self, sql, params=()):
+        conn = sqlite3.connect(self.filename)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _since(self, days):
+        return time.strftime('%Y-%m-%d', time.localtime(time.time() - (days - 1) * 86400))
+
+    def summary(self, days=30):
+        """
+        Return per printer totals for the last `days` days.
+
+        Parameters
+        ----------
+        days : int
+            the number of days, including today. default 30
+
+        Returns
+        -------
+        list of dict
+            printer, jobs, completed, failed, cancelled, print_seconds,
+            utilization (the fraction of the period spent printing) and
+            failure_rate (failed or cancelled jobs over all jobs)
+        """
+        rows = self._read('''SELECT printer, SUM(jobs), SUM(completed), SUM(failed), SUM(cancelled), SUM(print_seconds)
+                             FROM daily WHERE day >= ? GROUP BY printer ORDER BY printer''', (self._since(days),))
+        out = []
+        for printer, jobs, completed, failed, cancelled, seconds in rows:
+            out.append({
+                'printer': printer,
+                'jobs': jobs,
+                'completed': completed,
+                'failed': failed,
+                'cancelled': cancelled,
+                'print_seconds': seconds,
+                'utilization': seconds / (days * 86400),
+                'failure_rate': (failed + cancelled) / jobs if jobs else 0.0,
+            })
+        return out
+
+    def daily(self, days=30, printer=None):
+        """
+        Return the daily rollups of the last `days` days.
+
+        Parameters
+        ----------
+        days : int
+            the number of days, including today. default 30
+        printer : str
+            only this printer, default None for all printers
+
+        Returns
+        -------
+        list of tuples
+            (printer, day, jobs, completed, failed, cancelled, print_seconds)
+        """
+        sql = 'SELECT printer, day, jobs, completed, failed, cancelled, print_seconds FROM daily WHERE day >= ?'
+        params = [self._since(days)]
+        if printer is not None:
+            sql += ' AND printer = ?'
+            params.append(printer)
+        return self._read(sql + ' ORDER BY day, printer', params)
+
+    def jobs(self, printer=None, limit=50):
+        """
+        Return the last jobs.
+
+        Parameters
+        ----------
+        printer : str
+            only this printer, default None for all printers
+        limit : int
+            the maximum number of jobs, default 50
+
+        Returns
+        -------
+        list of tuples
+            (printer, origin, path, started, ended, outcome, duration), the
+            newest first. ended, outcome and duration are None while printing
+        """
+        sql = 'SELECT printer, origin, path, started, ended, outcome, duration FROM jobs'
+        params = []
+        if printer is not None:
+            sql += ' WHERE printer = ?'
+            params.append(printer)
+        return self._read(sql + ' ORDER BY started DESC LIMIT ?', params + [limit])
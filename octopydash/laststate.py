@@ -0,0 +1,152 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+class LastStateStore:
+    """
+    The last known state of each printer, kept on disk between runs.
+
+    A small JSON snapshot of each printer's state (see
+    PrinterState.snapshot) is written every `interval` seconds, only
+    when it has changed, and the scaled thumbnail of the current job is
+    kept next to it. At startup the snapshots are applied before any
+    network activity, so the dashboard shows the printers as they were
+    right away. The state is marked stale until each printer sends its
+    first message.
+
+    Methods
+    -------
+    attach : restore the snapshot of a printer and keep it up to date
+    thumbnail_file : return the file a job thumbnail is kept in
+    save : write the snapshots that changed
+    close : write the snapshots and stop
+    """
+
+    def __init__(self, directory, interval=30):
+        """
+        The last known state of each printer, kept on disk.
+
+        Parameters
+        ----------
+        directory : str
+            the folder the snapshots are kept in, created if needed
+        interval : float
+            seconds between writes, default 30
+        """
+        self.directory = directory
+        self.interval = interval
+        self._log = logging.getLogger(__name__)
+        self._printers = []
+        # printer name -> the snapshot last written or read
+        self._written = {}
+        self._stop = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._run, name='laststate', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(text):
+        # printer names and paths can hold anything, file names can't
+        return hashlib.md5(text.encode()).hexdigest()[:16]
+
+    def _file(self, name):
+        return os.path.join(self.directory, f'{self._key(name)}.json')
+
+    def thumbnail_file(self, name, job_file):
+        """
+        Return the file the thumbnail of a printer's job is kept in.
+
+        Parameters
+        ----------
+        name : str
+            the printer name
+        job_file : dict
+            OctoPrint job file info, with 'origin' and 'path'
+
+        Returns
+        -------
+        str
+        """
+        job = self._key(f"{job_file.get('origin')}/{job_file.get('path')}")
+        return os.path.join(self.directory, f'{self._key(name)}-{job}.png')
+
+    def attach(self, printer):
+        """
+        Restore the snapshot of a printer and keep it up to date.
+
+        Call before the printer's widgets are created and before its
+        socket is connected.
+
+        Parameters
+        ----------
+        printer : Printer
+        """
+        self._printers.append(printer)
+        try:
+            with open(self._file(printer.name)) as f: data = json.load(f)
+            saved = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['saved']))
+            snapshot = data['state']
+            printer.state.apply_snapshot(snapshot)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, OverflowError) as e:
+            # a damaged, hand edited or newer snapshot is ignored, not fatal
+            self._log.warning("Couldn't read the last state of %s: %r", printer.name, e)
+            return
+        self._written[printer.name] = snapshot
+        self._log.info('Restored %s as of %s', printer.name, saved)
+
+    def save(self):
+        """Write the snapshots that changed since they were last written."""
+        for printer in list(self._printers):
+            state = printer.state
+            # nothing new has arrived yet
+            if state.stale: continue
+            snapshot = state.snapshot()
+            if snapshot == self._written.get(printer.name): continue
+            filename = self._file(printer.name)
+            try:
+                with open(filename + '.tmp', 'w') as f: json.dump({'saved': time.time(), 'state': snapshot}, f)
+                os.replace(filename + '.tmp', filename)
+            except (OSError, TypeError, ValueError) as e:
+                self._log.warning("Couldn't save the last state of %s: %s", printer.name, e)
+                continue
+            self._written[printer.name] = snapshot
+            self._clean_thumbnails(printer.name, snapshot['job_file'])
+
+    def _clean_thumbnails(self, name, job_file):
+        keep = self.thumbnail_file(name, job_file) if job_file is not None else None
+        for filename in glob.glob(os.path.join(self.directory, f'{self._key(name)}-*.png')):
+            if filename == keep: continue
+            try: os.remove(filename)
+            except OSError: pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def close(self):
+        """Write the snapshots that changed and stop."""
+        self._stop.set()
+        self._thread.join()
+        self.save()
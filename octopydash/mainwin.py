@@ -15,12 +15,21 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import tkinter as tk
 import logging
+import math
+import os
+import time
 
+from octopydash.history import HistoryStore
+from octopydash.laststate import LastStateStore
 from octopydash.printer import Printer
+from octopydash.sync import FolderSync
+from octopydash.thumbnails import ThumbnailLoader
 
-from octopydash.widgets import PrinterStatus, Frame, PSUControlPower, CurrentJob
+from octopydash.widgets import resources, PrinterPanel, ButtonBase, WebcamMosaic, FleetCommands, HistoryStats, OverviewGrid
 
 class MainWin(tk.Tk):
+    COLORS = ('#88ccff', '#ffcc66')
+
     def __init__(self):
         super().__init__()
         self._log = logging.getLogger(__name__)
@@ -30,54 +39,198 @@ class MainWin(tk.Tk):
         self.protocol('WM_DELETE_WINDOW', self.on_exit)
 
         self._map_id = self.bind('<Map>', self.on_map, '+')
+        self.bind_all('<ButtonPress>', self.on_touch, '+')
+        # set up in on_map, the window can be closed before that
+        self.printers = []
+        self.history = None
+        self.last_state = None
+        self.sync = None
 
 
     def on_map(self, event):
         self._log.info('Creating widgets...')
 
-        # Change these to configure your printers
-        self.printer_a = Printer("Printer A Name", "http://printer-a-url", "PRINTERAPIKEY")
-        self.printer_b = Printer("Printer B Name", "http://printer-b-url", "PRINTERAPIKEY")
-
-        height = self.winfo_height()
-        width = self.winfo_width()
-
-        self.printera_frame = Frame(self, (width/2)-2, height, 'right', color='#88ccff')
-        self.printera_frame.place(x=0,y=0)
-
-        self.printera_status = PrinterStatus(self, self.printer_a, 40, color='#88ccff')
-        self.printera_status.place(x=20, y=0)
-
-        self.printera_buttons = tk.Frame(self, bg='#000000')
-        self.printera_buttons.place(x=20, y=height-80)
-
-        self.printera_power = PSUControlPower(self.printera_buttons, self.printer_a, 80, 0)
-        self.printera_power.pack(side='left', padx=(2,2))
-
-        self.printera_job = CurrentJob(self, self.printer_a, (width/2)-32, height-140)
-        self.printera_job.show_command = lambda: self.printera_job.place(x=10, y=50)
-        self.printera_job.hide_command = lambda: self.printera_job.place_forget()
-
-        self.printerb_frame = Frame(self, (width/2)-2, height, 'left', color='#ffcc66')
-        self.printerb_frame.place(x=(width/2)+2, y=0)
-
-        self.printerb_status = PrinterStatus(self, self.printer_b, 40, color='#ffcc66')
-        self.printerb_status.place(x=width-20, y=0, anchor='ne')
-
-        self.printerb_power = PSUControlPower(self, self.printer_b, 80)
-        self.printerb_power.place(x=width-20, y=height-80, anchor='ne')
-
-        self.printerb_job = CurrentJob(self, self.printer_b, (width/2)-32, height-140, 'right')
-        self.printerb_job.show_command = lambda: self.printerb_job.place(x=width - 10, y=50, anchor='ne')
-        self.printerb_job.hide_command = lambda: self.printerb_job.place_forget()
+        # the thumbnail decode workers are forked, that must happen before
+        # anything starts a thread (stores, sockets, widgets) or a child
+        # can inherit a lock held by one of them
+        ThumbnailLoader.get(self)
+
+        # Change these to configure your printers, `per_page` of them are shown side by side
+        self.printers = [
+            Printer("Printer A Name", "http://printer-a-url", "PRINTERAPIKEY"),
+            Printer("Printer B Name", "http://printer-b-url", "PRINTERAPIKEY"),
+        ]
+        self.per_page = 2
+
+        self.history = HistoryStore(os.path.expanduser('~/.octopydash/history.db'))
+        for p in self.printers: self.history.attach(p)
+
+        # show the printers as they were last time until they answer
+        self.last_state = LastStateStore(os.path.expanduser('~/.octopydash/last'))
+        for p in self.printers: self.last_state.attach(p)
+
+        # Uncomment to push new or changed G-code from a watched folder to the printers
+        self.sync = None
+        # self.sync = FolderSync('/path/to/gcode', self.printers, os.path.expanduser('~/.octopydash/sync'))
+
+        self.mosaic = None
+        self.fleet = None
+        self.stats = None
+        self.overview = None
+
+        # pages are built the first time they are shown
+        self.pages = [None] * math.ceil(len(self.printers) / self.per_page)
+        self.page = None
+        self._swipe = None
+        for p in self.printers: p.throttle.set_visible(False)
+        self.show_page(0)
 
         self._log.info('Starting up sockets...')
 
-        self.printer_a.socket.connect()
-        self.printer_b.socket.connect()
+        for p in self.printers: p.socket.connect()
         self.unbind('<Map>', self._map_id)
+        self.bind('<Map>', lambda e: self.on_visibility(True) if e.widget is self else None, '+')
+        self.bind('<Unmap>', lambda e: self.on_visibility(False) if e.widget is self else None, '+')
+        self.bind_all('<ButtonPress-1>', self.on_swipe_start, '+')
+        self.bind_all('<ButtonRelease-1>', self.on_swipe_end, '+')
+        self.after(5000, self.on_throttle_tick)
+        if self.sync is not None: self.sync.start()
+
+    def _build_page(self, number):
+        height = self.winfo_height()
+        width = self.winfo_width()
+        # always `per_page` columns, so a short last page has the same layout
+        col_width = width / self.per_page
+
+        page = tk.Frame(self, bg='#000000', width=width, height=height)
+        page.panels = []
+        for i, printer in enumerate(self.printers[number * self.per_page:(number + 1) * self.per_page]):
+            panel = PrinterPanel(page, printer, col_width, height, 'right' if i % 2 == 0 else 'left', self.COLORS[i % len(self.COLORS)], self.last_state)
+            panel.place(x=col_width * i, y=0)
+            page.panels.append(panel)
+
+        color = self.COLORS[0]
+        buttons = page.panels[0].buttons
+        mosaic_btn = ButtonBase(buttons, 'CAMS', 80, 0, color=color)
+        mosaic_btn.bind('<<ButtonClick>>', self.on_mosaic_click)
+        mosaic_btn.pack(side='left', padx=(2,2))
+
+        fleet_btn = ButtonBase(buttons, 'ALL', 80, 0, color=color)
+        fleet_btn.bind('<<ButtonClick>>', self.on_fleet_click)
+        fleet_btn.pack(side='left', padx=(2,2))
+
+        stats_btn = ButtonBase(buttons, 'STATS', 80, 0, color=color)
+        stats_btn.bind('<<ButtonClick>>', self.on_stats_click)
+        stats_btn.pack(side='left', padx=(2,2))
+
+        grid_btn = ButtonBase(buttons, 'GRID', 80, 0, color=color)
+        grid_btn.bind('<<ButtonClick>>', self.on_grid_click)
+        grid_btn.pack(side='left', padx=(2,2))
+
+        if len(self.pages) > 1:
+            # on the last panel, next to its power button
+            buttons = page.panels[-1].buttons
+            before = page.panels[-1].power
+            prev_btn = ButtonBase(buttons, 'PREV', 80, 0, color=color)
+            prev_btn.bind('<<ButtonClick>>', lambda e: self.show_page(self.page - 1))
+            prev_btn.pack(side='left', padx=(2,2), before=before)
+
+            tk.Label(buttons, text=f'{number + 1}/{len(self.pages)}', bg='#000000', fg=color, font=resources.font(self, 24)).pack(side='left', padx=(4,4), before=before)
+
+            next_btn = ButtonBase(buttons, 'NEXT', 80, 0, color=color)
+            next_btn.bind('<<ButtonClick>>', lambda e: self.show_page(self.page + 1))
+            next_btn.pack(side='left', padx=(2,2), before=before)
+        return page
+
+    def show_page(self, number):
+        """
+        Show a page of printers, suspending the page shown before.
+
+        Parameters
+        ----------
+        number : int
+            the page, wraps around
+        """
+        number %= len(self.pages)
+        if number == self.page: return
+        if self.page is not None:
+            old = self.pages[self.page]
+            for panel in old.panels:
+                panel.suspend()
+                panel.printer.throttle.set_visible(False)
+            old.place_forget()
+
+        self._log.info('Showing page %d', number + 1)
+        if self.pages[number] is None: self.pages[number] = self._build_page(number)
+        page = self.pages[number]
+        for panel in page.panels:
+            panel.resume()
+            panel.printer.throttle.set_visible(True)
+        page.place(x=0, y=0)
+        self.page = number
+
+    def on_swipe_start(self, event):
+        # swipes on other windows, ie. the file list, are theirs
+        if not isinstance(event.widget, tk.Misc) or event.widget.winfo_toplevel() is not self: return
+        self._swipe = (event.x_root, event.y_root, time.monotonic())
+
+    def on_swipe_end(self, event):
+        if self._swipe is None or len(self.pages) < 2: return
+        (x, y, t) = self._swipe
+        self._swipe = None
+        dx = event.x_root - x
+        dy = event.y_root - y
+        if time.monotonic() - t > 1 or abs(dx) < self.winfo_width() / 4 or abs(dx) < abs(dy) * 2: return
+        self.show_page(self.page - 1 if dx > 0 else self.page + 1)
+
+    def on_mosaic_click(self, event):
+        if self.mosaic is None: self.mosaic = WebcamMosaic(self, self.printers)
+        self.mosaic.show()
+
+    def on_fleet_click(self, event):
+        if self.fleet is None: self.fleet = FleetCommands(self, self.printers)
+        self.fleet.show()
+
+    def on_stats_click(self, event):
+        if self.stats is None: self.stats = HistoryStats(self, self.history)
+        self.stats.show()
+
+    def on_grid_click(self, event):
+        if self.overview is None:
+            self.overview = OverviewGrid(self, self.printers, self.on_grid_select)
+            self.overview.bind('<Map>', lambda e: self.on_overview(True) if e.widget is self.overview else None, '+')
+            self.overview.bind('<Unmap>', lambda e: self.on_overview(False) if e.widget is self.overview else None, '+')
+        self.overview.show()
+
+    def on_grid_select(self, printer):
+        self.show_page(self.printers.index(printer) // self.per_page)
+
+    def on_overview(self, shown):
+        # the page is covered by the overview, which shows every printer
+        panels = self.pages[self.page].panels
+        for panel in panels:
+            if shown: panel.suspend()
+            else: panel.resume()
+        on_page = [panel.printer for panel in panels]
+        for p in self.printers: p.throttle.set_visible(shown or p in on_page)
+
+    def on_touch(self, event):
+        for p in self.printers: p.throttle.touch()
+
+    def on_visibility(self, visible):
+        # only the printers on the page shown are visible
+        for panel in self.pages[self.page].panels:
+            if visible: panel.resume()
+            else: panel.suspend()
+            panel.printer.throttle.set_visible(visible)
+
+    def on_throttle_tick(self):
+        for p in self.printers: p.throttle.update()
+        self.after(5000, self.on_throttle_tick)
 
     def on_exit(self):
-        self.printer_a.socket.close()
-        self.printer_b.socket.close()
+        if self.sync is not None: self.sync.stop()
+        for p in self.printers: p.socket.close()
+        if self.history is not None: self.history.close()
+        if self.last_state is not None: self.last_state.close()
         self.destroy()
\ No newline at end of file
@@ -13,31 +13,60 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import json
 import requests
 import logging
+import threading
+import time
+import urllib.parse
+
+from octopydash.health import CircuitBreaker
+from octopydash.upload import SharedFile, MultipartUpload
 
 class OctoClient:
     """
     An OctoPrint HTTP client.
+
+    GET requests are shared: identical requests made at the same time
+    are sent once, and responses are reused for `cache_ttl` seconds.
+    After that they are revalidated with the ETag or Last-Modified
+    OctoPrint sent, so unchanged responses come back as a bodiless 304.
+    The cache is limited to `cache_size` entries and `cache_bytes`
+    bytes. Other requests only drop the cached responses they change,
+    ie. deleting a file drops the cached file listings.
+
+    `breaker` tracks whether OctoPrint can be reached. Once it opens,
+    requests fail right away, as if the request couldn't be made,
+    until a probe of /api/version succeeds.
     
     Methods
     -------
     full_url : return the full url for a given path
+    invalidate : drop cached responses
     plugin_simple_api_command : perform a plugin simple api command
     psucontrol_turn_on : (PSU Control Plugin) turn on PSU
     psucontrol_turn_off : (PSU Control Plugin) turn off PSU
+    download : download a file, such as a thumbnail
+    download_to : download a file straight to disk
+    download_head : download the start of a file
     version : return OctoPrint version information
+    settings : return OctoPrint settings
+    webcam_stream_url : return the full url of the webcam stream
+    webcam_snapshot_url : return the full url of the webcam snapshot
     login : perform a passive login
     file : return file or folder information
     select_file : select a file for printing
     delete_file : delete a file
+    move_file : move a file or folder
+    upload_file : upload a local file
     start_job : start the print job
     pause_job : pause the print
     resume_job : resume from pause
     cancel_job : cancel print
     """
 
-    def __init__(self, baseurl, apikey):
+    def __init__(self, baseurl, apikey, cache_ttl=2.0, cache_size=256, cache_bytes=2*1024*1024, connect_timeout=5):
         """
         An OctoPrint HTTP Client
 
@@ -47,19 +76,152 @@ class OctoClient:
             the URL to the OctoPrint instance
         apikey : str
             the API Key to use when connecting to OctoPrint
+        cache_ttl : float
+            seconds a GET response is reused before it is revalidated,
+            default 2.0. 0 revalidates every request
+        cache_size : int
+            the maximum number of cached responses, default 256
+        cache_bytes : int
+            the maximum total size of the cached responses, default 2MB.
+            responses larger than a quarter of this aren't cached
+        connect_timeout : float
+            seconds to wait for a connection, default 5
         """
         self._url = baseurl
         self._apikey = apikey
         self._hdrs = {'X-Api-Key': apikey}
         self._log = logging.getLogger(f'{__name__} - {baseurl}')
         self._log.debug("init for %s with %s", baseurl, apikey)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        # url -> (expires, etag, last modified, body)
+        self._cache = {}
+        # the total size of the cached bodies
+        self._cache_used = 0
+        # url -> Future for the request in flight
+        self._inflight = {}
+        self._cache_lock = threading.Lock()
+        # bumped by invalidate, so responses fetched before it aren't stored
+        self._generation = 0
+        self._timeout = (connect_timeout, 30)
+        self.breaker = CircuitBreaker(baseurl, self._probe)
+
+    def invalidate(self, prefixes=None):
+        """
+        Drop cached responses.
 
-    def _do_request(self, url, method='GET', data=None):
+        Parameters
+        ----------
+        prefixes : tuple of str
+            only drop the responses for urls starting with one of these,
+            ie. ('/api/files',). default None, drop all of them
+        """
+        with self._cache_lock:
+            if prefixes is None:
+                self._cache.clear()
+                self._cache_used = 0
+            else:
+                for url in [u for u in self._cache if u.startswith(prefixes)]: self._drop(url)
+            self._generation += 1
+
+    def _drop(self, url):
+        # with _cache_lock held
+        entry = self._cache.pop(url, None)
+        if entry is not None: self._cache_used -= len(entry[3])
+
+    def _probe(self):
         try:
-            r = requests.request(method, f'{self._url}{url}', headers=self._hdrs, json=data, timeout=30)
+            r = requests.get(f'{self._url}/api/version', headers=self._hdrs, timeout=self._timeout)
+        except requests.RequestException:
+            return False
+        return r.status_code == 200
+
+    def _send(self, method, url, **kwargs):
+        # returns the response, or None if the request couldn't be made
+        if not self.breaker.allow():
+            self._log.debug(f'{url} -> unreachable, not sent')
+            return None
+        try:
+            r = requests.request(method, f'{self._url}{url}', **kwargs)
         except:
             self._log.error(f"Couldn't make request to {url}")
-            return (False, None)
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return r
+
+    def _get(self, url):
+        # returns (success, body bytes or status code)
+        with self._cache_lock:
+            entry = self._cache.get(url)
+            if entry is not None and time.monotonic() < entry[0]:
+                self._log.debug(f'{url} -> cached')
+                return (True, entry[3])
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[url] = future
+        if not leader:
+            self._log.debug(f'{url} -> joined request in flight')
+            return future.result()
+
+        result = (False, None)
+        try:
+            result = self._revalidate(url, entry)
+        finally:
+            with self._cache_lock: del self._inflight[url]
+            future.set_result(result)
+        return result
+
+    def _revalidate(self, url, entry):
+        generation = self._generation
+        hdrs = dict(self._hdrs)
+        if entry is not None:
+            if entry[1] is not None: hdrs['If-None-Match'] = entry[1]
+            if entry[2] is not None: hdrs['If-Modified-Since'] = entry[2]
+        r = self._send('GET', url, headers=hdrs, timeout=self._timeout)
+        if r is None: return (False, None)
+
+        if r.status_code == 304 and entry is not None:
+            self._log.info(f'{url} -> 304')
+            body = entry[3]
+        elif 200 <= r.status_code < 300:
+            self._log.info(f'{url} -> {r.status_code}')
+            body = r.content
+        else:
+            self._log.warn(f'{self._url}{url} -> {r.status_code}')
+            with self._cache_lock: self._drop(url)
+            return (False, r.status_code)
+
+        etag = r.headers.get('ETag', entry[1] if entry is not None else None)
+        modified = r.headers.get('Last-Modified', entry[2] if entry is not None else None)
+        with self._cache_lock:
+            self._drop(url)
+            # responses that can't be revalidated are only kept while fresh,
+            # and large ones, ie. thumbnails, aren't kept at all
+            if generation == self._generation and len(body) <= self.cache_bytes // 4 and (self.cache_ttl > 0 or etag is not None or modified is not None):
+                self._cache[url] = (time.monotonic() + self.cache_ttl, etag, modified, body)
+                self._cache_used += len(body)
+                # oldest first, since entries are moved to the end when stored
+                while len(self._cache) > self.cache_size or self._cache_used > self.cache_bytes: self._drop(next(iter(self._cache)))
+        return (True, body)
+
+    def _do_request(self, url, method='GET', data=None, invalidates=()):
+        if method == 'GET' and data is None:
+            (r, body) = self._get(url)
+            if not r: return (False, body)
+            # parsed for each caller, so callers can't change the cached response
+            try:
+                return (True, json.loads(body))
+            except ValueError:
+                return (True, None)
+
+        # only what the request changes
+        if invalidates: self.invalidate(invalidates)
+        r = self._send(method, url, headers=self._hdrs, json=data, timeout=self._timeout)
+        if r is None: return (False, None)
         if 200 <= r.status_code < 300:
             self._log.info(f'{url} -> {r.status_code}')
             try:
@@ -87,6 +249,107 @@ class OctoClient:
         """
         return f'{self._url}{"/" if path[0] != "/" else ""}{path}'
 
+    def download(self, path):
+        """
+        Download a file, such as a thumbnail.
+
+        Parameters
+        ----------
+        path : str
+            the path to download, relative to the OctoPrint url
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : bytes or int
+            the file contents on success or the HTTP response code on failure
+        """
+        return self._get(path if path[0] == '/' else f'/{path}')
+
+    def download_to(self, path, filename, chunk_size=1024*1024):
+        """
+        Download a file straight to disk, such as G-code.
+
+        The file is streamed, it is never held in memory as a whole, and
+        it isn't cached.
+
+        Parameters
+        ----------
+        path : str
+            the path to download, relative to the OctoPrint url
+        filename : str
+            the local file to write
+        chunk_size : int
+            the number of bytes written at a time, default 1MB
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : int or None
+            the number of bytes written on success or the HTTP response code on failure
+        """
+        url = path if path[0] == '/' else f'/{path}'
+        r = self._send('GET', url, headers=self._hdrs, timeout=self._timeout, stream=True)
+        if r is None: return (False, None)
+        with r:
+            if r.status_code != 200:
+                self._log.warn(f'{self._url}{url} -> {r.status_code}')
+                return (False, r.status_code)
+            size = 0
+            try:
+                with open(filename, 'wb') as f:
+                    for chunk in r.iter_content(chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+            except (OSError, requests.RequestException) as ex:
+                self._log.error(f"Couldn't download {url}: {ex}")
+                return (False, None)
+        self._log.info(f'{url} -> {r.status_code}, {size} bytes')
+        return (True, size)
+
+    def download_head(self, path, size):
+        """
+        Download the first `size` bytes of a file, such as a G-code header.
+
+        A Range request is made. If the server ignores it, the download
+        is stopped after `size` bytes.
+
+        Parameters
+        ----------
+        path : str
+            the path to download, relative to the OctoPrint url
+        size : int
+            the number of bytes to download
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : bytes or int
+            up to `size` bytes on success or the HTTP response code on failure
+        """
+        url = path if path[0] == '/' else f'/{path}'
+        hdrs = dict(self._hdrs)
+        hdrs['Range'] = f'bytes=0-{size - 1}'
+        r = self._send('GET', url, headers=hdrs, timeout=self._timeout, stream=True)
+        if r is None: return (False, None)
+        with r:
+            if r.status_code not in (200, 206):
+                self._log.warn(f'{self._url}{url} -> {r.status_code}')
+                return (False, r.status_code)
+            data = bytearray()
+            try:
+                for chunk in r.iter_content(min(size, 64 * 1024)):
+                    data += chunk
+                    if len(data) >= size: break
+            except requests.RequestException as ex:
+                self._log.error(f"Couldn't download {url}: {ex}")
+                return (False, None)
+        self._log.info(f'{url} -> {r.status_code}, {len(data)} bytes')
+        return (True, bytes(data[:size]))
+
     def plugin_simple_api_command(self, plugin, data):
         """
         Perform a plugin simple api command.
@@ -147,6 +410,82 @@ class OctoClient:
         """
         return self._do_request('/api/version')
 
+    def settings(self):
+        """
+        Return OctoPrint settings.
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : dict or int
+            the octoprint settings on success or the HTTP response code on failure
+        """
+        return self._do_request('/api/settings')
+
+    def webcam_stream_url(self):
+        """
+        Return the full url of the webcam stream.
+
+        An absolute url on a loopback host (ie. OctoPrint's default
+        'http://127.0.0.1:8080/...') is local to the printer's host, so
+        its host is replaced with the host of this client's base url.
+        That only works if the webcam server listens on an address the
+        dashboard can reach, not just on 127.0.0.1.
+
+        Returns
+        -------
+        success : bool
+            False if the settings couldn't be read
+        url : str or None
+            the stream url, or None if the webcam is disabled or the
+            settings couldn't be read
+        """
+        return self._webcam_url('streamUrl')
+
+    def webcam_snapshot_url(self):
+        """
+        Return the full url of the webcam snapshot.
+
+        An absolute url on a loopback host (ie. OctoPrint's default
+        'http://127.0.0.1:8080/...') is local to the printer's host, so
+        its host is replaced with the host of this client's base url.
+        That only works if the webcam server listens on an address the
+        dashboard can reach, not just on 127.0.0.1.
+
+        Returns
+        -------
+        success : bool
+            False if the settings couldn't be read
+        url : str or None
+            the snapshot url, or None if the webcam is disabled or the
+            settings couldn't be read
+        """
+        return self._webcam_url('snapshotUrl')
+
+    def _webcam_url(self, key):
+        (r, data) = self.settings()
+        if not r: return (False, None)
+        webcam = data.get('webcam')
+        if not webcam or not webcam.get('webcamEnabled', True) or not webcam.get(key): return (True, None)
+        return (True, self._reachable_url(webcam[key]))
+
+    def _reachable_url(self, url):
+        if not (url.startswith('http:') or url.startswith('https:')): return self.full_url(url)
+
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname or ''
+        if host != 'localhost' and not host.startswith('127.') and host != '::1': return url
+        # local to the printer's host, not to the dashboard's
+        base = urllib.parse.urlsplit(self._url).hostname
+        if base is None: return url
+        if ':' in base: base = f'[{base}]'
+        netloc = base if parts.port is None else f'{base}:{parts.port}'
+        if parts.username is not None:
+            userinfo = parts.username if parts.password is None else f'{parts.username}:{parts.password}'
+            netloc = f'{userinfo}@{netloc}'
+        return urllib.parse.urlunsplit(parts._replace(netloc=netloc))
+
     def login(self):
         """
         Perform a passive login using the api key supplied with this client.
@@ -160,7 +499,7 @@ class OctoClient:
         """
         return self._do_request('/api/login', 'POST', {'passive': True})
 
-    def file(self, location, path):
+    def file(self, location, path, recursive=False):
         """
         Return file or folder information.
 
@@ -170,6 +509,8 @@ class OctoClient:
             the location or origin. should be one of: 'sdcard', 'local'
         path : str
             the path of the file or folder. may be None or '' to get the root folder
+        recursive : bool
+            include the contents of all sub folders, default False
 
         Returns
         -------
@@ -178,8 +519,9 @@ class OctoClient:
         data : dict or int
             the file or folder info on success or the HTTP response code on failure            
         """
-        if path is not None and len(path) > 0: return self._do_request(f'/api/files/{location}/{path}')
-        else: return self._do_request(f'/api/files/{location}')
+        query = '?recursive=true' if recursive else ''
+        if path is not None and len(path) > 0: return self._do_request(f'/api/files/{location}/{path}{query}')
+        else: return self._do_request(f'/api/files/{location}{query}')
 
     def select_file(self, location, path):
         """
@@ -199,7 +541,7 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure            
         """
-        return self._do_request(f'/api/files/{location}/{path}', 'POST', {'command':'select'})
+        return self._do_request(f'/api/files/{location}/{path}', 'POST', {'command':'select'}, ('/api/files',))
 
     def delete_file(self, location, path):
         """
@@ -219,7 +561,87 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure
         """
-        return self._do_request(f'/api/files/{location}/{path}','DELETE')
+        return self._do_request(f'/api/files/{location}/{path}','DELETE', invalidates=('/api/files',))
+
+    def move_file(self, location, path, destination):
+        """
+        Move a file or folder.
+
+        Parameters
+        ----------
+        location : str
+            the location or origin. should be one of: 'sdcard', 'local'
+        path : str
+            the path of the file or folder
+        destination : str
+            the path of the folder to move it into
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : dict or int
+            the new file info on success or the HTTP response code on failure
+        """
+        return self._do_request(f'/api/files/{location}/{path}', 'POST', {'command':'move', 'destination': destination}, ('/api/files',))
+
+    def upload_file(self, local, location='local', path='', select=False, print_after=False, progress=None):
+        """
+        Upload a local file.
+
+        The file is streamed from disk, it is never read into memory as a whole.
+
+        Parameters
+        ----------
+        local : str or SharedFile
+            the local file name, or a SharedFile to share it between uploads
+        location : str
+            the location to upload to. should be one of: 'sdcard', 'local'
+        path : str
+            the folder to upload into, default '' (the root folder)
+        select : bool
+            select the file after uploading, default False
+        print_after : bool
+            start printing the file after uploading, default False
+        progress : function
+            called as progress(sent, total) while uploading
+
+        Returns
+        -------
+        success : bool
+            indicates success or failure
+        data : dict or int
+            the upload result on success or the HTTP response code on failure
+        """
+        if isinstance(local, SharedFile):
+            return self._upload(MultipartUpload(local, self._upload_fields(path, select, print_after), progress=progress), location)
+        with SharedFile(local) as shared:
+            return self._upload(MultipartUpload(shared, self._upload_fields(path, select, print_after), progress=progress), location)
+
+    def _upload_fields(self, path, select, print_after):
+        fields = {}
+        if path: fields['path'] = path
+        if select: fields['select'] = 'true'
+        if print_after: fields['print'] = 'true'
+        return fields
+
+    def _upload(self, body, location):
+        url = f'/api/files/{location}'
+        self.invalidate(('/api/files',))
+        hdrs = dict(self._hdrs)
+        hdrs['Content-Type'] = body.content_type
+        # no read timeout, OctoPrint only answers once the whole file is stored
+        r = self._send('POST', url, headers=hdrs, data=body, timeout=(self._timeout[0], None))
+        if r is None: return (False, None)
+        if 200 <= r.status_code < 300:
+            self._log.info(f'{url} -> {r.status_code}')
+            try:
+                return (True, r.json())
+            except requests.exceptions.JSONDecodeError:
+                return (True, None)
+        else:
+            self._log.warn(f'{self._url}{url} -> {r.status_code}')
+            return (False, r.status_code)
 
     def start_job(self):
         """
@@ -234,7 +656,7 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure
         """
-        return self._do_request(f'/api/job', 'POST', {'command':'start'})
+        return self._do_request(f'/api/job', 'POST', {'command':'start'}, ('/api/files',))
 
     def pause_job(self):
         """
@@ -247,7 +669,7 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure
         """
-        return self._do_request(f'/api/job', 'POST', {'command':'pause', 'action': 'pause'})
+        return self._do_request(f'/api/job', 'POST', {'command':'pause', 'action': 'pause'}, ('/api/files',))
 
     def resume_job(self):
         """
@@ -260,7 +682,7 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure
         """
-        return self._do_request(f'/api/job', 'POST', {'command':'pause', 'action':'resume'})
+        return self._do_request(f'/api/job', 'POST', {'command':'pause', 'action':'resume'}, ('/api/files',))
 
     def cancel_job(self):
         """
@@ -273,4 +695,4 @@ class OctoClient:
         data : None or int
             None on success or the HTTP response code on failure
         """
-        return self._do_request(f'/api/job', 'POST', {'command':'cancel'})
\ No newline at end of file
+        return self._do_request(f'/api/job', 'POST', {'command':'cancel'}, ('/api/files',))
\ No newline at end of file
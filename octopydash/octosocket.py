@@ -21,21 +21,38 @@ import random
 import string
 import datetime
 import threading
+import time
 import queue    
 
+from octopydash.subscription import Subscription, WeakCallback
+
 class OctoSocket:
     """
     An OctoPrint websocket client.
 
+    Messages are dispatched through a table built when callbacks are
+    added, by message type and, for 'plugin' and 'event' messages, by
+    plugin id or event type. Each callback is isolated: an exception is
+    logged and counted instead of stopping the socket, and the time
+    spent in each callback is recorded, see `callback_stats`.
+
     Methods
     -------
     connect : connect to the websocket
     close : close the websocket connection
-    add_callback : add a message callback
+    add_callback : add a message callback, returns a Subscription
+    callback_stats : return call counts, failures and timing per callback
     send_json : send a json message
+    require : request optional data from OctoPrint
+    release : release optional data requested with `require`
+    subscription : return the subscription for the current requirements
+    subscribe : send the subscription to OctoPrint
     """
 
-    def __init__(self, baseurl):
+    # the data member that sub-routes each message type
+    SUBKEYS = {'plugin': 'plugin', 'event': 'type'}
+
+    def __init__(self, baseurl, slow_callback=0.05):
         """
         An OctoPrint websocket client.
 
@@ -43,16 +60,34 @@ class OctoSocket:
         ----------
         baseurl : str
             the URL to the OctoPrint instance
+        slow_callback : float
+            callbacks taking longer than this many seconds are logged,
+            default 0.05
         """
         self._log = logging.getLogger(f'{__name__} - {baseurl}')
         random.seed()
         server_code = random.randrange(100,999)
         session_code = ''.join(random.choices(string.ascii_lowercase, k=16))
         self._url = f'{baseurl}/sockjs/{server_code}/{session_code}/websocket'
+        self.slow_callback = slow_callback
+        # (type, plugin id or event type or None) -> [callback]
         self._callbacks = {}
+        # the same, with the catch-all callbacks merged in, see _rebuild
+        self._dispatch = {}
+        # callback -> [calls, failures, total seconds, max seconds]
+        self._stats = {}
+        self._cb_lock = threading.Lock()
+        # subscriptions of weak callbacks whose objects are gone. they are
+        # cancelled outside of the lock, the garbage collector can free an
+        # object, and run its callback, while the lock is held
+        self._dead = []
+        # callbacks whose subscriptions are paused
+        self._paused = set()
         self._should_close = False
         self._msg_queue = queue.Queue()
         self._last_hb = None
+        self._requirements = {}
+        self._subscribed = None
 
     async def _connect(self):
         async for websocket in websockets.connect(self._url):
@@ -68,9 +103,7 @@ class OctoSocket:
                             msgs = json.loads(message[1:])
                             for m in msgs:
                                 for msgtype in m:
-                                    if msgtype in self._callbacks:
-                                        for cb in self._callbacks[msgtype]:
-                                            cb(m[msgtype])
+                                    self._dispatch_message(msgtype, m[msgtype])
                         elif message[0] == 'h':
                             self._log.info("socket heartbeat <3")
                             self._last_hb = datetime.datetime.now()
@@ -85,27 +118,85 @@ class OctoSocket:
                 self._log.info("socket closed.")
                 return
             except websockets.ConnectionClosedError as ex:
+                self._on_disconnected()
                 continue
             except websockets.ConnectionClosedOK as ex:
+                self._on_disconnected()
                 continue
 
+    def _on_disconnected(self):
+        self._log.info("socket lost, reconnecting...")
+        self._dispatch_message('disconnected', None)
+
+    def _dispatch_message(self, msgtype, data):
+        if self._dead: self._purge()
+        table = self._dispatch
+        sub = None
+        field = self.SUBKEYS.get(msgtype)
+        if field is not None and isinstance(data, dict): sub = data.get(field)
+        callbacks = table.get((msgtype, sub)) or table.get((msgtype, None), ())
+        paused = self._paused
+        for cb in callbacks:
+            if cb in paused: continue
+            # the callback may have been removed since the table was read
+            stats = self._stats.get(cb) or [0, 0, 0.0, 0.0]
+            start = time.perf_counter()
+            try:
+                cb(data)
+            except Exception:
+                stats[1] += 1
+                self._log.exception("%s callback %s failed", msgtype, self._callback_name(cb))
+            elapsed = time.perf_counter() - start
+            stats[0] += 1
+            stats[2] += elapsed
+            if elapsed > stats[3]: stats[3] = elapsed
+            if elapsed > self.slow_callback:
+                self._log.warning("%s callback %s took %.0fms", msgtype, self._callback_name(cb), elapsed * 1000)
+
+    @staticmethod
+    def _callback_name(cb):
+        return getattr(cb, '__qualname__', repr(cb))
+
+    def _rebuild(self):
+        table = {}
+        for (cb_type, key), callbacks in self._callbacks.items():
+            if key is None: table[(cb_type, None)] = tuple(callbacks)
+            else: table[(cb_type, key)] = tuple(self._callbacks.get((cb_type, None), ())) + tuple(callbacks)
+        # swapped in whole, the socket thread may be dispatching
+        self._dispatch = table
+
+    def callback_stats(self):
+        """
+        Return call counts, failures and timing per callback.
+
+        Returns
+        -------
+        list of tuples
+            (name, calls, failures, total seconds, max seconds) for each
+            callback, the most expensive first
+        """
+        stats = [(self._callback_name(cb), *s) for cb, s in self._stats.items()]
+        return sorted(stats, key=lambda s: -s[3])
+
     def close(self):
         """Close the websocket connection."""
         self._log.info("Signaling socket close...")
         self._should_close = True
 
-    def add_callback(self, cb_type, callback):
+    def add_callback(self, cb_type, callback, key=None, weak=False):
         """
         Add a message callback.
 
         Add a callback function that will be called with data for
-        each message recieved with the given `cb_type`.
+        each message recieved with the given `cb_type`, and `key` if
+        given.
 
         Parameters
         ----------
         cb_type : str
             a message type to attach this callback to. one of:
              - 'connected' - initial connection info
+             - 'disconnected' - the connection was lost, data is None
              - 'reauthRequired'
              - 'current' - general status update
              - 'history' - status and history sent upon intitial connection
@@ -115,10 +206,135 @@ class OctoSocket:
         callback : function
             a function to call on the given `cb_type` event. should
             accept a single data parameter
+        key : str
+            only call `callback` for 'plugin' messages from this plugin id,
+            or 'event' messages of this event type. default None, all
+            messages of `cb_type`. 'plugin' messages must still be
+            requested with `require`
+        weak : bool
+            only keep a weak reference to `callback`, which must be a
+            bound method. once its object is garbage collected it is
+            removed, with the next message or added callback. default False
+
+        Returns
+        -------
+        Subscription
+            cancel it to remove the callback
+        """
+        sub = Subscription(lambda: self._remove_callback(cb_type, key, entry), lambda: self._paused.add(entry), lambda: self._paused.discard(entry))
+        entry = WeakCallback(callback, lambda: self._dead.append(sub)) if weak else callback
+        self._purge()
+        with self._cb_lock:
+            self._callbacks.setdefault((cb_type, key), []).append(entry)
+            self._stats.setdefault(entry, [0, 0, 0.0, 0.0])
+            self._rebuild()
+        if cb_type == 'event': self.require('events', key)
+        return sub
+
+    def _purge(self):
+        while self._dead:
+            try: sub = self._dead.pop()
+            except IndexError: break
+            sub.cancel()
+
+    def _remove_callback(self, cb_type, key, entry):
+        self._paused.discard(entry)
+        with self._cb_lock:
+            callbacks = self._callbacks.get((cb_type, key), [])
+            for i, cb in enumerate(callbacks):
+                if cb is entry:
+                    del callbacks[i]
+                    break
+            else:
+                return
+            if not callbacks: del self._callbacks[(cb_type, key)]
+            if not any(cb is entry for cbs in self._callbacks.values() for cb in cbs): self._stats.pop(entry, None)
+            self._rebuild()
+        if cb_type == 'event': self.release('events', key)
+
+    def require(self, kind, name=None):
         """
-        if cb_type not in self._callbacks:
-            self._callbacks[cb_type] = []
-        self._callbacks[cb_type].append(callback)
+        Request optional data from OctoPrint.
+
+        OctoPyDash only subscribes to the data that something requires,
+        everything else is filtered out by OctoPrint before it is sent.
+        Each call should be matched by a call to `release` once the data
+        is no longer needed.
+
+        Parameters
+        ----------
+        kind : str
+            one of:
+             - 'logs' - the terminal log lines in 'current' messages
+             - 'messages' - the terminal messages in 'current' messages
+             - 'events' - 'event' messages, all of them if `name` is None
+             - 'plugin' - 'plugin' messages from plugin `name`
+        name : str
+            an event type or plugin id, see `kind`
+        """
+        key = (kind, name)
+        self._requirements[key] = self._requirements.get(key, 0) + 1
+        if self._requirements[key] == 1: self._renegotiate()
+
+    def release(self, kind, name=None):
+        """
+        Release optional data requested with `require`.
+
+        Parameters
+        ----------
+        kind : str
+            see `require`
+        name : str
+            see `require`
+        """
+        key = (kind, name)
+        count = self._requirements.get(key, 0) - 1
+        if count > 0:
+            self._requirements[key] = count
+        else:
+            self._requirements.pop(key, None)
+            self._renegotiate()
+
+    def subscription(self):
+        """
+        Return the subscription for the current requirements.
+
+        Returns
+        -------
+        dict
+            the 'subscribe' message payload
+        """
+        kinds = {}
+        for kind, name in self._requirements:
+            kinds.setdefault(kind, set()).add(name)
+
+        events = kinds.get('events', set())
+        if None in events: events = True
+        else: events = sorted(events) if events else False
+
+        plugins = kinds.get('plugin', set())
+        plugins = sorted(plugins) if plugins else False
+
+        return {
+            'state': {'logs': 'logs' in kinds, 'messages': 'messages' in kinds},
+            'events': events,
+            'plugins': plugins,
+        }
+
+    def subscribe(self):
+        """
+        Send the subscription for the current requirements.
+
+        This must be sent after each (re)connect, once authenticated.
+        """
+        self._subscribed = self.subscription()
+        self._log.info('Subscribing to %s', self._subscribed)
+        self.send_json({'subscribe': self._subscribed})
+
+    def _renegotiate(self):
+        # only resend once subscribed, the first subscription is sent after login
+        if self._subscribed is not None and self.subscription() != self._subscribed:
+            self.subscribe()
 
     def send_json(self, data):
         """
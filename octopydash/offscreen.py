@@ -0,0 +1,582 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+The dashboard drawn without Tk, for e-paper and framebuffer displays.
+
+The LCARS layout is drawn with PIL into an image in memory. Printer
+state changes mark regions of a panel as dirty, only those regions are
+drawn again, and only the rectangles whose pixels actually changed are
+pushed to a sink, no more often than a minimum interval.
+
+Run with `python -m octopydash.offscreen --fb /dev/fb1` or
+`--png /path/to/file.png`, after setting up the printers in `main`.
+
+Classes
+-------
+OffscreenDashboard : draws the printers and pushes the changes to a sink
+FileSink : writes the image to a file
+FramebufferSink : writes the changed rectangles to a Linux framebuffer
+RecordingSink : keeps the pushed updates, ie. for tests
+
+Functions
+---------
+merge_rects : merge overlapping rectangles
+"""
+import argparse
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+import time
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from octopydash.geometry import flatten, frame_coords, job_bar_coords
+from octopydash.laststate import LastStateStore
+from octopydash.printer import Printer
+from octopydash.thumbnails import decode
+
+@functools.lru_cache(maxsize=16)
+def _font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', int(size))
+    except OSError:
+        pass
+    try:
+        return ImageFont.load_default(int(size))
+    except TypeError:
+        # Pillow before 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+def _fit(draw, text, font, width):
+    if draw.textlength(text, font=font) <= width: return text
+    while text and draw.textlength(text + '...', font=font) > width: text = text[:-1]
+    return text + '...'
+
+def merge_rects(rects, size, full_ratio=0.5):
+    """
+    Merge overlapping or touching rectangles.
+
+    Parameters
+    ----------
+    rects : list of tuple
+        (x0, y0, x1, y1) rectangles
+    size : tuple
+        (width, height) of the whole image
+    full_ratio : float
+        if the merged rectangles cover more than this part of the
+        image, the whole image is returned as one rectangle. default 0.5
+
+    Returns
+    -------
+    list of tuple
+    """
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for r in rects:
+            for j, o in enumerate(out):
+                if r[0] <= o[2] and o[0] <= r[2] and r[1] <= o[3] and o[1] <= r[3]:
+                    out[j] = (min(r[0], o[0]), min(r[1], o[1]), max(r[2], o[2]), max(r[3], o[3]))
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
+    area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+    if area > size[0] * size[1] * full_ratio: return [(0, 0, size[0], size[1])]
+    return rects
+
+class FileSink:
+    """
+    Writes the whole image to a file after every update.
+
+    For viewers, or e-paper drivers that take an image file. The file is
+    replaced atomically, so a reader never sees half of it.
+    """
+
+    size = None
+
+    def __init__(self, path, mode=None):
+        """
+        Writes the whole image to a file.
+
+        Parameters
+        ----------
+        path : str
+            the file written, its extension picks the format
+        mode : str
+            convert the image to this PIL mode first, ie. '1' or 'L' for
+            e-paper. default None, no conversion
+        """
+        self.path = path
+        self.mode = mode
+
+    def push(self, image, rects):
+        img = image.convert(self.mode) if self.mode is not None else image
+        (base, ext) = os.path.splitext(self.path)
+        tmp = f'{base}.tmp{ext}'
+        img.save(tmp)
+        os.replace(tmp, self.path)
+
+    def close(self):
+        pass
+
+class FramebufferSink:
+    """
+    Writes the changed rectangles to a Linux framebuffer device.
+
+    The geometry and pixel format are read from sysfs. 16 (RGB565), 24
+    and 32 bits per pixel are supported.
+    """
+
+    def __init__(self, device='/dev/fb0'):
+        """
+        Writes the changed rectangles to a framebuffer.
+
+        Parameters
+        ----------
+        device : str
+            the framebuffer device, default '/dev/fb0'
+        """
+        self.device = device
+        self._log = logging.getLogger(__name__)
+        sysfs = f'/sys/class/graphics/{os.path.basename(device)}'
+        with open(f'{sysfs}/virtual_size') as f: self.size = tuple(int(v) for v in f.read().strip().split(','))
+        with open(f'{sysfs}/bits_per_pixel') as f: self.bpp = int(f.read())
+        with open(f'{sysfs}/stride') as f: self.stride = int(f.read())
+        if self.bpp not in (16, 24, 32): raise ValueError(f'{device}: {self.bpp} bits per pixel is not supported')
+        self._fd = os.open(device, os.O_RDWR)
+        self._log.info('%s: %dx%d, %d bpp', device, self.size[0], self.size[1], self.bpp)
+
+    def _pack(self, img):
+        if self.bpp == 32: return img.tobytes('raw', 'BGRX')
+        if self.bpp == 24: return img.tobytes('raw', 'BGR')
+        # RGB565, little endian. the bits of each byte come from different
+        # bands and don't overlap, so adding them is the same as or-ing
+        (r, g, b) = img.split()
+        hi = ImageChops.add(r.point(lambda v: v & 0xf8), g.point(lambda v: v >> 5))
+        lo = ImageChops.add(g.point(lambda v: (v << 3) & 0xe0), b.point(lambda v: v >> 3))
+        return Image.merge('LA', (lo, hi)).tobytes()
+
+    def push(self, image, rects):
+        pixel = self.bpp // 8
+        for (x0, y0, x1, y1) in rects:
+            x1 = min(x1, self.size[0])
+            y1 = min(y1, self.size[1])
+            if x1 <= x0 or y1 <= y0: continue
+            data = self._pack(image.crop((x0, y0, x1, y1)).convert('RGB'))
+            row = (x1 - x0) * pixel
+            for y in range(y1 - y0):
+                os.pwrite(self._fd, data[y*row:(y+1)*row], (y0 + y) * self.stride + x0 * pixel)
+
+    def close(self):
+        os.close(self._fd)
+
+class RecordingSink:
+    """
+    Keeps the pushed updates, ie. for tests and benchmarks.
+
+    Attributes
+    ----------
+    pushes : list of tuple
+        (time.monotonic(), rects) for each push
+    image : Image
+        a copy of the image as of the last push
+    """
+
+    def __init__(self, size=None):
+        """
+        Keeps the pushed updates.
+
+        Parameters
+        ----------
+        size : tuple
+            (width, height) reported to the dashboard, default None
+        """
+        self.size = size
+        self.pushes = []
+        self.image = None
+
+    def push(self, image, rects):
+        self.pushes.append((time.monotonic(), list(rects)))
+        self.image = image.copy()
+
+    def close(self):
+        pass
+
+class _Panel:
+    # everything drawn for one printer, laid out like PrinterPanel
+
+    REGIONS = (
+        ('status', ('state.text', 'online', 'stale')),
+        ('power', ('psu', 'online', 'stale')),
+        ('file', ('job.file', 'stale')),
+        ('progress', ('progress', 'flags', 'online', 'stale')),
+    )
+
+    def __init__(self, printer, x, width, height, side_loc, color):
+        self.printer = printer
+        self.color = color
+        self.right = side_loc == 'right'
+        self.frame = flatten(frame_coords(width-2, height, side_loc), x=x + (0 if self.right else 2))
+
+        self.status_font = _font(22)
+        self.small_font = _font(14)
+        self.status_box = (x + 20, 0, x + width - 20, 40)
+        if self.right: self.power_box = (x + 20, height - 80, x + 120, height)
+        else: self.power_box = (x + width - 120, height - 80, x + width - 20, height)
+
+        # the job box, with the bar around the thumbnail
+        jw = width - 32
+        jh = height - 140
+        jx = x + 10 if self.right else x + width - 10 - jw
+        jy = 50
+        self.bar = flatten(job_bar_coords(jw, jh, 'left' if self.right else 'right'), x=jx, y=jy)
+        if self.right: self.file_box = (jx + 35, jy, jx + jw - 5, jy + jh - 60)
+        else: self.file_box = (jx + 5, jy, jx + jw - 35, jy + jh - 60)
+        self.progress_box = (self.file_box[0], jy + jh - 50, self.file_box[2], jy + jh - 10)
+        self.thumb_size = (self.file_box[2] - self.file_box[0], self.file_box[3] - self.file_box[1] - 10)
+
+        # the thumbnail and name of the job, set from the fetch thread
+        self.thumb = None
+        self.display = None
+        self.generation = 0
+        self.refetch = False
+
+    def regions(self, changed):
+        return [name for (name, fields) in self.REGIONS if not changed.isdisjoint(fields)]
+
+    def box(self, name):
+        return getattr(self, f'{name}_box')
+
+    def draw_background(self, draw):
+        draw.polygon(self.frame, fill=self.color)
+        draw.polygon(self.bar, fill='#ffcc66')
+
+    def draw(self, draw, image, name):
+        getattr(self, f'_draw_{name}')(draw, image)
+
+    def _draw_status(self, draw, image):
+        state = self.printer.state
+        color = self.color if state.online and not state.stale else '#555555'
+        if not state.online: text = 'Unreachable'
+        elif state.stale: text = f'{state.state_text} (stale)'
+        else: text = state.state_text
+
+        (x0, y0, x1, y1) = self.status_box
+        name_w = draw.textlength(self.printer.name, font=self.status_font)
+        status_x = 10 + name_w + 30
+        text = _fit(draw, text, self.status_font, x1 - x0 - status_x - 10)
+        width = min(x1 - x0, status_x + draw.textlength(text, font=self.status_font) + 10)
+        left = x0 if self.right else x1 - width
+        mid = (y0 + y1) / 2
+        draw.rectangle((left, y0, left + width - 1, y1 - 1), fill='#000000')
+        draw.text((left + 10, mid), self.printer.name, fill=color, font=self.status_font, anchor='lm')
+        sep = left + 10 + name_w + 15
+        draw.ellipse((sep - 5, mid - 5, sep + 5, mid + 5), fill=color)
+        draw.text((left + status_x, mid), text, fill=color, font=self.status_font, anchor='lm')
+
+    def _draw_power(self, draw, image):
+        state = self.printer.state
+        if not state.online or state.stale or state.psu_on is None: color = '#666688'
+        else: color = '#33cc99' if state.psu_on else '#dd4444'
+        (x0, y0, x1, y1) = self.power_box
+        draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill='#000000')
+        draw.rounded_rectangle((x0 + 2, y0 + 2, x1 - 3, y1 - 3), radius=10, fill=color)
+        draw.text(((x0 + x1) / 2, (y0 + y1) / 2), 'POWER', fill='#000000', font=self.small_font, anchor='mm')
+
+    def _draw_file(self, draw, image):
+        job_file = self.printer.state.job_file
+        (x0, y0, x1, y1) = self.file_box
+        draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill='#000000')
+        if job_file is None: return
+        thumb = self.thumb
+        if thumb is not None:
+            tx = x0 + (self.thumb_size[0] - thumb.width) // 2
+            ty = y0 + 10 + (self.thumb_size[1] - thumb.height) // 2
+            if thumb.mode == 'RGBA': image.paste(thumb, (tx, ty), thumb)
+            else: image.paste(thumb, (tx, ty))
+        text = self.display or job_file.get('display') or job_file.get('name') or job_file.get('path') or ''
+        text = _fit(draw, text, self.small_font, x1 - x0)
+        (l, t, r, b) = draw.textbbox((0, 0), text, font=self.small_font)
+        tx = x0 if self.right else x1 - (r - l)
+        draw.rectangle((tx, y0 + 5, tx + r - l, y0 + 5 + b), fill='#000000')
+        draw.text((tx - l, y0 + 5), text, fill='#ffcc66', font=self.small_font)
+
+    def _draw_progress(self, draw, image):
+        state = self.printer.state
+        flags = state.flags
+        (x0, y0, x1, y1) = self.progress_box
+        draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill='#000000')
+        progress = state.progress or {}
+        completion = progress.get('completion')
+        if completion is None or not (flags.get('printing') or flags.get('paused')): return
+
+        text = f'{completion:.0f}%'
+        left = progress.get('printTimeLeft')
+        if left is not None: text += f'  {int(left) // 3600}:{int(left) // 60 % 60:02d} left'
+        text_w = draw.textlength(text, font=self.small_font)
+        mid = (y0 + y1) / 2
+        bar_x1 = x1 - text_w - 10
+        color = '#555555' if not state.online or state.stale else '#ff7700' if flags.get('paused') else '#33cc99'
+        draw.rectangle((x0, mid - 8, bar_x1, mid + 8), outline='#333344')
+        fill_x = x0 + int((bar_x1 - x0) * min(completion, 100) / 100)
+        if fill_x > x0: draw.rectangle((x0, mid - 8, fill_x, mid + 8), fill=color)
+        draw.text((x1, mid), text, fill='#ffcc66', font=self.small_font, anchor='rm')
+
+class OffscreenDashboard:
+    """
+    The dashboard drawn with PIL and pushed to a sink, without Tk.
+
+    The printers are drawn side by side, each with the same frame,
+    status, power and job layout as a PrinterPanel. Each panel is split
+    into regions (status, power, job file and progress), and a printer
+    state change only marks the regions showing the changed fields as
+    dirty. A render thread draws the dirty regions again, compares them
+    to what was there, and pushes the rectangles that actually changed
+    to the sink. Updates that arrive within `min_interval` of the last
+    push are gathered into the next one.
+
+    A sink is any object with `push(image, rects)` and `close()`, see
+    FileSink, FramebufferSink and RecordingSink.
+
+    Methods
+    -------
+    start : draw everything, push it and start following the printers
+    close : stop following the printers and close the sink
+    """
+
+    COLORS = ('#88ccff', '#ffcc66')
+
+    def __init__(self, printers, sink, width, height, min_interval=1.0, last_state=None):
+        """
+        The dashboard drawn with PIL and pushed to a sink.
+
+        Parameters
+        ----------
+        printers : list of Printer
+            the printers shown, side by side
+        sink : object
+            where the changes are pushed, ie. a FramebufferSink
+        width : int
+
+        height : int
+
+        min_interval : float
+            the minimum seconds between pushes, ie. longer for e-paper.
+            default 1.0
+        last_state : LastStateStore
+            if given, job thumbnails are kept there and shown from there
+            while the printer state is stale. default None
+        """
+        self.printers = printers
+        self.sink = sink
+        self.size = (width, height)
+        self.min_interval = min_interval
+        self.last_state = last_state
+        self._log = logging.getLogger(__name__)
+
+        self.image = Image.new('RGB', self.size, '#000000')
+        col_width = width // max(1, len(printers))
+        self._panels = []
+        for i, p in enumerate(printers):
+            side = 'right' if i % 2 == 0 else 'left'
+            self._panels.append(_Panel(p, col_width * i, col_width, height, side, self.COLORS[i % len(self.COLORS)]))
+
+        # what the dirty regions are drawn over
+        self._background = Image.new('RGB', self.size, '#000000')
+        draw = ImageDraw.Draw(self._background)
+        for panel in self._panels: panel.draw_background(draw)
+
+        self._subs = []
+        # (panel index, region name) drawn on the next push
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_push = 0.0
+        self._thread = None
+        self._fetch_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='offscreen-thumbnail')
+
+    def start(self):
+        """Draw everything, push it to the sink and start following the printers."""
+        self.image.paste(self._background)
+        draw = ImageDraw.Draw(self.image)
+        for panel in self._panels:
+            for (name, fields) in panel.REGIONS: panel.draw(draw, self.image, name)
+            if panel.printer.state.job_file is not None: self._load_thumbnail(panel)
+        self._push([(0, 0) + self.size])
+
+        fields = set()
+        for (name, f) in _Panel.REGIONS: fields.update(f)
+        for i, panel in enumerate(self._panels):
+            self._subs.append(panel.printer.state.subscribe(fields, lambda state, changed, i=i: self.on_state(i, changed)))
+
+        self._thread = threading.Thread(target=self._run, name='offscreen', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop following the printers and close the sink."""
+        for sub in self._subs: sub.cancel()
+        self._subs = []
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None: self._thread.join()
+        self._fetch_pool.shutdown(wait=False)
+        self.sink.close()
+
+    def on_state(self, i, changed):
+        panel = self._panels[i]
+        if 'job.file' in changed: self._load_thumbnail(panel)
+        elif 'stale' in changed and not panel.printer.state.stale and panel.refetch: self._load_thumbnail(panel)
+        self._mark(i, panel.regions(changed))
+
+    def _mark(self, i, regions):
+        if not regions: return
+        with self._lock: self._dirty.update((i, name) for name in regions)
+        self._wake.set()
+
+    def _load_thumbnail(self, panel):
+        state = panel.printer.state
+        with self._lock:
+            panel.generation += 1
+            generation = panel.generation
+            panel.thumb = None
+            panel.display = None
+            panel.refetch = False
+        if state.job_file is None: return
+        self._fetch_pool.submit(self._fetch, panel, generation, dict(state.job_file), state.stale)
+
+    def _fetch(self, panel, generation, job_file, stale):
+        saved = None
+        if self.last_state is not None: saved = self.last_state.thumbnail_file(panel.printer.name, job_file)
+        img = None
+        display = None
+        refetch = False
+        try:
+            if stale:
+                # restored from a snapshot, use what was kept without going to the network
+                if saved is not None and os.path.exists(saved):
+                    with Image.open(saved) as f: img = f.convert('RGBA') if f.mode in ('RGBA', 'LA', 'P') else f.convert('RGB')
+                else:
+                    refetch = True
+            else:
+                (ret, file) = panel.printer.client.file(job_file.get('origin'), job_file.get('path'))
+                if ret:
+                    display = file.get('display')
+                    if 'thumbnail' in file:
+                        (r, data) = panel.printer.client.download(file['thumbnail'])
+                        if r: img = decode(data, *panel.thumb_size)
+                        else: self._log.warning("Couldn't get thumbnail: %s, %s", file['thumbnail'], data)
+                if img is not None and saved is not None:
+                    img.save(saved + '.tmp', 'PNG')
+                    os.replace(saved + '.tmp', saved)
+        except Exception:
+            self._log.exception("Couldn't load the thumbnail of %s", panel.printer.name)
+
+        with self._lock:
+            # the job changed while this was loading
+            if generation != panel.generation: return
+            panel.thumb = img
+            panel.display = display
+            panel.refetch = refetch
+        self._mark(self._panels.index(panel), ('file',))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            # slow displays can't take updates any faster, gather them
+            delay = self._last_push + self.min_interval - time.monotonic()
+            if delay > 0 and self._stop.wait(delay): break
+            if self._stop.is_set(): break
+            self._wake.clear()
+            with self._lock:
+                dirty = self._dirty
+                self._dirty = set()
+            try:
+                self._render(dirty)
+            except Exception:
+                self._log.exception("Couldn't draw the dashboard")
+
+    def _render(self, dirty):
+        draw = ImageDraw.Draw(self.image)
+        rects = []
+        for (i, name) in sorted(dirty):
+            panel = self._panels[i]
+            box = panel.box(name)
+            before = self.image.crop(box)
+            self.image.paste(self._background.crop(box), box[:2])
+            with self._lock: panel.draw(draw, self.image, name)
+            # only what actually looks different is pushed
+            bbox = ImageChops.difference(before, self.image.crop(box)).getbbox()
+            if bbox is not None: rects.append((box[0] + bbox[0], box[1] + bbox[1], box[0] + bbox[2], box[1] + bbox[3]))
+        if rects: self._push(merge_rects(rects, self.size))
+
+    def _push(self, rects):
+        self._log.debug('Pushing %s', rects)
+        try:
+            self.sink.push(self.image, rects)
+        except Exception:
+            self._log.exception("Couldn't push to %s", self.sink)
+        self._last_push = time.monotonic()
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m octopydash.offscreen', description='Draw the dashboard without Tk, on a framebuffer or into an image file.')
+    parser.add_argument('--fb', help='the framebuffer device to draw on, ie. /dev/fb1')
+    parser.add_argument('--png', help='the image file to write, ie. for an e-paper driver')
+    parser.add_argument('--mode', help="convert the image file to this PIL mode, ie. '1' or 'L'")
+    parser.add_argument('--size', help='WIDTHxHEIGHT, default is the framebuffer size or 1024x600')
+    parser.add_argument('--interval', type=float, default=1.0, help='the minimum seconds between updates, default 1')
+    args = parser.parse_args()
+    if (args.fb is None) == (args.png is None): parser.error('give one of --fb or --png')
+
+    logging.basicConfig(format='{asctime} - {name} - {levelname} - {message}', style='{', level=logging.INFO)
+    log = logging.getLogger('octopydash.offscreen')
+
+    # Change these to configure your printers, they are shown side by side
+    printers = [
+        Printer("Printer A Name", "http://printer-a-url", "PRINTERAPIKEY"),
+        Printer("Printer B Name", "http://printer-b-url", "PRINTERAPIKEY"),
+    ]
+
+    sink = FramebufferSink(args.fb) if args.fb is not None else FileSink(args.png, args.mode)
+    if args.size is not None: size = tuple(int(v) for v in args.size.lower().split('x'))
+    else: size = sink.size or (1024, 600)
+
+    # show the printers as they were last time until they answer
+    last_state = LastStateStore(os.path.expanduser('~/.octopydash/last'))
+    for p in printers: last_state.attach(p)
+
+    dash = OffscreenDashboard(printers, sink, size[0], size[1], args.interval, last_state)
+    dash.start()
+    log.info('Starting up sockets...')
+    for p in printers: p.socket.connect()
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        log.info('Caught sigint, closing sockets...')
+    finally:
+        for p in printers: p.socket.close()
+        for p in printers: p.socket.thread.join(10)
+        dash.close()
+        last_state.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import base64
+import binascii
+import hashlib
+import math
+import mmap
+import os
+import re
+
+from PIL import Image, ImageDraw
+
+# numpy is optional, it makes rendering large files much faster
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# the commands that matter for a preview, and their parameters
+COMMAND = re.compile(rb'^[ \t]*(G[0-3]|G0[0-3]|G9[012]|M8[23])(?![0-9])([^;\n]*)', re.M)
+PARAM = re.compile(rb'([XYZE])\s*([-+]?[0-9]*\.?[0-9]+)')
+
+VIEWS = ('top', 'iso')
+
+# base64 thumbnails slicers embed in G-code comments, ie.
+# ; thumbnail begin 300x300 12345
+# ; iVBORw0KG...
+# ; thumbnail end
+# PrusaSlicer also writes thumbnail_JPG and thumbnail_QOI blocks
+THUMBNAIL = re.compile(rb'^;[ \t]*(thumbnail(?:_JPG|_PNG)?) begin[ \t]+(\d+)x(\d+)[^\n]*\n(.*?)^;[ \t]*\1 end', re.M | re.S)
+
+# the colors of the lowest and highest layers
+LOW_COLOR = (0xdd, 0x44, 0x44)
+HIGH_COLOR = (0xff, 0xcc, 0x66)
+
+ISO_X = math.cos(math.radians(30))
+ISO_Y = math.sin(math.radians(30))
+
+def iter_segments(buf, batch=16384):
+    """
+    Yield the extruding moves of G-code in batches.
+
+    Handles absolute and relative positioning (G90/G91), absolute and
+    relative extrusion (M82/M83) and position resets (G92). Arcs are
+    treated as straight moves to their end point.
+
+    Parameters
+    ----------
+    buf : bytes, mmap or other buffer
+        the G-code
+    batch : int
+        the maximum number of moves per batch, default 16384
+
+    Yields
+    ------
+    list of tuples
+        (x0, y0, x1, y1, z) for each move that extrudes and moves in X or Y
+    """
+    x = y = z = e = 0.0
+    absolute = True
+    e_absolute = True
+    # the position is unknown until X and Y are first set, 1 | 2 once known
+    known = 0
+    out = []
+    for m in COMMAND.finditer(buf):
+        cmd = m.group(1)
+        if cmd[0] == 71 and cmd[1] == 57: # G9x
+            if cmd == b'G90': absolute = e_absolute = True
+            elif cmd == b'G91': absolute = e_absolute = False
+            else:
+                for axis, v in PARAM.findall(m.group(2)):
+                    if axis == b'X':
+                        x = float(v)
+                        known |= 1
+                    elif axis == b'Y':
+                        y = float(v)
+                        known |= 2
+                    elif axis == b'Z': z = float(v)
+                    else: e = float(v)
+            continue
+        if cmd[0] == 77: # M8x
+            e_absolute = cmd == b'M82'
+            continue
+
+        known_before = known == 3
+        nx, ny, nz, ne = x, y, z, e
+        # a regex rather than splitting on spaces, some slicers and post
+        # processors leave them out, ie. G1X10Y20E.5
+        for axis, v in PARAM.findall(m.group(2)):
+            if axis == b'X':
+                nx = float(v) if absolute else x + float(v)
+                known |= 1
+            elif axis == b'Y':
+                ny = float(v) if absolute else y + float(v)
+                known |= 2
+            elif axis == b'E': ne = float(v) if e_absolute else e + float(v)
+            else: nz = float(v) if absolute else z + float(v)
+        if ne > e and (nx != x or ny != y) and known_before:
+            out.append((x, y, nx, ny, nz))
+            if len(out) >= batch:
+                yield out
+                out = []
+        x, y, z, e = nx, ny, nz, ne
+    if out: yield out
+
+def _bounds(buf):
+    # min x, min y, min z, max x, max y, max z of the extruding moves
+    lo = [math.inf] * 3
+    hi = [-math.inf] * 3
+    for segs in iter_segments(buf):
+        if np is not None:
+            a = np.array(segs)
+            xs, ys, zs = a[:, (0, 2)], a[:, (1, 3)], a[:, 4]
+            batch = ((xs.min(), ys.min(), zs.min()), (xs.max(), ys.max(), zs.max()))
+        else:
+            batch = ((min(min(s[0], s[2]) for s in segs), min(min(s[1], s[3]) for s in segs), min(s[4] for s in segs)),
+                     (max(max(s[0], s[2]) for s in segs), max(max(s[1], s[3]) for s in segs), max(s[4] for s in segs)))
+        lo = [min(a, b) for a, b in zip(lo, batch[0])]
+        hi = [max(a, b) for a, b in zip(hi, batch[1])]
+    if lo[0] == math.inf: return None
+    return tuple(float(v) for v in (*lo, *hi))
+
+def _project(view, x, y, z):
+    # screen right, screen down. works on floats and numpy arrays
+    if view == 'top': return (x, -y)
+    return ((x - y) * ISO_X, -((x + y) * ISO_Y + z))
+
+class _Projection:
+    def __init__(self, view, area, width, height, margin=2):
+        self.view = view
+        (x0, y0, z0, x1, y1, z1) = area
+        corners = [_project(view, x, y, z) for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)]
+        self.left = min(c[0] for c in corners)
+        self.top = min(c[1] for c in corners)
+        span_x = max(c[0] for c in corners) - self.left
+        span_y = max(c[1] for c in corners) - self.top
+        self.scale = min((width - 2 * margin) / max(span_x, 1e-6), (height - 2 * margin) / max(span_y, 1e-6))
+        # centered in the image
+        self.off_x = (width - span_x * self.scale) / 2
+        self.off_y = (height - span_y * self.scale) / 2
+        self.z0 = z0
+        self.z_span = max(z1 - z0, 1e-6)
+
+    def __call__(self, x, y, z):
+        (u, v) = _project(self.view, x, y, z)
+        return ((u - self.left) * self.scale + self.off_x, (v - self.top) * self.scale + self.off_y)
+
+def _color(f):
+    return tuple(round(lo + (hi - lo) * f) for lo, hi in zip(LOW_COLOR, HIGH_COLOR))
+
+def _render_numpy(buf, proj, width, height):
+    pixels = np.zeros((height, width, 3), np.uint8)
+    palette = np.array([_color(i / 255) for i in range(256)], np.uint8)
+    for segs in iter_segments(buf):
+        a = np.array(segs, np.float64)
+        z = a[:, 4]
+        (px0, py0) = proj(a[:, 0], a[:, 1], z)
+        (px1, py1) = proj(a[:, 2], a[:, 3], z)
+        # sample each move at about one point per pixel
+        n = np.ceil(np.maximum(np.abs(px1 - px0), np.abs(py1 - py0))).astype(np.int64) + 1
+        idx = np.repeat(np.arange(len(n)), n)
+        step = np.arange(len(idx)) - np.repeat(np.cumsum(n) - n, n)
+        t = step / np.maximum(n - 1, 1)[idx]
+        xs = np.clip((px0[idx] + (px1 - px0)[idx] * t).astype(np.int64), 0, width - 1)
+        ys = np.clip((py0[idx] + (py1 - py0)[idx] * t).astype(np.int64), 0, height - 1)
+        shade = ((z - proj.z0) / proj.z_span * 255).clip(0, 255).astype(np.uint8)
+        # later moves are drawn over earlier ones, like the printed layers
+        pixels[ys, xs] = palette[shade[idx]]
+    return Image.fromarray(pixels, 'RGB')
+
+def _render_draw(buf, proj, width, height):
+    img = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(img)
+    for segs in iter_segments(buf):
+        for x0, y0, x1, y1, z in segs:
+            draw.line((proj(x0, y0, z), proj(x1, y1, z)), fill=_color(min(max((z - proj.z0) / proj.z_span, 0), 1)))
+    return img
+
+def render(filename, width, height, view='iso', area=None):
+    """
+    Render a preview of a G-code file.
+
+    The file is memory-mapped and parsed in batches, so memory use
+    doesn't depend on the size of the file. Moves are colored by height.
+
+    Parameters
+    ----------
+    filename : str
+        the local G-code file
+    width : int
+
+    height : int
+
+    view : str
+        'top' for a top-down view or 'iso' for an isometric view. default 'iso'
+    area : tuple
+        (min x, min y, min z, max x, max y, max z) of the print, ie. from
+        OctoPrint's analysis. default None, it is found with an extra pass
+
+    Returns
+    -------
+    Image or None
+        None if the file has no extruding moves
+    """
+    if view not in VIEWS: raise ValueError(f'Unknown view: {view}')
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if area is None: area = _bounds(buf)
+            if area is None: return None
+            proj = _Projection(view, area, width, height)
+            if np is not None: return _render_numpy(buf, proj, width, height)
+            return _render_draw(buf, proj, width, height)
+
+def extract_thumbnail(data):
+    """
+    Return the largest thumbnail embedded in G-code.
+
+    Only complete thumbnail blocks are found, so `data` can be just the
+    start of a file.
+
+    Parameters
+    ----------
+    data : bytes
+        G-code, or the start of it
+
+    Returns
+    -------
+    bytes or None
+        the encoded PNG or JPEG image, or None if there is none
+    """
+    best = None
+    for m in THUMBNAIL.finditer(data):
+        size = int(m.group(2)) * int(m.group(3))
+        if best is not None and size <= best[0]: continue
+        encoded = b''.join(line.lstrip(b'; \t') for line in m.group(4).splitlines())
+        try:
+            best = (size, base64.b64decode(encoded, validate=True))
+        except (binascii.Error, ValueError):
+            continue
+    return best[1] if best is not None else None
+
+def printing_area(file_info):
+    """
+    Return the printing area from OctoPrint's analysis of a file.
+
+    Parameters
+    ----------
+    file_info : dict
+        OctoPrint file information
+
+    Returns
+    -------
+    tuple or None
+        the `area` for `render`, or None if the file wasn't analysed
+    """
+    area = (file_info.get('gcodeAnalysis') or {}).get('printingArea')
+    if not area: return None
+    try:
+        return tuple(float(area[k]) for k in ('minX', 'minY', 'minZ', 'maxX', 'maxY', 'maxZ'))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class PreviewCache:
+    """
+    Rendered G-code previews, cached on disk by file hash.
+
+    Thumbnails extracted from G-code are kept here too, as the
+    'embedded' view. Once the cache is larger than `max_bytes` the least
+    recently used images are removed.
+
+    Methods
+    -------
+    key : return the cache key for a file
+    get : return the path of a cached preview, or None
+    store : add an image to the cache
+    render : render a local G-code file into the cache
+    """
+
+    def __init__(self, directory, max_bytes=50*1024*1024):
+        """
+        Rendered G-code previews, cached on disk.
+
+        Parameters
+        ----------
+        directory : str
+            the folder the previews are kept in, created if needed
+        max_bytes : int
+            the size the cache is trimmed to, default 50MB
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._trim()
+
+    @staticmethod
+    def key(file_info):
+        """
+        Return the cache key for a file.
+
+        This is the hash OctoPrint reports, or if there is none a hash of
+        the file's location, path, size and date.
+
+        Parameters
+        ----------
+        file_info : dict
+            OctoPrint file information
+
+        Returns
+        -------
+        str
+        """
+        if file_info.get('hash'): return file_info['hash']
+        ident = f"{file_info.get('origin')}/{file_info.get('path')}/{file_info.get('size')}/{file_info.get('date')}"
+        return hashlib.md5(ident.encode()).hexdigest()
+
+    def _path(self, key, width, height, view):
+        return os.path.join(self.directory, f'{key}-{view}-{width}x{height}.png')
+
+    def get(self, key, width, height, view='iso'):
+        """
+        Return the path of a cached preview, or None.
+
+        Parameters
+        ----------
+        key : str
+            see `key`
+        width : int
+
+        height : int
+
+        view : str
+            see `render`, or 'embedded'
+
+        Returns
+        -------
+        str or None
+        """
+        path = self._path(key, width, height, view)
+        try:
+            # the modification time is the last use, see _trim
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, key, img, width, height, view):
+        """
+        Add an image to the cache.
+
+        Parameters
+        ----------
+        key : str
+            see `key`
+        img : Image
+
+        width : int
+            the requested width, `img` may be smaller
+        height : int
+            the requested height, `img` may be smaller
+        view : str
+            see `get`
+        """
+        path = self._path(key, width, height, view)
+        img.save(path + '.tmp', 'PNG')
+        os.replace(path + '.tmp', path)
+        self._trim()
+
+    def _trim(self):
+        files = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.png'): continue
+                try: st = entry.stat()
+                except OSError: continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_bytes: return
+        # least recently used first
+        files.sort()
+        for (mtime, size, path) in files:
+            if total <= self.max_bytes: break
+            try: os.remove(path)
+            except OSError: continue
+            total -= size
+
+    def render(self, key, filename, width, height, view='iso', area=None):
+        """
+        Render a local G-code file into the cache.
+
+        Parameters
+        ----------
+        key : str
+            see `key`
+        filename : str
+            the local G-code file
+        width : int
+
+        height : int
+
+        view : str
+            see `render`
+        area : tuple
+            see `render`
+
+        Returns
+        -------
+        Image or None
+            the preview, or None if the file has no extruding moves
+        """
+        img = render(filename, width, height, view, area)
+        if img is None: return None
+        self.store(key, img, width, height, view)
+        return img
@@ -17,6 +17,8 @@ import logging
 
 from octopydash.octoclient import OctoClient
 from octopydash.octosocket import OctoSocket
+from octopydash.state import PrinterState
+from octopydash.throttle import ThrottlePolicy
 
 class Printer:
     """
@@ -37,6 +39,10 @@ class Printer:
         the OctoPrint HTTP client
     socket : OctoSocket
         the OctoPrint websocket
+    state : PrinterState
+        the last known printer state, updated from the socket
+    throttle : ThrottlePolicy
+        adapts the socket update rate to dashboard activity
     """
     
     def __init__(self, name, baseurl, apikey):
@@ -57,9 +63,22 @@ class Printer:
         self.client = OctoClient(baseurl, apikey)
         self.socket = OctoSocket(baseurl.replace('http:','ws:'))
         self.socket.add_callback('connected', self.on_connected)
+        self.socket.add_callback('disconnected', self.on_disconnected)
+        self.state = PrinterState(name, self.socket)
+        self.client.breaker.add_callback(self.state.apply_online)
+        self.socket.add_callback('current', self.state.apply_current)
+        self.socket.add_callback('history', self.state.apply_current)
+        self.socket.add_callback('plugin', self.state.apply_plugin, 'psucontrol')
+        self.throttle = ThrottlePolicy(self)
 
     def on_connected(self, data):
         self._log.info("Socket connected, logging in...")
+        # the socket answering is as good as a probe
+        self.client.breaker.reset()
         login = self.client.login()[1]
         self.socket.send_json({'auth': f'{login["name"]}:{login["session"]}'})
-        
\ No newline at end of file
+        self.socket.subscribe()
+
+    def on_disconnected(self, data):
+        # don't let the UI wait on requests until the socket is back
+        self.client.breaker.trip()
\ No newline at end of file
@@ -0,0 +1,243 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from octopydash.thumbnails import decode
+
+class Budget:
+    """
+    A token bucket, used to limit a rate such as bytes per second.
+
+    Methods
+    -------
+    available : return True if there is budget left
+    spend : use up part of the budget
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        A token bucket.
+
+        Parameters
+        ----------
+        rate : float
+            the number of tokens added per second
+        burst : float
+            the maximum number of tokens that can be saved up, default `rate`
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._time) * self.rate)
+        self._time = now
+
+    def available(self):
+        """Return True if there is any budget left."""
+        with self._lock:
+            self._refill()
+            return self._tokens > 0
+
+    def spend(self, amount):
+        """
+        Use up `amount` of the budget.
+
+        The budget may go negative, which delays the next `available`
+        until it has been paid back.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+class _Tile:
+    __slots__ = ('printer', 'url', 'etag', 'modified', 'digest', 'due', 'last_change', 'resolved')
+
+    def __init__(self, printer, due):
+        self.printer = printer
+        self.url = None
+        self.etag = None
+        self.modified = None
+        self.digest = None
+        self.due = due
+        self.last_change = 0
+        self.resolved = False
+
+class SnapshotScheduler:
+    """
+    Polls webcam snapshots of many printers within a global budget.
+
+    Printers are polled on a staggered schedule. Printers that are
+    printing, or whose state changed recently, are polled every
+    `active_interval` seconds, others every `idle_interval` seconds.
+    Downloads are limited to `bytes_per_second` and decodes to
+    `decodes_per_second` across all printers; when the budget runs out
+    the most overdue active printers go first.
+
+    Requests are conditional (If-None-Match/If-Modified-Since) and
+    frames that are identical to the last one aren't decoded.
+
+    Decoded frames are put on `results` as (index, Image) tuples.
+
+    Methods
+    -------
+    start : start polling
+    stop : stop polling
+    """
+
+    def __init__(self, printers, width, height, bytes_per_second=500000, decodes_per_second=4, active_interval=2, idle_interval=30, recent=60, workers=2):
+        """
+        Polls webcam snapshots of many printers within a global budget.
+
+        Parameters
+        ----------
+        printers : list of Printer
+            the printers to poll
+        width : int
+            the width frames are decoded at
+        height : int
+            the height frames are decoded at
+        bytes_per_second : int
+            the download budget, default 500000
+        decodes_per_second : float
+            the decode budget, default 4
+        active_interval : float
+            seconds between polls of active printers, default 2
+        idle_interval : float
+            seconds between polls of idle printers, default 30
+        recent : float
+            seconds a printer stays active after a state change, default 60
+        workers : int
+            the number of concurrent downloads, default 2
+        """
+        self.results = queue.Queue()
+        self.width = int(width)
+        self.height = int(height)
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.recent = recent
+        self._bytes = Budget(bytes_per_second, bytes_per_second * 2)
+        self._decodes = Budget(decodes_per_second, max(decodes_per_second, 1))
+        self._log = logging.getLogger(__name__)
+        self._workers = workers
+        self._pool = None
+        self._busy = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self._session = requests.Session()
+
+        now = time.monotonic()
+        self._tiles = [_Tile(p, now + i * active_interval / max(len(printers), 1)) for i, p in enumerate(printers)]
+        for tile in self._tiles:
+            tile.printer.state.subscribe(('state.text', 'flags'), self._make_on_state(tile))
+
+    def _make_on_state(self, tile):
+        def on_state(state, changed):
+            tile.last_change = time.monotonic()
+        return on_state
+
+    def start(self):
+        """Start polling."""
+        if self._thread is not None and self._thread.is_alive():
+            if not self._stop.is_set(): return
+            # stopped but not finished yet, it waits at most 0.1s
+            self._thread.join()
+        self._stop.clear()
+        self._pool = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix='snapshot')
+        self._thread = threading.Thread(target=self._run, name='snapshots', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling."""
+        self._stop.set()
+        if self._pool is not None: self._pool.shutdown(wait=False)
+        self._pool = None
+
+    def _active(self, tile, now):
+        flags = tile.printer.state.flags
+        return bool(flags.get('printing') or flags.get('paused')) or now - tile.last_change < self.recent
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = [t for i, t in enumerate(self._tiles) if t.due <= now and i not in self._busy]
+            if not due or len(self._busy) >= self._workers or not self._bytes.available() or not self._decodes.available():
+                self._stop.wait(0.1)
+                continue
+
+            # active printers first, then the most overdue
+            due.sort(key=lambda t: (not self._active(t, now), t.due))
+            tile = due[0]
+            index = self._tiles.index(tile)
+            tile.due = now + (self.active_interval if self._active(tile, now) else self.idle_interval)
+            self._busy.add(index)
+            pool = self._pool
+            if pool is None: break
+            try:
+                future = pool.submit(self._poll, index, tile)
+            except RuntimeError:
+                # stop shut the pool down after the check above
+                self._busy.discard(index)
+                break
+            future.add_done_callback(lambda f, i=index: self._busy.discard(i))
+
+    def _poll(self, index, tile):
+        if not tile.resolved:
+            (r, tile.url) = tile.printer.client.webcam_snapshot_url()
+            # settings that couldn't be read are tried again when next due
+            if not r: return
+            tile.resolved = True
+            if tile.url is None: self._log.info("%s: no webcam snapshot url", tile.printer.name)
+        if tile.url is None: return
+
+        hdrs = {}
+        if tile.etag: hdrs['If-None-Match'] = tile.etag
+        if tile.modified: hdrs['If-Modified-Since'] = tile.modified
+        try:
+            r = self._session.get(tile.url, headers=hdrs, timeout=10)
+        except requests.RequestException as ex:
+            self._log.warning("%s: couldn't get snapshot: %s", tile.printer.name, ex)
+            return
+
+        self._bytes.spend(len(r.content) + 200)
+        if r.status_code == 304: return
+        if r.status_code != 200:
+            self._log.warning("%s: snapshot -> %s", tile.printer.name, r.status_code)
+            return
+
+        tile.etag = r.headers.get('ETag')
+        tile.modified = r.headers.get('Last-Modified')
+        digest = hashlib.blake2b(r.content, digest_size=16).digest()
+        if digest == tile.digest: return
+        tile.digest = digest
+
+        self._decodes.spend(1)
+        try:
+            img = decode(r.content, self.width, self.height)
+        except Exception:
+            self._log.exception("%s: couldn't decode snapshot", tile.printer.name)
+            return
+        self.results.put((index, img))
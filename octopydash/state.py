@@ -0,0 +1,365 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import threading
+import time
+
+from octopydash.subscription import Subscription, WeakCallback
+
+class PrinterState:
+    """
+    The last known state of a printer, built from socket messages.
+
+    Each message is applied to the state and only the fields that
+    actually changed are passed on to subscribers, so widgets only
+    redraw what needs redrawing. Each subscriber is isolated: an
+    exception is logged and counted instead of stopping the others, and
+    the time spent in each one is recorded, see `callback_stats`.
+
+    Fields
+    ------
+    'state.text' : `state_text`, the human readable printer state
+    'flags' : `flags`, the printer state flags (operational, printing, etc.)
+    'job.file' : `job_file`, the file info of the selected job or None
+    'progress' : `progress`, the job progress info or None
+    'psu' : `psu_on`, the PSU Control plugin state or None if unknown
+    'online' : `online`, False while the printer can't be reached, the
+               other fields then hold the last known values
+    'stale' : `stale`, True while the fields hold values restored from a
+              snapshot, until the first message from the printer
+
+    Methods
+    -------
+    subscribe : call a function when one or more fields change
+    unsubscribe : remove a subscription
+    apply_current : apply a 'current' or 'history' message
+    apply_plugin : apply a 'plugin' message
+    apply_online : apply a change in reachability
+    apply_snapshot : apply values saved from an earlier run
+    snapshot : return the values to save for a later run
+    callback_stats : return call counts, failures and timing per subscriber
+    """
+
+    __slots__ = ('state_text', 'flags', 'job_file', 'progress', 'psu_on', 'online', 'stale', '_subscribers', '_paused', '_lock', '_stats', 'slow_callback', '_socket', '_log')
+
+    FIELDS = frozenset(('state.text', 'flags', 'job.file', 'progress', 'psu', 'online', 'stale'))
+
+    # optional socket data needed by each field, see OctoSocket.require
+    REQUIREMENTS = {
+        'psu': (('plugin', 'psucontrol'),),
+    }
+
+    def __init__(self, name='', socket=None, slow_callback=0.05):
+        """
+        The last known state of a printer.
+
+        Parameters
+        ----------
+        name : str
+            the name of the printer, only used for logging
+        socket : OctoSocket
+            if given, the socket is asked for the optional data that
+            subscribed fields need
+        slow_callback : float
+            subscribers taking longer than this many seconds are logged,
+            default 0.05
+        """
+        self.state_text = 'Unknown'
+        self.flags = {}
+        self.job_file = None
+        self.progress = None
+        self.psu_on = None
+        self.online = True
+        self.stale = False
+        self._subscribers = []
+        # callback -> fields changed while its subscription is paused
+        self._paused = {}
+        # guards _paused: pause and resume run on the Tk thread, _notify on
+        # socket threads. reentrant, a weak subscriber's object can be
+        # collected, and its subscription cancelled, while it is held
+        self._lock = threading.RLock()
+        # callback -> [calls, failures, total seconds, max seconds]
+        self._stats = {}
+        self.slow_callback = slow_callback
+        self._socket = socket
+        self._log = logging.getLogger(f'{__name__} - {name}')
+
+    def subscribe(self, fields, callback, weak=False, initial=False):
+        """
+        Call `callback` when any of `fields` change.
+
+        Parameters
+        ----------
+        fields : iterable of str
+            the fields to watch, see the class documentation
+        callback : function
+            called as callback(state, changed) where `changed` is the set
+            of watched fields that changed with the last message
+        weak : bool
+            only keep a weak reference to `callback`, which must be a
+            bound method. it is unsubscribed once its object is garbage
+            collected. default False
+        initial : bool
+            call `callback` right away with the watched fields that
+            already have a value, for widgets created after the printer
+            has connected. default False
+
+        Returns
+        -------
+        Subscription
+            cancel it to unsubscribe. while it is paused the changed
+            fields are collected and passed on when it is resumed
+        """
+        fields = frozenset(fields)
+        unknown = fields - self.FIELDS
+        if unknown: raise ValueError(f'Unknown state fields: {", ".join(sorted(unknown))}')
+        sub = Subscription(lambda: self._remove(fields, entry), lambda: self._pause(entry), lambda: self._resume(entry))
+        entry = WeakCallback(callback, sub.cancel) if weak else callback
+        self._stats[entry] = [0, 0, 0.0, 0.0]
+        self._subscribers = self._subscribers + [(fields, entry)]
+        self._require(fields, True)
+        if initial:
+            known = fields & self._known()
+            if known: self._call(entry, known)
+        return sub
+
+    def _known(self):
+        known = {'state.text', 'online', 'stale'}
+        if self.flags: known.add('flags')
+        if self.job_file is not None: known.add('job.file')
+        if self.progress is not None: known.add('progress')
+        if self.psu_on is not None: known.add('psu')
+        return known
+
+    def _pause(self, entry):
+        with self._lock: self._paused.setdefault(entry, set())
+
+    def _resume(self, entry):
+        with self._lock: changed = self._paused.pop(entry, None)
+        if changed: self._call(entry, changed)
+
+    def _remove(self, fields, entry):
+        with self._lock: self._paused.pop(entry, None)
+        self._stats.pop(entry, None)
+        before = len(self._subscribers)
+        # replaced rather than changed, _notify may be iterating it
+        self._subscribers = [s for s in self._subscribers if s[1] is not entry]
+        if len(self._subscribers) < before: self._require(fields, False)
+
+    def unsubscribe(self, callback):
+        """
+        Remove all subscriptions for `callback`.
+
+        Parameters
+        ----------
+        callback : function
+            a function previously passed to `subscribe`
+        """
+        for fields, cb in self._subscribers:
+            if cb == callback:
+                self._require(fields, False)
+                self._stats.pop(cb, None)
+        self._subscribers = [s for s in self._subscribers if s[1] != callback]
+
+    def apply_current(self, data):
+        """
+        Apply a 'current' or 'history' socket message.
+
+        Parameters
+        ----------
+        data : dict
+            the message data
+
+        Returns
+        -------
+        set
+            the fields that changed
+        """
+        changed = set()
+
+        state = data.get('state')
+        if state is not None:
+            if self.stale:
+                self.stale = False
+                changed.add('stale')
+            if state['text'] != self.state_text:
+                self.state_text = state['text']
+                changed.add('state.text')
+            if state['flags'] != self.flags:
+                self.flags = dict(state['flags'])
+                changed.add('flags')
+
+        job = data.get('job')
+        if job is not None:
+            file = job['file'] if job['file']['path'] is not None else None
+            old = self.job_file or {}
+            new = file or {}
+            if (old.get('origin'), old.get('path')) != (new.get('origin'), new.get('path')):
+                self.job_file = dict(file) if file is not None else None
+                changed.add('job.file')
+
+        progress = data.get('progress')
+        if progress is not None and progress != self.progress:
+            self.progress = dict(progress)
+            changed.add('progress')
+
+        self._notify(changed)
+        return changed
+
+    def apply_plugin(self, data):
+        """
+        Apply a 'plugin' socket message.
+
+        Parameters
+        ----------
+        data : dict
+            the message data
+
+        Returns
+        -------
+        set
+            the fields that changed
+        """
+        changed = set()
+        if data['plugin'] == 'psucontrol' and 'isPSUOn' in data['data']:
+            if data['data']['isPSUOn'] != self.psu_on:
+                self.psu_on = data['data']['isPSUOn']
+                changed.add('psu')
+
+        self._notify(changed)
+        return changed
+
+    def apply_online(self, online):
+        """
+        Apply a change in whether the printer can be reached.
+
+        Parameters
+        ----------
+        online : bool
+
+        Returns
+        -------
+        set
+            the fields that changed
+        """
+        changed = set()
+        if online != self.online:
+            self.online = online
+            changed.add('online')
+
+        self._notify(changed)
+        return changed
+
+    def snapshot(self):
+        """
+        Return the values to save, see `apply_snapshot`.
+
+        Returns
+        -------
+        dict
+        """
+        return {
+            'state_text': self.state_text,
+            'flags': self.flags,
+            'job_file': self.job_file,
+            'progress': self.progress,
+            'psu_on': self.psu_on,
+        }
+
+    def apply_snapshot(self, data):
+        """
+        Apply values saved from an earlier run, marking the state stale.
+
+        The state stays stale until the first 'current' or 'history'
+        message arrives.
+
+        Parameters
+        ----------
+        data : dict
+            values returned by `snapshot`
+
+        Returns
+        -------
+        set
+            the fields that changed
+        """
+        changed = set()
+        values = (
+            ('state.text', 'state_text', data.get('state_text') or 'Unknown'),
+            ('flags', 'flags', data.get('flags') or {}),
+            ('job.file', 'job_file', data.get('job_file')),
+            ('progress', 'progress', data.get('progress')),
+            ('psu', 'psu_on', data.get('psu_on')),
+            ('stale', 'stale', True),
+        )
+        for field, attr, value in values:
+            if getattr(self, attr) != value:
+                setattr(self, attr, value)
+                changed.add(field)
+
+        self._notify(changed)
+        return changed
+
+    def _require(self, fields, required):
+        if self._socket is None: return
+        for field in fields:
+            for req in self.REQUIREMENTS.get(field, ()):
+                if required: self._socket.require(*req)
+                else: self._socket.release(*req)
+
+    def _notify(self, changed):
+        if not changed: return
+        for fields, callback in self._subscribers:
+            hit = fields & changed
+            if not hit: continue
+            # collected for a paused subscriber, unless it is resumed first
+            with self._lock:
+                pending = self._paused.get(callback)
+                if pending is not None: pending |= hit
+            if pending is None: self._call(callback, hit)
+
+    def _call(self, callback, changed):
+        # the subscriber may have been removed since the list was read
+        stats = self._stats.get(callback) or [0, 0, 0.0, 0.0]
+        start = time.perf_counter()
+        try:
+            callback(self, changed)
+        except Exception:
+            stats[1] += 1
+            self._log.exception("Subscriber %s failed on %s", self._callback_name(callback), ', '.join(sorted(changed)))
+        elapsed = time.perf_counter() - start
+        stats[0] += 1
+        stats[2] += elapsed
+        if elapsed > stats[3]: stats[3] = elapsed
+        if elapsed > self.slow_callback:
+            self._log.warning("Subscriber %s took %.0fms", self._callback_name(callback), elapsed * 1000)
+
+    @staticmethod
+    def _callback_name(cb):
+        return getattr(cb, '__qualname__', repr(cb))
+
+    def callback_stats(self):
+        """
+        Return call counts, failures and timing per subscriber.
+
+        Returns
+        -------
+        list of tuples
+            (name, calls, failures, total seconds, max seconds) for each
+            subscriber, the most expensive first
+        """
+        stats = [(self._callback_name(cb), *s) for cb, s in list(self._stats.items())]
+        return sorted(stats, key=lambda s: -s[3])
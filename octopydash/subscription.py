@@ -0,0 +1,129 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import inspect
+import weakref
+
+class Subscription:
+    """
+    A handle for a registered callback.
+
+    Returned by OctoSocket.add_callback and PrinterState.subscribe.
+    Cancelling it removes the callback. Cancelling more than once is
+    harmless.
+
+    A subscription can also be paused, ie. while its widget isn't shown.
+    A paused PrinterState subscription collects the fields that change
+    and passes them all on at once when resumed, so the widget catches
+    up with a single update. Socket callbacks miss the messages sent
+    while they are paused.
+
+    Methods
+    -------
+    cancel : remove the callback
+    pause : stop calling the callback until resumed
+    resume : call the callback again
+    bind_to : cancel when a Tk widget is destroyed
+    """
+
+    def __init__(self, remove, pause=None, resume=None):
+        """
+        A handle for a registered callback.
+
+        Parameters
+        ----------
+        remove : function
+            called without arguments, once, to remove the callback
+        pause : function
+            called without arguments when the subscription is paused,
+            default None
+        resume : function
+            called without arguments when the subscription is resumed,
+            default None
+        """
+        self._remove = remove
+        self._pause = pause
+        self._resume = resume
+        self.paused = False
+
+    @property
+    def active(self):
+        """True until the subscription is cancelled."""
+        return self._remove is not None
+
+    def cancel(self):
+        """Remove the callback."""
+        remove = self._remove
+        self._remove = None
+        if remove is not None: remove()
+
+    def pause(self):
+        """Stop calling the callback until `resume` is called."""
+        if self.paused or not self.active: return
+        self.paused = True
+        if self._pause is not None: self._pause()
+
+    def resume(self):
+        """Call the callback again, after any updates missed while paused."""
+        if not self.paused: return
+        self.paused = False
+        if self.active and self._resume is not None: self._resume()
+
+    def bind_to(self, widget):
+        """
+        Cancel the subscription when `widget` is destroyed.
+
+        Parameters
+        ----------
+        widget : widget
+
+        Returns
+        -------
+        Subscription
+            this subscription
+        """
+        # children of a Toplevel send <Destroy> through its bindings too
+        widget.bind('<Destroy>', lambda e: self.cancel() if e.widget is widget else None, '+')
+        return self
+
+class WeakCallback:
+    """
+    Calls a bound method without keeping its object alive.
+
+    Once the object is garbage collected, calls do nothing and
+    `on_dead` is called, so the owner can drop the callback.
+    """
+
+    def __init__(self, method, on_dead=None):
+        """
+        Calls a bound method without keeping its object alive.
+
+        Parameters
+        ----------
+        method : bound method
+        on_dead : function
+            called without arguments once the method's object is gone
+        """
+        if not inspect.ismethod(method): raise TypeError('weak callbacks must be bound methods')
+        self.__qualname__ = method.__qualname__
+        self._on_dead = on_dead
+        self._ref = weakref.WeakMethod(method, self._dead)
+
+    def _dead(self, ref):
+        if self._on_dead is not None: self._on_dead()
+
+    def __call__(self, *args):
+        method = self._ref()
+        if method is not None: return method(*args)
@@ -0,0 +1,288 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+from octopydash.upload import SharedFile
+
+def file_hash(filename, chunk_size=1024*1024):
+    """
+    Return the SHA1 hash of a file, the same hash OctoPrint reports.
+
+    Parameters
+    ----------
+    filename : str
+        the local file
+
+    Returns
+    -------
+    str
+        the hex digest
+    """
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def flatten_files(files):
+    """
+    Flatten an OctoPrint file tree into a dict of path -> file info.
+
+    Parameters
+    ----------
+    files : list of dict
+        the 'files' or 'children' of a recursive file listing
+
+    Returns
+    -------
+    dict
+    """
+    out = {}
+    stack = list(files)
+    while stack:
+        f = stack.pop()
+        if f['type'] == 'folder': stack.extend(f.get('children', []))
+        else: out[f['path']] = f
+    return out
+
+class FolderSync:
+    """
+    Pushes new or changed G-code from a local folder to printers.
+
+    The folder is scanned every `interval` seconds. A manifest of
+    uploaded content hashes is kept per printer. Only when a file's
+    hash isn't in the manifest is the printer's own file listing fetched
+    to reconcile it, so a file is only uploaded if the printer doesn't
+    already have that exact content. Files that
+    were pushed and later deleted on the printer aren't pushed again
+    unless they change. Each file
+    is read once for all the printers that need it, and no more than
+    `per_host` uploads run against the same host at once.
+
+    Methods
+    -------
+    start : start watching the folder
+    stop : stop watching the folder
+    sync_once : scan the folder and upload what is needed
+    """
+
+    def __init__(self, folder, printers, manifest_dir, location='local', remote_path='', interval=10, settle=5, per_host=1, max_workers=8, extensions=('.gcode', '.gco', '.g')):
+        """
+        Pushes new or changed G-code from a local folder to printers.
+
+        Parameters
+        ----------
+        folder : str
+            the local folder to watch, including sub folders
+        printers : list of Printer
+            the printers files are pushed to
+        manifest_dir : str
+            the folder the per printer manifests are kept in
+        location : str
+            the location to upload to, 'local' or 'sdcard'. default 'local'
+        remote_path : str
+            the folder on the printers to upload into, default '' (the root folder)
+        interval : float
+            seconds between scans, default 10
+        settle : float
+            seconds a file must be unchanged before it is uploaded, default 5
+        per_host : int
+            the maximum number of concurrent uploads per host, default 1
+        max_workers : int
+            the maximum number of concurrent uploads, default 8
+        extensions : tuple of str
+            the file extensions to sync
+        """
+        self.folder = folder
+        self.printers = printers
+        self.manifest_dir = manifest_dir
+        self.location = location
+        self.remote_path = remote_path.strip('/')
+        self.interval = interval
+        self.settle = settle
+        self.max_workers = max_workers
+        self.extensions = tuple(e.lower() for e in extensions)
+        self._log = logging.getLogger(__name__)
+        self._hashes = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._hosts = {}
+        self._host_limits = {}
+        for p in printers:
+            host = urllib.parse.urlsplit(p.client.full_url('/')).netloc
+            if host not in self._host_limits: self._host_limits[host] = threading.Semaphore(per_host)
+            self._hosts[p] = host
+
+        os.makedirs(manifest_dir, exist_ok=True)
+
+    def start(self):
+        """Start watching the folder."""
+        if self._thread is not None and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='folder-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the folder."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception:
+                self._log.exception("Sync failed")
+            self._stop.wait(self.interval)
+
+    def _manifest_file(self, printer):
+        return os.path.join(self.manifest_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', printer.name) + '.json')
+
+    def _load_manifest(self, printer):
+        try:
+            with open(self._manifest_file(printer)) as f: return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, printer, manifest):
+        fn = self._manifest_file(printer)
+        with open(fn + '.tmp', 'w') as f: json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(fn + '.tmp', fn)
+
+    def scan(self):
+        """
+        Return the settled files in the folder.
+
+        Returns
+        -------
+        dict
+            relative path -> SHA1 hash
+        """
+        now = time.time()
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.folder):
+            for fn in filenames:
+                if not fn.lower().endswith(self.extensions): continue
+                full = os.path.join(dirpath, fn)
+                try: st = os.stat(full)
+                except OSError: continue
+                # still being written
+                if now - st.st_mtime < self.settle: continue
+                rel = os.path.relpath(full, self.folder).replace(os.sep, '/')
+                key = (st.st_size, st.st_mtime_ns)
+                cached = self._hashes.get(rel)
+                if cached is None or cached[0] != key:
+                    cached = (key, file_hash(full))
+                    self._hashes[rel] = cached
+                found[rel] = cached[1]
+        for rel in set(self._hashes) - set(found): del self._hashes[rel]
+        return found
+
+    def _remote_path(self, rel):
+        return f'{self.remote_path}/{rel}' if self.remote_path else rel
+
+    def _needed(self, printer, local, manifest):
+        # this content was pushed before. if it is gone it was deleted on
+        # purpose, it is only pushed again once it changes
+        changed = {rel: digest for rel, digest in local.items() if manifest.get(rel, {}).get('hash') != digest}
+        # nothing to reconcile, don't list the whole printer
+        if not changed: return []
+
+        (r, data) = printer.client.file(self.location, self.remote_path, recursive=True)
+        if r:
+            remote = flatten_files(data.get('files', data.get('children', [])))
+        elif data == 404 and self.remote_path:
+            # the folder will be created by the first upload
+            remote = {}
+        else:
+            self._log.warning("%s: couldn't list files, skipping", printer.name)
+            return None
+
+        needed = []
+        for rel, digest in changed.items():
+            path = self._remote_path(rel)
+            rf = remote.get(path)
+            if rf is not None and rf.get('hash') == digest:
+                # already there, uploaded by us or by hand
+                manifest[rel] = {'hash': digest, 'path': path}
+                continue
+            needed.append(rel)
+        return needed
+
+    def sync_once(self):
+        """
+        Scan the folder and upload what is needed.
+
+        Returns
+        -------
+        int
+            the number of successful uploads
+        """
+        local = self.scan()
+        if not local: return 0
+
+        manifests = {}
+        loaded = {}
+        plan = {}
+        for p in self.printers:
+            manifest = self._load_manifest(p)
+            loaded[p] = dict(manifest)
+            needed = self._needed(p, local, manifest)
+            if needed is None: continue
+            manifests[p] = manifest
+            for rel in needed: plan.setdefault(rel, []).append(p)
+
+        futures = []
+        lock = threading.Lock()
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix='sync') as pool:
+            for rel, printers in plan.items():
+                full = os.path.join(self.folder, *rel.split('/'))
+                try: shared = SharedFile(full)
+                except OSError as ex:
+                    self._log.warning("Couldn't open %s: %s", full, ex)
+                    continue
+                # the file is mapped once, and released after its last upload
+                remaining = [len(printers)]
+                for p in printers:
+                    futures.append(pool.submit(self._upload, p, shared, rel, local[rel], manifests[p], lock, remaining))
+
+        for p in manifests:
+            if manifests[p] != loaded[p]: self._save_manifest(p, manifests[p])
+        return sum(1 for f in futures if f.result())
+
+    def _upload(self, printer, shared, rel, digest, manifest, lock, remaining):
+        try:
+            with self._host_limits[self._hosts[printer]]:
+                self._log.info("%s: uploading %s", printer.name, rel)
+                (r, data) = printer.client.upload_file(shared, self.location, os.path.dirname(self._remote_path(rel)))
+        finally:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0: shared.close()
+        if not r:
+            self._log.warning("%s: upload of %s failed: %s", printer.name, rel, data)
+            return False
+        with lock:
+            manifest[rel] = {'hash': digest, 'path': self._remote_path(rel)}
+        return True
@@ -0,0 +1,150 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import collections
+import logging
+import re
+import threading
+
+# lines most people don't want to see, temperature polling and busy waits
+DEFAULT_FILTERS = {
+    'temp': re.compile(r'^(Send: (N\d+\s+)?M105\b|Recv:\s+(ok\s+)?(B|T\d*):)'),
+    'wait': re.compile(r'^Recv: (wait|echo:busy: processing)$'),
+    'sd': re.compile(r'^(Send: (N\d+\s+)?M27\b|Recv: (SD printing byte|Not SD printing))'),
+}
+
+class TerminalBuffer:
+    """
+    The most recent terminal lines of a printer, in a ring buffer.
+
+    Lines come from the 'logs' of 'current' socket messages, which are
+    only requested from OctoPrint while the buffer is started. Filters
+    are applied as lines arrive, so filtered lines are never stored.
+    At most `size` lines are kept, older lines are dropped, so memory
+    stays flat no matter how long it runs.
+
+    Methods
+    -------
+    start : start collecting lines
+    stop : stop collecting lines
+    close : stop collecting lines and remove the socket callback
+    lines : return the stored lines
+    drain : return the lines added since the last drain
+    set_filter : enable or disable a filter
+    filter_enabled : return True if a filter is enabled
+    """
+
+    def __init__(self, printer, size=2000, filters=None):
+        """
+        The most recent terminal lines of a printer.
+
+        Parameters
+        ----------
+        printer : Printer
+            the printer whose terminal is collected
+        size : int
+            the maximum number of lines kept, default 2000
+        filters : dict
+            name -> compiled regex, lines matching an enabled filter are
+            dropped. default DEFAULT_FILTERS, all enabled
+        """
+        self.printer = printer
+        self.size = size
+        self.filters = dict(filters if filters is not None else DEFAULT_FILTERS)
+        self._enabled = dict.fromkeys(self.filters, True)
+        self._active = list(self.filters.values())
+        self._log = logging.getLogger(f'{__name__} - {printer.name}')
+        self._lock = threading.Lock()
+        self._lines = collections.deque(maxlen=size)
+        # lines not drained yet, bounded the same way
+        self._new = collections.deque(maxlen=size)
+        self._started = False
+        self.dropped = 0
+        self._sub = printer.socket.add_callback('current', self.on_current, weak=True)
+
+    def start(self):
+        """Start collecting lines."""
+        if self._started: return
+        self._started = True
+        self.printer.socket.require('logs')
+
+    def stop(self):
+        """Stop collecting lines, the stored lines are kept."""
+        if not self._started: return
+        self._started = False
+        self.printer.socket.release('logs')
+
+    def close(self):
+        """Stop collecting lines and remove the socket callback."""
+        self.stop()
+        self._sub.cancel()
+
+    def set_filter(self, name, enabled):
+        """
+        Enable or disable a filter.
+
+        Only lines that arrive afterwards are affected.
+
+        Parameters
+        ----------
+        name : str
+            a key of `filters`
+        enabled : bool
+        """
+        self._enabled[name] = enabled
+        self._active = [f for n, f in self.filters.items() if self._enabled[n]]
+
+    def filter_enabled(self, name):
+        """Return True if filter `name` is enabled."""
+        return self._enabled[name]
+
+    def on_current(self, data):
+        logs = data.get('logs')
+        if not logs or not self._started: return
+        active = self._active
+        lines = [line for line in logs if not any(f.match(line) for f in active)]
+        if not lines: return
+        with self._lock:
+            overflow = len(self._new) + len(lines) - self.size
+            if overflow > 0: self.dropped += overflow
+            self._lines.extend(lines)
+            self._new.extend(lines)
+
+    def lines(self):
+        """
+        Return the stored lines, also marking them all as drained.
+
+        Returns
+        -------
+        list of str
+        """
+        with self._lock:
+            self._new.clear()
+            return list(self._lines)
+
+    def drain(self):
+        """
+        Return the lines added since the last drain.
+
+        Returns
+        -------
+        list of str
+            at most `size` lines, if more arrived only the last are returned
+        """
+        with self._lock:
+            if not self._new: return []
+            lines = list(self._new)
+            self._new.clear()
+            return lines
@@ -0,0 +1,119 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import time
+
+class ThrottlePolicy:
+    """
+    Adapts the rate of a printer's socket updates to how it is being used.
+
+    OctoPrint sends 'current' messages every 500ms multiplied by the
+    socket's throttle factor. This policy picks a factor based on
+    whether the printer is shown, whether the dashboard has been touched
+    recently and whether the printer is printing:
+
+      - not visible                   -> `offscreen_factor`
+      - touched or started recently   -> 1 (full rate)
+      - printing                      -> `printing_factor`
+      - otherwise                     -> `idle_factor`
+
+    A touch or the start of a print restores the full rate for
+    `active_timeout` seconds. The factor is only sent when it changes,
+    and again after each reconnect.
+
+    Methods
+    -------
+    touch : record user activity
+    set_visible : set whether the printer is shown on screen
+    update : recompute and send the throttle factor if needed
+    """
+
+    def __init__(self, printer, active_timeout=300, printing_factor=2, idle_factor=10, offscreen_factor=20):
+        """
+        Adapts the rate of a printer's socket updates to how it is being used.
+
+        Parameters
+        ----------
+        printer : Printer
+            the printer whose socket will be throttled
+        active_timeout : int
+            seconds of full rate after a touch or print start, default 300
+        printing_factor : int
+            factor used while printing without recent activity, default 2
+        idle_factor : int
+            factor used while not printing without recent activity, default 10
+        offscreen_factor : int
+            factor used while the printer isn't shown, default 20
+        """
+        self.printer = printer
+        self.active_timeout = active_timeout
+        self.printing_factor = printing_factor
+        self.idle_factor = idle_factor
+        self.offscreen_factor = offscreen_factor
+        self._log = logging.getLogger(f'{__name__} - {printer.name}')
+        self._visible = True
+        self._printing = False
+        self._last_activity = time.monotonic()
+        self._sent = None
+        self._connected = False
+
+        self.printer.socket.add_callback('connected', self.on_connected)
+        self.printer.state.subscribe(('flags',), self.on_state)
+
+    @property
+    def factor(self):
+        """The throttle factor the policy currently calls for."""
+        if not self._visible: return self.offscreen_factor
+        if time.monotonic() - self._last_activity < self.active_timeout: return 1
+        if self._printing: return self.printing_factor
+        return self.idle_factor
+
+    def touch(self):
+        """Record user activity, restoring the full update rate."""
+        self._last_activity = time.monotonic()
+        self.update()
+
+    def set_visible(self, visible):
+        """
+        Set whether the printer is currently shown.
+
+        Parameters
+        ----------
+        visible : bool
+        """
+        self._visible = visible
+        self.update()
+
+    def update(self):
+        """Send the current throttle factor if it has changed."""
+        if not self._connected: return
+        factor = self.factor
+        if factor == self._sent: return
+        self._log.info('Throttle factor %s -> %s', self._sent, factor)
+        self.printer.socket.send_json({'throttle': factor})
+        self._sent = factor
+
+    def on_connected(self, data):
+        # throttling is per connection, resend after every (re)connect
+        self._connected = True
+        self._sent = None
+        self.update()
+
+    def on_state(self, state, changed):
+        printing = bool(state.flags.get('printing') or state.flags.get('pausing') or state.flags.get('cancelling'))
+        if printing and not self._printing: self._last_activity = time.monotonic()
+        self._printing = printing
+        self.update()
@@ -0,0 +1,269 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import urllib.parse
+import uuid
+
+from PIL import Image
+from io import BytesIO
+
+from octopydash.preview import PreviewCache, extract_thumbnail, printing_area
+
+def decode(data, width, height):
+    """
+    Decode an image, scaled to fit within `width` x `height`.
+
+    The image is decoded as close to the target size as possible: JPEGs
+    use draft mode to let the decoder downscale, and large images are
+    reduced by an integer factor before the final resize.
+
+    Parameters
+    ----------
+    data : bytes
+        the encoded image
+    width : int
+
+    height : int
+
+    Returns
+    -------
+    Image
+    """
+    img = Image.open(BytesIO(data))
+    if img.format == 'JPEG': img.draft('RGB', (width, height))
+
+    scale = min(width / img.width, height / img.height)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+    factor = min(img.width // size[0], img.height // size[1])
+    if factor >= 2: img = img.reduce(factor)
+
+    if img.size != size: img = img.resize(size, Image.BILINEAR)
+    else: img.load()
+    return img
+
+class ThumbnailLoader:
+    """
+    Fetches and decodes thumbnails off of the Tk thread.
+
+    Thumbnails are downloaded in a thread pool and decoded in a worker
+    pool (processes when more than 1 CPU is available). The Tk thread
+    only converts the finished images to PhotoImages.
+
+    Files without a thumbnail can get a preview from their G-code
+    instead. A thumbnail embedded by the slicer is used if one is found
+    in the first `header_size` bytes, which are fetched with a Range
+    request. Otherwise the G-code is downloaded to disk and rendered in
+    the worker pool. Either way the result is cached by file hash.
+
+    Methods
+    -------
+    get : return the shared loader (class method)
+    load : load a thumbnail
+    load_preview : load a preview rendered from G-code
+    """
+
+    _shared = {}
+
+    @classmethod
+    def get(cls, widget):
+        """
+        Return the shared loader for the Tk instance of `widget`.
+
+        Parameters
+        ----------
+        widget : widget
+
+        Returns
+        -------
+        ThumbnailLoader
+        """
+        root = widget._root()
+        loader = cls._shared.get(root)
+        if loader is None:
+            loader = cls(root)
+            cls._shared[root] = loader
+        return loader
+
+    def __init__(self, master, fetch_workers=4, decode_workers=None, preview_dir=None, header_size=512*1024):
+        """
+        Fetches and decodes thumbnails off of the Tk thread.
+
+        Parameters
+        ----------
+        master : widget
+            the widget used to schedule work on the Tk thread
+        fetch_workers : int
+            the number of concurrent downloads, default 4
+        decode_workers : int
+            the number of decode workers, default is the number of CPUs
+        preview_dir : str
+            the folder rendered previews are cached in, default
+            ~/.octopydash/previews
+        header_size : int
+            the number of bytes searched for an embedded thumbnail,
+            default 512KB
+        """
+        self._master = master
+        self._log = logging.getLogger(__name__)
+        self._results = queue.Queue()
+        # loads are submitted from socket threads and polled on the Tk thread
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._polling = False
+        self.header_size = header_size
+        self.previews = PreviewCache(preview_dir or os.path.expanduser('~/.octopydash/previews'))
+
+        cpus = os.cpu_count() or 1
+        self._fetch_pool = concurrent.futures.ThreadPoolExecutor(fetch_workers, thread_name_prefix='thumbnail-fetch')
+        if cpus > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # fork (rather than spawn) so workers don't re-run __main__, and start them now
+            # before the sockets start their threads
+            self._decode_pool = concurrent.futures.ProcessPoolExecutor(decode_workers or cpus, mp_context=multiprocessing.get_context('fork'))
+            self._decode_pool.submit(int).result()
+        else:
+            self._decode_pool = concurrent.futures.ThreadPoolExecutor(decode_workers or 1, thread_name_prefix='thumbnail-decode')
+
+    def load(self, client, path, width, height, callback, save_to=None):
+        """
+        Load a thumbnail.
+
+        Parameters
+        ----------
+        client : OctoClient
+            the client to download the thumbnail with
+        path : str
+            the thumbnail path, as given by OctoPrint file info
+        width : int
+            the maximum width of the thumbnail
+        height : int
+            the maximum height of the thumbnail
+        callback : function
+            called on the Tk thread with a PhotoImage, or None on failure
+        save_to : str
+            also save the scaled thumbnail to this PNG file, default None
+        """
+        self._submit(callback, save_to, self._fetch_decode, client, path, int(width), int(height))
+
+    def load_preview(self, client, file_info, width, height, callback, view='iso', save_to=None):
+        """
+        Load a preview rendered from the G-code of a file.
+
+        Only files stored on OctoPrint ('local') can be previewed.
+
+        Parameters
+        ----------
+        client : OctoClient
+            the client to download the G-code with
+        file_info : dict
+            OctoPrint file information
+        width : int
+            the width of the preview
+        height : int
+            the height of the preview
+        callback : function
+            called on the Tk thread with a PhotoImage, or None on failure
+        view : str
+            'top' or 'iso', default 'iso'
+        save_to : str
+            also save the preview to this PNG file, default None
+        """
+        self._submit(callback, save_to, self._fetch_render, client, file_info, int(width), int(height), view)
+
+    def _submit(self, callback, save_to, fn, *args):
+        with self._lock:
+            self._pending += 1
+            start = not self._polling
+            self._polling = True
+        future = self._fetch_pool.submit(self._fetch_save, save_to, fn, *args)
+        future.add_done_callback(lambda f: self._results.put((f, callback)))
+        if start: self._master.after(20, self._poll)
+
+    def _fetch_save(self, save_to, fn, *args):
+        img = fn(*args)
+        if img is not None and save_to is not None:
+            try:
+                img.save(save_to + '.tmp', 'PNG')
+                os.replace(save_to + '.tmp', save_to)
+            except OSError as e:
+                self._log.warning("Couldn't save %s: %s", save_to, e)
+        return img
+
+    def _fetch_decode(self, client, path, width, height):
+        (r, data) = client.download(path)
+        if not r:
+            self._log.warning("Couldn't get thumbnail: %s, %s", path, data)
+            return None
+        return self._decode_pool.submit(decode, data, width, height).result()
+
+    def _fetch_render(self, client, file_info, width, height, view):
+        key = PreviewCache.key(file_info)
+        for cached in (self.previews.get(key, width, height, 'embedded'), self.previews.get(key, width, height, view)):
+            if cached is None: continue
+            img = Image.open(cached)
+            img.load()
+            return img
+        if file_info.get('origin') != 'local': return None
+        url = f'/downloads/files/local/{urllib.parse.quote(file_info["path"])}'
+
+        (r, data) = client.download_head(url, self.header_size)
+        thumbnail = extract_thumbnail(data) if r else None
+        if thumbnail is not None:
+            img = self._decode_pool.submit(decode, thumbnail, width, height).result()
+            self.previews.store(key, img, width, height, 'embedded')
+            return img
+
+        tmp = os.path.join(self.previews.directory, f'{key}-{uuid.uuid4().hex}.gcode')
+        try:
+            if r and len(data) < self.header_size:
+                # that was the whole file
+                with open(tmp, 'wb') as f: f.write(data)
+            else:
+                (r, data) = client.download_to(url, tmp)
+            if not r:
+                self._log.warning("Couldn't get G-code: %s, %s", file_info['path'], data)
+                return None
+            return self._decode_pool.submit(self.previews.render, key, tmp, width, height, view, printing_area(file_info)).result()
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+
+    def _poll(self):
+        # not imported at the top, `decode` is also used without Tk
+        from PIL import ImageTk
+        while True:
+            try: (future, callback) = self._results.get_nowait()
+            except queue.Empty: break
+            with self._lock: self._pending -= 1
+            try:
+                img = future.result()
+            except Exception:
+                self._log.exception("Couldn't decode thumbnail or preview")
+                img = None
+            callback(ImageTk.PhotoImage(img) if img is not None else None)
+
+        with self._lock:
+            # a load submitted after this sees _polling cleared and starts polling again
+            self._polling = self._pending > 0
+            again = self._polling
+        if again: self._master.after(20, self._poll)
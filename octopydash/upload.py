@@ -0,0 +1,174 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import mmap
+import os
+import threading
+import uuid
+
+from octopydash.fleet import Fleet
+
+class SharedFile:
+    """
+    A read-only file mapped into memory once and shared by many uploads.
+
+    The file is never read into Python memory as a whole, uploads read
+    slices of the mapping, so any number of concurrent uploads of the
+    same file share the same pages of the OS cache.
+
+    Use as a context manager, or call `close` when all uploads are done.
+    """
+
+    def __init__(self, filename):
+        """
+        A read-only file mapped into memory.
+
+        Parameters
+        ----------
+        filename : str
+            the local file
+        """
+        self.filename = filename
+        self.name = os.path.basename(filename)
+        self._file = open(filename, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # empty files can't be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b''
+        self._view = memoryview(self._map)
+
+    def __len__(self):
+        return self.size
+
+    def slice(self, start, end):
+        """Return a zero-copy view of bytes `start` to `end`."""
+        return self._view[start:end]
+
+    def close(self):
+        """Release the mapping and close the file."""
+        self._view.release()
+        if self.size > 0: self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class MultipartUpload:
+    """
+    A streaming multipart/form-data request body for an OctoPrint upload.
+
+    The body is produced as it is read, the file contents come straight
+    from a SharedFile. It has a length, so it is sent with a
+    Content-Length rather than chunked.
+    """
+
+    def __init__(self, shared, fields=None, filename=None, progress=None):
+        """
+        A streaming multipart/form-data request body.
+
+        Parameters
+        ----------
+        shared : SharedFile
+            the file to upload
+        fields : dict
+            extra form fields, ie. {'select': 'true'}
+        filename : str
+            the file name to send, default is the local file name
+        progress : function
+            called as progress(sent, total) as the file part is read
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self._shared = shared
+        self._progress = progress
+
+        head = b''
+        for k, v in (fields or {}).items():
+            head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n').encode()
+        filename = (filename or shared.name).replace('"', '')
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 'Content-Type: application/octet-stream\r\n\r\n').encode()
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+
+        self._parts = [(head, 0, len(head)), (shared, 0, len(shared)), (tail, 0, len(tail))]
+        self._len = len(head) + len(shared) + len(tail)
+        self._part = 0
+        self._pos = 0
+        self._sent = 0
+
+    def __len__(self):
+        return self._len
+
+    def read(self, size=-1):
+        """Read up to `size` bytes of the body."""
+        if size is None or size < 0: size = self._len
+        out = []
+        while size > 0 and self._part < len(self._parts):
+            (src, start, end) = self._parts[self._part]
+            n = min(size, end - self._pos)
+            if src is self._shared:
+                out.append(bytes(src.slice(self._pos, self._pos + n)))
+                self._sent += n
+                if self._progress is not None: self._progress(self._sent, len(src))
+            else:
+                out.append(src[self._pos:self._pos + n])
+            self._pos += n
+            size -= n
+            if self._pos >= end:
+                self._part += 1
+                self._pos = 0
+        return b''.join(out)
+
+def upload_to_printers(printers, filename, location='local', path='', select=False, print_after=False, progress=None, max_workers=8):
+    """
+    Upload one local file to many printers at once.
+
+    The file is mapped once and streamed to all printers concurrently.
+
+    Parameters
+    ----------
+    printers : list of Printer
+        the printers to upload to
+    filename : str
+        the local file
+    location : str
+        the location to upload to, 'local' or 'sdcard'. default 'local'
+    path : str
+        the folder to upload into, default '' (the root folder)
+    select : bool
+        select the file after uploading, default False
+    print_after : bool
+        start printing the file after uploading, default False
+    progress : function
+        called as progress(printer, sent, total) from the upload threads
+    max_workers : int
+        the maximum number of concurrent uploads, default 8
+
+    Returns
+    -------
+    list of tuples
+        (printer, success, data) for each printer, see Fleet.run
+    """
+    lock = threading.Lock()
+    def upload(printer):
+        def on_progress(sent, total):
+            if progress is None: return
+            with lock: progress(printer, sent, total)
+        return printer.client.upload_file(shared, location, path, select, print_after, on_progress)
+
+    with SharedFile(filename) as shared:
+        return Fleet(printers, None, max_workers).run(upload)
@@ -0,0 +1,160 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import threading
+
+import requests
+
+class MjpegStream:
+    """
+    An MJPEG (multipart JPEG) stream reader.
+
+    The stream is read incrementally in a background thread. Only the
+    newest complete frame is kept, older frames that haven't been
+    picked up are dropped without being decoded.
+
+    Attributes
+    ----------
+    frames : int
+        the number of complete frames received
+    dropped : int
+        the number of frames replaced before they were picked up
+
+    Both counters are only changed while holding the frame lock.
+
+    Methods
+    -------
+    start : start reading the stream
+    stop : stop reading the stream
+    latest : return the newest frame
+    """
+
+    def __init__(self, url, headers=None, chunk_size=16384, retry=5):
+        """
+        An MJPEG stream reader.
+
+        Parameters
+        ----------
+        url : str
+            the stream url
+        headers : dict
+            extra request headers, default None
+        chunk_size : int
+            the number of bytes to read at a time, default 16384
+        retry : int
+            seconds to wait before reconnecting after an error, default 5
+        """
+        self.url = url
+        self.frames = 0
+        self.dropped = 0
+        self._headers = headers
+        self._chunk_size = chunk_size
+        self._retry = retry
+        self._log = logging.getLogger(f'{__name__} - {url}')
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._taken = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._response = None
+
+    def start(self):
+        """Start reading the stream."""
+        if self._thread is not None and self._thread.is_alive(): return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='mjpeg', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop reading the stream."""
+        self._stop.set()
+        r = self._response
+        if r is not None: r.close()
+
+    def latest(self, seq=0):
+        """
+        Return the newest frame if it is newer than `seq`.
+
+        Parameters
+        ----------
+        seq : int
+            the sequence number of the last frame the caller has
+
+        Returns
+        -------
+        seq : int
+            the sequence number of the returned frame
+        data : bytes or None
+            the JPEG data, or None if there is no newer frame
+        """
+        with self._lock:
+            if self._seq <= seq or self._frame is None: return (seq, None)
+            self._taken = self._seq
+            return (self._seq, self._frame)
+
+    def _put(self, frame, skipped=0):
+        # `skipped` frames of the same read came before it and were never kept
+        with self._lock:
+            if self._seq > self._taken: self.dropped += 1
+            self._frame = frame
+            self._seq += 1
+            self.frames += 1 + skipped
+            self.dropped += skipped
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._response = requests.get(self.url, headers=self._headers, stream=True, timeout=10)
+                self._read(self._response)
+            except Exception as ex:
+                if self._stop.is_set(): break
+                self._log.warning("Stream error: %s", ex)
+            finally:
+                if self._response is not None: self._response.close()
+                self._response = None
+            self._stop.wait(self._retry)
+
+    def _read(self, response):
+        # frames are found by their JPEG start/end markers rather than the
+        # multipart boundaries, which some streamers get wrong
+        buf = bytearray()
+        start = -1
+        for chunk in response.iter_content(self._chunk_size):
+            if self._stop.is_set(): return
+            scan = max(len(buf) - 1, 0)
+            buf += chunk
+            newest = None
+            skipped = 0
+            while True:
+                if start < 0:
+                    start = buf.find(b'\xff\xd8', scan)
+                    if start < 0:
+                        del buf[:max(len(buf) - 1, 0)]
+                        break
+                    scan = start + 2
+                end = buf.find(b'\xff\xd9', max(scan, start + 2))
+                if end < 0:
+                    if start > 0:
+                        del buf[:start]
+                        start = 0
+                    break
+                if newest is not None: skipped += 1
+                newest = bytes(buf[start:end + 2])
+                del buf[:end + 2]
+                start = -1
+                scan = 0
+            if newest is not None: self._put(newest, skipped)
@@ -17,6 +17,13 @@ from octopydash.widgets.button import ButtonBase
 from octopydash.widgets.confirmaction import ConfirmAction
 from octopydash.widgets.current_job import CurrentJob
 from octopydash.widgets.files import FileList
+from octopydash.widgets.fleet import FleetCommands
 from octopydash.widgets.frame import Frame
+from octopydash.widgets.history import HistoryStats
+from octopydash.widgets.mosaic import WebcamMosaic
+from octopydash.widgets.overview import OverviewGrid
 from octopydash.widgets.power import PSUControlPower
-from octopydash.widgets.printer_status import PrinterStatus
\ No newline at end of file
+from octopydash.widgets.printer_panel import PrinterPanel
+from octopydash.widgets.printer_status import PrinterStatus
+from octopydash.widgets.terminal import Terminal
+from octopydash.widgets.webcam import WebcamView
\ No newline at end of file
@@ -15,7 +15,8 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 import tkinter as tk
-from tkinter.font import Font
+
+from octopydash.widgets import resources
 
 class ButtonBase(tk.Frame):
     """
@@ -60,8 +61,9 @@ class ButtonBase(tk.Frame):
         self.enabled = True
 
         self._color = color
-        self._font = Font(self.master, size=int( ((height-20) * 0.75) * font_scale))
-        w = self._font.measure(text=text) + 20
+        self._fill = color
+        self._font = resources.font(self, ((height-20) * 0.75) * font_scale)
+        w = resources.measure(self._font, text) + 20
         self.canvas['width'] = width if width is not None else w 
 
         self._rect = self.canvas.create_rectangle(x_inset, y_inset, (width if width is not None else w ) - x_inset-1, height - y_inset-1, fill=self._color, outline=self._color)
@@ -78,7 +80,9 @@ class ButtonBase(tk.Frame):
         color : str
             any color that tkinter recognizes, ie. 'red' or '#ff0000'
         """
+        if color == self._fill: return
         self.canvas.itemconfig(self._rect, fill=color, outline=color)
+        self._fill = color
         
     def on_click(self, event):
         if self.enabled: self.event_generate("<<ButtonClick>>")
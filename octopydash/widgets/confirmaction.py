@@ -14,9 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import tkinter as tk
-from tkinter.font import Font
 import logging
+import time
 
+from octopydash.widgets import resources
 from octopydash.widgets.frame import Frame
 from octopydash.widgets.button import ButtonBase
 
@@ -24,19 +25,83 @@ class ConfirmAction(tk.Toplevel):
     """
     A fullscreen 'dialog' window asking for confirmation of an action.
 
+    The window is built once and then hidden and shown again for each
+    question, use `get` to find the shared dialog and `show` to ask.
+
     This window will generate a custom event based on the user's choice:
       - Confirm - user clicked Confirm
       - Cancel  - user clicked Cancel
+
+    Methods
+    -------
+    get : return the shared dialog (class method)
+    show : show the dialog with a new title, message and actions
+    hide : hide the dialog
     """
 
-    def __init__(self, parent, title, message, color='#7788ff', frame_loc='right'):
+    _shared = {}
+
+    @classmethod
+    def get(cls, parent, frame_loc='right'):
+        """
+        Return the shared dialog for the Tk instance of `parent`.
+
+        Parameters
+        ----------
+        parent : widget
+            any widget in the window that will show the dialog
+        frame_loc : str
+            the location of the frame, either 'left' or 'right'. default 'right'
+
+        Returns
+        -------
+        ConfirmAction
+        """
+        root = parent._root()
+        key = (root, frame_loc)
+        dlg = cls._shared.get(key)
+        if dlg is None or not dlg.winfo_exists():
+            dlg = cls(root, frame_loc)
+            cls._shared[key] = dlg
+        return dlg
+
+    def __init__(self, parent, frame_loc='right'):
         """
         A fullscreen 'dialog' window asking for confirmation of an action.
 
+        The window starts hidden, see `show`.
+
         Parameters
         ----------
         parent : widget
             the parent widget/window for this dialog
+        frame_loc : str
+            the location of the frame, either 'left' or 'right'. default 'right'
+        """
+        super().__init__(parent)
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(__name__)
+        self.color = '#7788ff'
+        self.title = ''
+        self.message = ''
+        self.frame_loc = frame_loc
+        self.frame = None
+        self._on_confirm = None
+        self._on_cancel = None
+        self._prev_grab = None
+        self._show_time = None
+        self._font_title = resources.font(self, 22)
+        self._font_msg = resources.font(self, 30)
+        self.bind('<Map>', self.on_map, '+')
+
+    def show(self, title, message, color='#7788ff', on_confirm=None, on_cancel=None):
+        """
+        Show the dialog.
+
+        Parameters
+        ----------
         title : str
             a title to be shown at the top of the frame
         message : str
@@ -45,23 +110,39 @@ class ConfirmAction(tk.Toplevel):
         color : str
             the color of the frame. this can be any color that tkinter recognizes, 
             ie. 'red' or '#ff0000', default '#7788ff'
-        frame_loc : str
-            the location of the frame, either 'left' or 'right'. default 'right'
+        on_confirm : function
+            called without arguments if the user clicks Confirm
+        on_cancel : function
+            called without arguments if the user clicks Cancel
         """
-        super().__init__(parent)
-        self.grab_set()
-        self.wm_attributes('-topmost', True)
-        self.wm_attributes('-fullscreen',True)
-        self._log = logging.getLogger(__name__)
-        self.color = color
+        self._show_time = time.perf_counter()
         self.title = title
         self.message = message
-        self.frame_loc = frame_loc
-        self._font_title = Font(self.master, size=22)
-        self._font_msg = Font(self.master, size=30)
-        self._map_id = self.bind('<Map>', self.on_map, '+')
+        self.color = color
+        self._on_confirm = on_confirm
+        self._on_cancel = on_cancel
+        if self.frame is not None: self._update()
+        self._prev_grab = self.grab_current()
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the dialog, restoring any previous input grab."""
+        self.grab_release()
+        self.withdraw()
+        if self._prev_grab is not None and self._prev_grab.winfo_exists() and self._prev_grab.winfo_viewable():
+            self._prev_grab.grab_set()
+        self._prev_grab = None
 
     def on_map(self, event):
+        if event.widget is not self: return
+        if self.frame is None: self._build()
+        self.grab_set()
+        if self._show_time is not None:
+            self._log.debug('Confirmation shown in %.1f ms', (time.perf_counter() - self._show_time) * 1000)
+            self._show_time = None
+
+    def _build(self):
         self.frame = Frame(self, self.winfo_width(), self.winfo_height(), self.frame_loc, color=self.color)
         self.frame.pack(fill='both', expand=True)
         
@@ -80,12 +161,19 @@ class ConfirmAction(tk.Toplevel):
         self.cancel.place(x=self.winfo_width()-35, y=self.winfo_height()-80, anchor="ne")
         self.cancel.bind("<<ButtonClick>>", self.on_cancel_click)
 
-        self.unbind('<Map>', self._map_id)
+    def _update(self):
+        self.frame.set_color(self.color)
+        self.title_lbl.configure(text=self.title, fg=self.color)
+        self.message_lbl.configure(text=self.message, fg=self.color)
 
     def on_confirm_click(self, event):
+        action = self._on_confirm
+        self.hide()
         self.event_generate("<<Confirm>>")
-        self.destroy()
+        if action is not None: action()
 
     def on_cancel_click(self, event):
+        action = self._on_cancel
+        self.hide()
         self.event_generate("<<Cancel>>")
-        self.destroy()
+        if action is not None: action()
@@ -14,22 +14,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
+import os
 import tkinter as tk
-from tkinter.font import Font
 
-from PIL import Image,ImageTk,ImageOps
-from io import BytesIO
-
-import requests
+from PIL import Image, ImageTk
 
+from octopydash.thumbnails import ThumbnailLoader
+from octopydash.widgets import resources
 from octopydash.widgets.button import ButtonBase
 from octopydash.widgets.files import FileList
 from octopydash.widgets.confirmaction import ConfirmAction
+from octopydash.widgets.terminal import Terminal
+from octopydash.widgets.webcam import WebcamView
 
 class CurrentJob(tk.Frame):
     """Current job information (selected file, thumbnail, print, cancel, pause, files buttons)."""
 
-    def __init__(self, parent, printer, width, height, bar_loc='left', color='#ffcc66'):
+    def __init__(self, parent, printer, width, height, bar_loc='left', color='#ffcc66', webcam_fps=5, show_command=None, hide_command=None, last_state=None):
         """
         Current job information.
 
@@ -48,6 +49,17 @@ class CurrentJob(tk.Frame):
             default 'left'
         color : str
             the color of the bar. any color that tkinter recognizes. default '#ffcc66'
+        webcam_fps : float
+            the maximum frame rate of the webcam view, default 5
+        show_command : function
+            called without arguments to show this widget once the printer
+            is operational, default None
+        hide_command : function
+            called without arguments to hide this widget once the printer
+            is closed or in error, default None
+        last_state : LastStateStore
+            if given, the job thumbnail is kept there and shown from there
+            while the printer state is stale. default None
         """
         super().__init__(parent)
         self.printer = printer
@@ -55,8 +67,11 @@ class CurrentJob(tk.Frame):
         self['height'] = height
         self._log = logging.getLogger(f'{__name__} - {printer.name}')
 
-        self.show_command = None
-        self.hide_command = None
+        self.show_command = show_command
+        self.hide_command = hide_command
+        self.last_state = last_state
+        # the job was shown from a snapshot, without its thumbnail
+        self._refetch = False
         self.should_show = True
         self.should_hide = False
 
@@ -64,52 +79,23 @@ class CurrentJob(tk.Frame):
         self._job_path = None
 
         self._pause_resume = False
+        self._file_list = None
+        self._terminal = None
+        self._tn_path = None
+        self._color = color
 
         self.canvas = tk.Canvas(self, width=width, height=height, bg='#000000', bd=0, highlightthickness=0,relief='solid')
         self.canvas.place(x=0,y=0)
         
-        bar_coords = [
-            30, 10, # knot
-            30, 10, # control
-            10, 10, # control
-            10, 10, # knot
-            5, 10, # control
-            0, 15, # control
-            0, 20, # knot
-            0, 20, # control
-            0, height - 50 - 20, # control
-            0, height - 50 - 20, # knot
-            0, height - 50 - 15, # control
-            5, height - 50 - 10, # control
-            10, height - 50 - 10, # knot
-            10, height - 50 - 10, # control
-            30, height - 50 - 10, # control
-            30, height - 50 - 10, # knot
-            30, height - 50 - 10, # control
-            30, height - 50 - 20, # control
-            30, height - 50 - 20, # knot
-            30, height - 50 - 20, # control
-            20, height - 50 - 20, # control
-            20, height - 50 - 20, # knot
-            15, height - 50 - 20, # control
-            10, height - 50 - 25, # control
-            10, height - 50 - 30, # knot
-            10, height - 50 - 30, # control
-            10, 30, # control
-            10, 30, # knot
-            10, 25, # control
-            15, 20, # control
-            20, 20, # knot
-            20, 20, # control
-            30, 20, # control
-            30, 20, # knot
-        ]
-        self.bar = self.canvas.create_polygon(bar_coords, fill=color, smooth='raw')
-        if bar_loc=='right': self.canvas.scale(self.bar, width/2, 0, -1, 1)        
+        self.bar = self.canvas.create_polygon(resources.job_bar_coords(width, height, bar_loc), fill=color, smooth='raw')
 
         self._file_img = tk.Label(self, bg='#000000')
-        if bar_loc=='left': self._file_img.place(x=35, y= 10, width=width-40, height=height-10-50-10)
-        else: self._file_img.place(x=width-35, y= 10, width=width-40, height=height-10-50-10, anchor='ne')
+        if bar_loc=='left': self._img_place = dict(x=35, y= 10, width=width-40, height=height-10-50-10)
+        else: self._img_place = dict(x=width-35, y= 10, width=width-40, height=height-10-50-10, anchor='ne')
+        self._file_img.place(**self._img_place)
+
+        self._webcam = None
+        self._webcam_fps = webcam_fps
 
         self.file_lbl = tk.Label(self, bg='#000000', fg=color, text='')
         self.file_lbl.place(x=35 if bar_loc=='left' else width-35,y=5,anchor='nw' if bar_loc=='left' else 'ne')
@@ -136,10 +122,26 @@ class CurrentJob(tk.Frame):
 
         self.files = ButtonBase(self.button_box, "FILES", 50, 0, font_scale=1.0, color=color)
         self.files.bind("<<ButtonClick>>", self.on_files_click)
-        self.files.pack(side='left', padx=(1,2))
+        self.files.pack(side='left', padx=(1,1))
+
+        self.cam = ButtonBase(self.button_box, "CAM", 50, 0, font_scale=1.0, color=color)
+        self.cam.bind("<<ButtonClick>>", self.on_cam_click)
+        self.cam.pack(side='left', padx=(1,1))
+
+        self.term = ButtonBase(self.button_box, "TERM", 50, 0, font_scale=1.0, color=color)
+        self.term.bind("<<ButtonClick>>", self.on_term_click)
+        self.term.pack(side='left', padx=(1,2))
+
+        self._sub = self.printer.state.subscribe(('flags', 'job.file', 'online', 'stale'), self.on_state, initial=True).bind_to(self)
 
-        self.printer.socket.add_callback('current', self.on_current)
-        self.printer.socket.add_callback('history', self.on_current)
+    def suspend(self):
+        """Stop updating and stop the webcam, ie. while not shown. See `resume`."""
+        self._sub.pause()
+        self.hide_webcam()
+
+    def resume(self):
+        """Catch up with changes made while suspended and update again."""
+        self._sub.resume()
 
     def on_print_click(self, event):
         self.printer.client.start_job()
@@ -151,76 +153,141 @@ class CurrentJob(tk.Frame):
             self.printer.client.pause_job()
 
     def on_cancel_click(self, event):
-        c = ConfirmAction(self, "Cancel Print?", "Are you sure you want to cancel the current print?", '#dd4444')
-        c.bind("<<Confirm>>", lambda e: self.printer.client.cancel_job())
+        ConfirmAction.get(self).show("Cancel Print?", "Are you sure you want to cancel the current print?", '#dd4444', self.printer.client.cancel_job)
 
     def on_files_click(self, event):
-        FileList(self, self.printer)
+        if self._file_list is None:
+            self._file_list = FileList(self, self.printer)
+        self._file_list.show()
+
+    def on_term_click(self, event):
+        if self._terminal is None:
+            self._terminal = Terminal(self, self.printer)
+        self._terminal.show()
+
+    def on_cam_click(self, event):
+        if self._webcam is None:
+            self._webcam = WebcamView(self, self.printer, self._img_place['width'], self._img_place['height'], self._webcam_fps)
+        if self._webcam.place_info():
+            self.hide_webcam()
+        else:
+            self._webcam.place(**self._img_place)
+            self._webcam.start()
+
+    def hide_webcam(self):
+        """Stop and hide the webcam view, showing the job thumbnail again."""
+        if self._webcam is None: return
+        self._webcam.stop()
+        self._webcam.place_forget()
 
     def update_file(self):
+        self._tn_path = None
+        self._refetch = False
         if self._job_path is None or self._job_origin is None:
             self.file_lbl['text'] = ''
             self._file_img['image'] = ''
             return
 
+        if self.printer.state.stale:
+            self._update_file_stale()
+            return
+
+        save_to = None
+        if self.last_state is not None: save_to = self.last_state.thumbnail_file(self.printer.name, self.printer.state.job_file)
         (ret, file) = self.printer.client.file(self._job_origin, self._job_path)
         if ret:
             self.file_lbl['text'] = file['display']
+            self._file_img['image'] = ''
             if 'thumbnail' in file:
-                tn_url = self.printer.client.full_url(file['thumbnail'])
-                r = requests.request('GET', tn_url)
-                if r.status_code == 200:
-                    img = Image.open(BytesIO(r.content))
-                    sx = self._file_img.winfo_width() / img.width
-                    sy = self._file_img.winfo_height() / img.height
-
-                    self._tn_img = ImageTk.PhotoImage(ImageOps.scale(img, min(sx, sy)))
-                    self._file_img['image'] = self._tn_img
-                else:
-                    self._log.warning("Couldn't get thumbnail: %s, %s", tn_url, r.status_code)
-
-    def on_current(self, data):
-        if data['state']['flags']['closedOrError'] and self.should_hide and self.hide_command:
-            self.hide_command()
-            self.should_hide = False
-            self.should_show = True
-        if data['state']['flags']['operational'] and self.should_show and self.show_command:
-            self.show_command()
-            self.should_show = False
-            self.should_hide = True
-
-        flags = data['state']['flags']
-        if flags['operational'] and flags['ready'] and not flags['paused'] and not flags['printing'] and 'job' in data and data['job']['file']['path'] is not None:
+                self._tn_path = file['thumbnail']
+                ThumbnailLoader.get(self).load(self.printer.client, file['thumbnail'], self._img_place['width'], self._img_place['height'], self._make_on_thumbnail(file['thumbnail']), save_to=save_to)
+            else:
+                # older files have no thumbnail, render one from the G-code
+                self._tn_path = file['path']
+                ThumbnailLoader.get(self).load_preview(self.printer.client, file, self._img_place['width'], self._img_place['height'], self._make_on_thumbnail(file['path']), save_to=save_to)
+
+    def _update_file_stale(self):
+        # restored from a snapshot, show what was kept without going to the network
+        job_file = self.printer.state.job_file
+        self.file_lbl['text'] = job_file.get('display') or job_file.get('name') or self._job_path
+        self._file_img['image'] = ''
+        filename = self.last_state.thumbnail_file(self.printer.name, job_file) if self.last_state is not None else None
+        if filename is None or not os.path.exists(filename):
+            self._refetch = True
+            return
+        try:
+            with Image.open(filename) as img:
+                img.load()
+                self._tn_img = ImageTk.PhotoImage(img)
+        except OSError:
+            self._refetch = True
+            return
+        self._file_img['image'] = self._tn_img
+
+    def _make_on_thumbnail(self, path):
+        def on_thumbnail(img):
+            # the job may have changed while loading
+            if img is None or path != self._tn_path: return
+            self._tn_img = img
+            self._file_img['image'] = self._tn_img
+        return on_thumbnail
+
+    def on_state(self, state, changed):
+        flags = state.flags
+        if 'flags' in changed:
+            if flags['closedOrError'] and self.should_hide and self.hide_command:
+                self.hide_webcam()
+                self.hide_command()
+                self.should_hide = False
+                self.should_show = True
+            if flags['operational'] and self.should_show and self.show_command:
+                self.show_command()
+                self.should_show = False
+                self.should_hide = True
+
+        if state.online and not state.stale and flags.get('operational') and flags['ready'] and not flags['paused'] and not flags['printing'] and state.job_file is not None:
             self.print.enabled = True
             self.print.set_color('#33cc99')
         else:
             self.print.enabled = False
             self.print.set_color('#666688')
 
-        if flags['operational'] and (flags['printing'] or flags['paused']) and not flags['pausing'] and not flags['cancelling']:
-            self.cancel.enabled = True
-            self.cancel.set_color('#dd4444')
-            if flags['paused']:
-                self.pause.enabled = True
-                self.pause.set_color('#33cc99')
-                self._pause_resume = True
+        if 'flags' in changed or 'online' in changed or 'stale' in changed:
+            if state.online and not state.stale and flags.get('operational') and (flags['printing'] or flags['paused']) and not flags['pausing'] and not flags['cancelling']:
+                self.cancel.enabled = True
+                self.cancel.set_color('#dd4444')
+                if flags['paused']:
+                    self.pause.enabled = True
+                    self.pause.set_color('#33cc99')
+                    self._pause_resume = True
+                else:
+                    self.pause.enabled = True
+                    self.pause.set_color('#ff7700')
+                    self._pause_resume = False
             else:
-                self.pause.enabled = True
-                self.pause.set_color('#ff7700')
-                self._pause_resume = False
-        else:
-            self.cancel.enabled = False
-            self.cancel.set_color('#666688')
-            self.pause.enabled = False
-            self.pause.set_color('#666688')
-            
-
-        if 'job' in data:
-            path = data['job']['file']['path']
-            origin = data['job']['file']['origin']
-
-            if self._job_origin != origin or self._job_path != path:
-                self._log.info('Job file changed %s|%s -> %s|%s', self._job_origin, self._job_path, origin, path)
-                self._job_path = path
-                self._job_origin = origin
-                self.update_file()
\ No newline at end of file
+                self.cancel.enabled = False
+                self.cancel.set_color('#666688')
+                self.pause.enabled = False
+                self.pause.set_color('#666688')
+
+        if 'online' in changed:
+            # grey out rather than wait on requests that would time out
+            for btn in (self.files, self.cam, self.term):
+                btn.enabled = state.online
+                btn.set_color(self._color if state.online else '#666688')
+            if not state.online:
+                self.hide_webcam()
+                if self._file_list is not None: self._file_list.hide()
+                if self._terminal is not None: self._terminal.hide()
+
+        if 'job.file' in changed:
+            file = state.job_file or {}
+            path = file.get('path')
+            origin = file.get('origin')
+            self._log.info('Job file changed %s|%s -> %s|%s', self._job_origin, self._job_path, origin, path)
+            self._job_path = path
+            self._job_origin = origin
+            self.update_file()
+        elif 'stale' in changed and not state.stale and self._refetch:
+            # the snapshot had no thumbnail for the job, get it now
+            self.update_file()
\ No newline at end of file
@@ -13,20 +13,29 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
 import logging
 import threading
-import requests
-from PIL import Image,ImageTk,ImageOps
-from io import BytesIO
+import time
 import tkinter as tk
-from tkinter.font import Font
 
+from octopydash.thumbnails import ThumbnailLoader
+from octopydash.widgets import resources
 from octopydash.widgets.frame import Frame
 from octopydash.widgets.button import ButtonBase
 from octopydash.widgets.confirmaction import ConfirmAction
 
 class FileItem(tk.Frame):
-    """A single file item shown in a FileList"""
+    """
+    A single file item shown in a FileList
+
+    Tapping the item (outside of its buttons) generates a custom
+    FileToggled event, used to mark items for bulk operations.
+
+    Methods
+    -------
+    set_marked - highlight the item as marked or not
+    """
 
     def __init__(self, parent, printer, file_info, width, height):
         """Create a FileItem widget
@@ -65,49 +74,22 @@ class FileItem(tk.Frame):
 
         self.canvas = tk.Canvas(self, width=width, height=height, bg='#000000', bd=0, highlightthickness=0,relief='solid')
         self.canvas.pack()
+        self.canvas.bind('<ButtonRelease-1>', lambda e: self.event_generate("<<FileToggled>>"))
+        self.marked = False
         
-        bar_coords = [
-            width-225,0, # knot
-            width-225,0, # control
-            width-10,0, # control
-            width-10,0, # knot
-            width-5,0, # control
-            width, 5, # control
-            width, 10, # knot
-            width, 10, # control
-            width, height-10, #control
-            width, height-10, # knot
-            width, height-5, # control
-            width-5, height, # control
-            width-10, height, # knot
-            width-10, height, # control
-            width-225, height, # control
-            width-225, height # knot
-        ]
-        self._right_bar = self.canvas.create_polygon(bar_coords, fill=self.color, smooth='raw')
+        self._right_bar = self.canvas.create_polygon(resources.file_item_bar_coords(width, height), fill=self.color, smooth='raw')
         self._left_bar = self.canvas.create_rectangle(0, 0, 20, height, fill=self.color, outline=self.color)
 
-        self._font = Font(self.master, size=int( ((height-20) * 0.75) * 0.33))
+        self._font = resources.font(self, ((height-20) * 0.75) * 0.33)
 
         name_x = 25 + height + 5
 
         self._file_name = self.canvas.create_text(name_x, height/2, anchor='w', text=self.file_info['display'], fill=self.color, font=self._font)
 
         if self.file_info['type']=='machinecode' and 'thumbnail' in self.file_info:
-            url = self.printer.client.full_url(self.file_info['thumbnail'])
-            r = requests.request('GET', url)
-            if r.status_code == 200:
-                img = Image.open(BytesIO(r.content))
-                sx = self._height / img.width
-                sy = self._height / img.height
-
-                self._tn_img = ImageTk.PhotoImage(ImageOps.scale(img, min(sx, sy)))
-                self.canvas.create_image(25, self._height/2, image=self._tn_img, anchor='w')
-            else:
-                self._log.warning("Couldn't get thumbnail: %s, %s", url, r.status_code)
-                # set generic icon
-        else:
-            pass #set generic icon
+            ThumbnailLoader.get(self).load(self.printer.client, self.file_info['thumbnail'], self._height, self._height, self.on_thumbnail)
+        elif self.file_info['type']=='machinecode':
+            ThumbnailLoader.get(self).load_preview(self.printer.client, self.file_info, self._height, self._height, self.on_thumbnail)
 
         self.button_frame = tk.Frame(self, bg='#000000', height=height)
         self.button_frame.place(x=width-220, y=0)
@@ -124,6 +106,26 @@ class FileItem(tk.Frame):
             self.del_btn.pack(side='left', padx=(1,2))
             self.del_btn.bind("<<ButtonClick>>", self.on_delete)
         
+    def set_marked(self, marked):
+        """
+        Highlight the item as marked or not.
+
+        Parameters
+        ----------
+        marked : bool
+        """
+        if marked == self.marked: return
+        self.marked = marked
+        color = '#ff7700' if marked else self.color
+        self.canvas.itemconfig(self._left_bar, fill=color, outline=color)
+        self.canvas.itemconfig(self._file_name, fill=color)
+
+    def on_thumbnail(self, img):
+        # the item may have been removed while loading
+        if img is None or not self.winfo_exists(): return # set generic icon
+        self._tn_img = img
+        self.canvas.create_image(25, self._height/2, image=self._tn_img, anchor='w')
+
     def on_open(self, event):
         self.event_generate("<<FolderOpened>>")
         
@@ -136,22 +138,37 @@ class FileItem(tk.Frame):
             self._log.warning("Couldn't select file")
     
     def on_delete(self, event):
-        def dodel(event):
+        def dodel():
             self._log.info("Deleting file: %s", self.path)
             (r, d) = self.printer.client.delete_file(self.location, self.path)
             if r:
                 self.event_generate("<<FileDeleted>>")
             else:
                 self._log.warning("Couldn't delete file")
-        c = ConfirmAction(self, f"Delete file?", f"Are you sure you want to delete:\n{self.path}?")
-        c.bind("<<Confirm>>", dodel)
+        ConfirmAction.get(self).show(f"Delete file?", f"Are you sure you want to delete:\n{self.path}?", on_confirm=dodel)
 
 
 class FileList(tk.Toplevel):
-    """A list of files on the given OctoPrint server"""
+    """
+    A list of files on the given OctoPrint server
 
-    def __init__(self, parent, printer, color='#7788ff', frame_loc='right'):
+    The window is built once and hidden when closed, use `show` to
+    show it again.
+
+    Files can be marked with the MARK button for bulk deletes and moves.
+    Bulk operations run concurrently, the list is updated right away and
+    fetched again only once all of them are done.
+
+    Methods
+    -------
+    show : show the file list, starting at the root folder
+    hide : hide the file list
+    """
+
+    def __init__(self, parent, printer, color='#7788ff', frame_loc='right', max_concurrent=4):
         """Create a FileList for the given OctoPrint server
+
+        The window starts hidden, see `show`.
         
         Parameters
         ----------
@@ -162,9 +179,12 @@ class FileList(tk.Toplevel):
         color : string, default='#7788ff'
 
         frame_loc : string, default='right'
+
+        max_concurrent : int, default=4
+            the maximum number of concurrent requests for bulk operations
         """
         super().__init__(parent, bg='#000000')
-        self.grab_set()
+        self.withdraw()
         self.wm_attributes('-topmost', True)
         self.wm_attributes('-fullscreen',True)
         self.item_height = 80
@@ -172,16 +192,47 @@ class FileList(tk.Toplevel):
         self.color = color
         self.printer = printer
         self.frame_loc = frame_loc
-        self._font_title = Font(self.master, size=22)
-        self._font_msg = Font(self.master, size=30)
-        self._map_id = self.bind('<Map>', self.on_map, '+')
+        self._font_title = resources.font(self, 22)
+        self.bind('<Map>', self.on_map, '+')
+        self.frame = None
+        self._show_time = None
         self._location = 'local'
         self._files = None
         self._file_items = []
         self._path = ''
         self._first_item = 0
+        self.max_concurrent = max_concurrent
+        self._marking = False
+        self._marked = set()
+        self._moving = None
+        self._bulk = None
+
+    def show(self):
+        """Show the file list, starting at the root folder."""
+        self._show_time = time.perf_counter()
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the file list."""
+        self._marking = False
+        self._marked.clear()
+        self._moving = None
+        if self.frame is not None: self._update_mark_buttons()
+        self.grab_release()
+        self.withdraw()
 
     def on_map(self, event):
+        if event.widget is not self: return
+        if self.frame is None: self._build()
+        self.grab_set()
+        self.update()
+        self.goto_path('local','')
+        if self._show_time is not None:
+            self._log.debug('File list shown in %.1f ms', (time.perf_counter() - self._show_time) * 1000)
+            self._show_time = None
+
+    def _build(self):
         self.frame = Frame(self, self.winfo_width(), self.winfo_height(), self.frame_loc, color=self.color, bottom_width=20, side_width=60)
         self.frame.pack(fill='both', expand=True)
 
@@ -207,9 +258,18 @@ class FileList(tk.Toplevel):
         self.down_btn = ButtonBase(self, 'DN', height=60, x_inset=0, y_inset=2, font_scale=0.5, color=self.color, width=60)
         self.down_btn.bind("<<ButtonClick>>", self.on_down)
 
-        self.unbind('<Map>', self._map_id)
-        self.update()
-        self.goto_path('local','')
+        self.mark_btn = ButtonBase(self, 'MARK', height=60, x_inset=0, y_inset=2, font_scale=0.5, color=self.color, width=60)
+        self.mark_btn.bind("<<ButtonClick>>", self.on_mark)
+        self.mark_btn.place(x=self.winfo_width(),y=180, anchor='ne')
+
+        self.bulk_del_btn = ButtonBase(self, 'DEL', height=60, x_inset=0, y_inset=2, font_scale=0.5, color='#dd4444', width=60)
+        self.bulk_del_btn.bind("<<ButtonClick>>", self.on_bulk_delete)
+
+        self.bulk_move_btn = ButtonBase(self, 'MOVE', height=60, x_inset=0, y_inset=2, font_scale=0.5, color='#ff7700', width=60)
+        self.bulk_move_btn.bind("<<ButtonClick>>", self.on_bulk_move)
+
+        self.move_here_btn = ButtonBase(self, 'HERE', height=60, x_inset=0, y_inset=2, font_scale=0.5, color='#33cc99', width=60)
+        self.move_here_btn.bind("<<ButtonClick>>", self.on_move_here)
 
     def goto_path(self, location, path, first=0):
         self._location = location
@@ -232,7 +292,8 @@ class FileList(tk.Toplevel):
     def update_list(self):
         self._log.debug("Starting update_list thread")
         for child in self._file_items:
-            child.pack_forget()
+            child.destroy()
+        self._file_items = []
         
         if self._files is None:
             self._log.warning("Can't show files, none found?")
@@ -244,9 +305,11 @@ class FileList(tk.Toplevel):
             file = self._files[fi]
             fi = FileItem(self.list_frame, self.printer, file, self.item_width, self.item_height)
 
-            fi.bind('<<FileSelected>>', lambda e: self.destroy())
-            fi.bind("<<FileDeleted>>", lambda e: self.goto_path(self._location, self._path, self._first_item))
+            fi.bind('<<FileSelected>>', lambda e: self.hide())
+            fi.bind("<<FileDeleted>>", lambda e: self.remove_files([e.widget.path]))
             fi.bind("<<FolderOpened>>", lambda e: self.goto_path(self._location, e.widget.path))
+            fi.bind("<<FileToggled>>", self.on_toggle)
+            fi.set_marked(fi.path in self._marked)
             fi.pack(pady=2)
             self.update()
             self._file_items.append(fi)
@@ -277,4 +340,98 @@ class FileList(tk.Toplevel):
         self.update_list()
 
     def on_close_click(self, event):
-        self.destroy()
\ No newline at end of file
+        self.hide()
+
+    def remove_files(self, paths):
+        """
+        Remove files from the shown list without fetching it again.
+
+        Parameters
+        ----------
+        paths : iterable of str
+        """
+        paths = set(paths)
+        if self._files is not None: self._files = [f for f in self._files if f['path'] not in paths]
+        self.update_list()
+
+    def _update_mark_buttons(self):
+        self.mark_btn.set_color('#ff7700' if self._marking else self.color)
+        if self._marking and self._marked:
+            self.bulk_del_btn.place(x=self.winfo_width(),y=240, anchor='ne')
+            self.bulk_move_btn.place(x=self.winfo_width(),y=300, anchor='ne')
+        else:
+            self.bulk_del_btn.place_forget()
+            self.bulk_move_btn.place_forget()
+        if self._moving: self.move_here_btn.place(x=self.winfo_width(),y=360, anchor='ne')
+        else: self.move_here_btn.place_forget()
+
+    def on_mark(self, event):
+        self._marking = not self._marking
+        if not self._marking:
+            self._marked.clear()
+            for fi in self._file_items: fi.set_marked(False)
+        self._update_mark_buttons()
+
+    def on_toggle(self, event):
+        if not self._marking or self._bulk is not None: return
+        fi = event.widget
+        if fi.path in self._marked: self._marked.discard(fi.path)
+        else: self._marked.add(fi.path)
+        fi.set_marked(fi.path in self._marked)
+        self._update_mark_buttons()
+
+    def on_bulk_delete(self, event):
+        paths = sorted(self._marked)
+        # the origin can be switched while the deletes run
+        location = self._location
+        if not paths or self._bulk is not None: return
+        listing = '\n'.join(paths[:5]) + (f'\n...and {len(paths) - 5} more' if len(paths) > 5 else '')
+        ConfirmAction.get(self).show(f"Delete {len(paths)} files?", f"Are you sure you want to delete:\n{listing}", on_confirm=lambda: self._run_bulk('Deleting', paths, lambda p: self.printer.client.delete_file(location, p)))
+
+    def on_bulk_move(self, event):
+        if not self._marked or self._bulk is not None: return
+        # browse to the destination folder, then tap HERE
+        self._moving = (self._location, sorted(self._marked))
+        self._update_mark_buttons()
+
+    def on_move_here(self, event):
+        if not self._moving: return
+        (location, paths) = self._moving
+        dest = self._path
+        self._moving = None
+        if location != self._location:
+            self._log.warning("Can't move files between locations")
+            self._update_mark_buttons()
+            return
+        self._run_bulk('Moving', paths, lambda p: self.printer.client.move_file(location, p, dest))
+
+    def _run_bulk(self, title, paths, func):
+        self._log.info("%s %d files", title, len(paths))
+        self._marked.clear()
+        self._marking = False
+        self._update_mark_buttons()
+        self.title_lbl['text'] = f'{self.printer.name}: {title} {len(paths)} files...'
+
+        pool = concurrent.futures.ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='files-bulk')
+        futures = {p: pool.submit(func, p) for p in paths}
+        pool.shutdown(wait=False)
+        self._bulk = (title, futures)
+        # show the result right away, the listing is fetched again once everything is done
+        self.remove_files(paths)
+        self.after(100, self._poll_bulk)
+
+    def _poll_bulk(self):
+        (title, futures) = self._bulk
+        if not all(f.done() for f in futures.values()):
+            self.after(100, self._poll_bulk)
+            return
+        self._bulk = None
+        failed = []
+        for p, f in futures.items():
+            try: (r, d) = f.result()
+            except Exception: r = False
+            if not r: failed.append(p)
+        self.goto_path(self._location, self._path, self._first_item)
+        if failed:
+            self._log.warning("%s failed for: %s", title, ', '.join(failed))
+            self.title_lbl['text'] = f'{self.printer.name}: {title} failed for {len(failed)} of {len(futures)} files'
@@ -0,0 +1,144 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import tkinter as tk
+
+from octopydash.fleet import Fleet, COMMANDS
+from octopydash.widgets import resources
+from octopydash.widgets.frame import Frame
+from octopydash.widgets.button import ButtonBase
+from octopydash.widgets.confirmaction import ConfirmAction
+
+class FleetCommands(tk.Toplevel):
+    """
+    A fullscreen window with commands for all printers.
+
+    Each command is confirmed once, sent to all matching printers at
+    once, and the results are summarized in this window.
+
+    The window is built once and hidden when closed, use `show` to
+    show it again.
+
+    Methods
+    -------
+    show : show the window
+    hide : hide the window
+    """
+
+    def __init__(self, parent, printers, color='#7788ff', frame_loc='right', timeout=10):
+        """
+        A fullscreen window with commands for all printers.
+
+        The window starts hidden, see `show`.
+
+        Parameters
+        ----------
+        parent : widget
+            the parent widget/window for this window
+        printers : list of Printer
+            the printers commands are sent to
+        color : str
+            the color of the frame, default '#7788ff'
+        frame_loc : str
+            the location of the frame, either 'left' or 'right'. default 'right'
+        timeout : float
+            seconds to wait for each printer, default 10
+        """
+        super().__init__(parent, bg='#000000')
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(__name__)
+        self.color = color
+        self.frame_loc = frame_loc
+        self.fleet = Fleet(printers, timeout)
+        self.frame = None
+        self._font_title = resources.font(self, 22)
+        self._font_msg = resources.font(self, 18)
+        self._running = None
+        self.bind('<Map>', self.on_map, '+')
+
+    def show(self):
+        """Show the window."""
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the window."""
+        self.grab_release()
+        self.withdraw()
+
+    def on_map(self, event):
+        if event.widget is not self: return
+        if self.frame is None: self._build()
+        self.grab_set()
+
+    def _build(self):
+        width = self.winfo_width()
+        height = self.winfo_height()
+        self.frame = Frame(self, width, height, self.frame_loc, color=self.color, bottom_width=20, side_width=60)
+        self.frame.pack(fill='both', expand=True)
+
+        self.title_lbl = tk.Label(self, text='All Printers', bg='#000000', fg=self.color, font=self._font_title)
+        self.title_lbl.place(x=35 if self.frame_loc=='right' else width-35, y=0, anchor='nw' if self.frame_loc=='right' else 'ne', height=40)
+
+        self.close_btn = ButtonBase(self, "EXIT", color=self.color, font_scale=1.0)
+        self.close_btn.bind("<<ButtonClick>>", lambda e: self.hide())
+        self.close_btn.place(x=width-85, y=0, anchor='ne')
+
+        self.button_box = tk.Frame(self, bg='#000000')
+        self.button_box.place(x=20, y=60)
+        self.buttons = {}
+        for name, (text, method, select) in COMMANDS.items():
+            btn = ButtonBase(self.button_box, text, 60, 0, 2, color=self.color, width=260)
+            btn.bind("<<ButtonClick>>", lambda e, n=name: self.on_command_click(n))
+            btn.pack(side='top', pady=2)
+            self.buttons[name] = btn
+
+        self.result_lbl = tk.Label(self, text='', bg='#000000', fg=self.color, font=self._font_msg, justify='left', anchor='nw')
+        self.result_lbl['wraplength'] = width - 380
+        self.result_lbl.place(x=300, y=60, width=width-380, height=height-100)
+
+    def on_command_click(self, name):
+        if self._running is not None: return
+        text = COMMANDS[name][0]
+        ConfirmAction.get(self).show(f'{text}?', f'Send {text} to all matching printers?', '#dd4444', lambda: self.run(name))
+
+    def run(self, name):
+        """
+        Run a command from COMMANDS on the fleet, showing the results when done.
+
+        Parameters
+        ----------
+        name : str
+        """
+        self.result_lbl['text'] = f'{COMMANDS[name][0]}: waiting for printers...'
+        for btn in self.buttons.values(): btn.enabled = False
+        self._running = (name, self.fleet.run_async(name))
+        self.after(100, self._poll)
+
+    def _poll(self):
+        (name, future) = self._running
+        if not future.done():
+            self.after(100, self._poll)
+            return
+        self._running = None
+        for btn in self.buttons.values(): btn.enabled = True
+        try:
+            summary = Fleet.summary(future.result())
+        except Exception as ex:
+            summary = f'Failed: {ex}'
+        self.result_lbl['text'] = f'{COMMANDS[name][0]}\n{summary}'
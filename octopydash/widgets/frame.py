@@ -16,8 +16,16 @@
 import logging
 import tkinter as tk
 
+from octopydash.widgets import resources
+
 class Frame(tk.Canvas):
-    """A simple LCARS inspired frame"""
+    """
+    A simple LCARS inspired frame
+
+    Methods
+    -------
+    set_color - set the color of the frame
+    """
 
     def __init__(self, parent, width, height, side_loc='right', top_width=40, side_width=10, bottom_width=80, color='#7788ff'):
         """
@@ -58,58 +66,16 @@ class Frame(tk.Canvas):
         self['height'] = height
         self['width'] = width
 
-        radius = 10
-
-        coords = [
-            radius, 0, # knot
-            radius, 0, # control
-            width-radius, 0, # control
-            width-radius, 0, # knot
-            width-(radius/2), 0, # control
-            width, (radius/2), # control
-            width, radius, # knot
-            width, radius, # control
-            width, height-radius, # control
-            width, height-radius, # knot
-            width, height-(radius/2), # control
-            width-(radius/2), height, # control
-            width-radius, height, # knot
-            width-radius, height, # control
-            radius, height, # control
-            radius, height, # knot
-            radius/2, height, # control
-            0, height-(radius/2), # control
-            0, height-radius, # knot
-            0, height-radius, # control
-            0, height - bottom_width + radius, # control
-            0, height - bottom_width + radius, # knot
-            0, height - bottom_width + (radius/2), # control
-            radius/2, height - bottom_width, #control
-            radius, height - bottom_width, # knot
-            radius, height - bottom_width, # control
-            width - side_width - radius, height - bottom_width, # control
-            width - side_width - radius, height - bottom_width, # knot
-            width - side_width - (radius/2), height - bottom_width, # control
-            width - side_width, height - bottom_width - (radius/2), # control
-            width - side_width, height - bottom_width - radius, # knot
-            width - side_width, height - bottom_width - radius, # control
-            width - side_width, top_width + radius, # control
-            width - side_width, top_width + radius, # knot
-            width - side_width, top_width + (radius/2), # control
-            width - side_width - (radius/2), top_width, # control
-            width - side_width - radius, top_width, # knot
-            width - side_width - radius, top_width, # control
-            radius, top_width, # control
-            radius, top_width, # knot
-            radius/2, top_width, # control
-            0, top_width - (radius/2), # control
-            0, top_width -radius, # knot
-            0, top_width -radius, # control
-            0, radius, # control
-            0, radius, # knot
-            0, (radius/2), # control
-            (radius/2), 0, # control
-            radius, 0, # knot
-        ]
+        coords = resources.frame_coords(width, height, side_loc, top_width, side_width, bottom_width)
         self._poly = self.create_polygon(coords, fill=color, smooth='raw')
-        if side_loc=='left': self.scale(self._poly, width/2, 0, -1, 1)
\ No newline at end of file
+
+    def set_color(self, color):
+        """
+        Change the color of the frame.
+
+        Parameters
+        ----------
+        color : str
+            any color that tkinter recognizes, ie. 'red' or '#ff0000'
+        """
+        self.itemconfig(self._poly, fill=color)
\ No newline at end of file
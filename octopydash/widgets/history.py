@@ -0,0 +1,158 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import tkinter as tk
+
+from octopydash.widgets import resources
+from octopydash.widgets.frame import Frame
+from octopydash.widgets.button import ButtonBase
+
+class HistoryStats(tk.Toplevel):
+    """
+    A fullscreen window with job statistics per printer.
+
+    The statistics are read from the daily rollups of a HistoryStore
+    each time the window is shown or the period is changed.
+
+    The window is built once and hidden when closed, use `show` to
+    show it again.
+
+    Methods
+    -------
+    show : show the window
+    hide : hide the window
+    refresh : read and show the statistics again
+    """
+
+    PERIODS = (('7 DAYS', 7), ('30 DAYS', 30), ('1 YEAR', 365))
+    COLUMNS = ('PRINTER', 'JOBS', 'DONE', 'FAILED', 'CANCELLED', 'HOURS', 'UTIL', 'FAIL')
+
+    def __init__(self, parent, store, color='#7788ff', frame_loc='right'):
+        """
+        A fullscreen window with job statistics per printer.
+
+        The window starts hidden, see `show`.
+
+        Parameters
+        ----------
+        parent : widget
+            the parent widget/window for this window
+        store : HistoryStore
+            the history to show
+        color : str
+            the color of the frame, default '#7788ff'
+        frame_loc : str
+            the location of the frame, either 'left' or 'right'. default 'right'
+        """
+        super().__init__(parent, bg='#000000')
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(__name__)
+        self.store = store
+        self.color = color
+        self.frame_loc = frame_loc
+        self.days = 30
+        self.frame = None
+        self._font_title = resources.font(self, 22)
+        self._font_row = resources.font(self, 16)
+        self.bind('<Map>', self.on_map, '+')
+
+    def show(self):
+        """Show the window."""
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the window."""
+        self.grab_release()
+        self.withdraw()
+
+    def on_map(self, event):
+        if event.widget is not self: return
+        if self.frame is None: self._build()
+        self.grab_set()
+        self.refresh()
+
+    def _build(self):
+        width = self.winfo_width()
+        height = self.winfo_height()
+        self.frame = Frame(self, width, height, self.frame_loc, color=self.color, bottom_width=20, side_width=60)
+        self.frame.pack(fill='both', expand=True)
+
+        self.title_lbl = tk.Label(self, text='History', bg='#000000', fg=self.color, font=self._font_title)
+        self.title_lbl.place(x=35 if self.frame_loc=='right' else width-35, y=0, anchor='nw' if self.frame_loc=='right' else 'ne', height=40)
+
+        self.close_btn = ButtonBase(self, "EXIT", color=self.color, font_scale=1.0)
+        self.close_btn.bind("<<ButtonClick>>", lambda e: self.hide())
+        self.close_btn.place(x=width-85, y=0, anchor='ne')
+
+        self.button_box = tk.Frame(self, bg='#000000')
+        self.button_box.place(x=20, y=60)
+        self.period_btns = {}
+        for text, days in self.PERIODS:
+            btn = ButtonBase(self.button_box, text, 60, 0, 2, color=self.color, width=200)
+            btn.bind("<<ButtonClick>>", lambda e, d=days: self.set_period(d))
+            btn.pack(side='top', pady=2)
+            self.period_btns[days] = btn
+
+        self.canvas = tk.Canvas(self, width=width-320, height=height-100, bg='#000000', bd=0, highlightthickness=0, relief='solid')
+        self.canvas.place(x=240, y=60)
+        self._row_h = self._font_row.metrics('linespace') + 8
+        name_w = (width - 320) * 0.3
+        col_w = (width - 320 - name_w) / (len(self.COLUMNS) - 1)
+        self._col_x = [0] + [name_w + col_w * (i + 1) for i in range(len(self.COLUMNS) - 1)]
+
+    def set_period(self, days):
+        """
+        Show the statistics for the last `days` days.
+
+        Parameters
+        ----------
+        days : int
+        """
+        self.days = days
+        self.refresh()
+
+    def refresh(self):
+        """Read and show the statistics again."""
+        for days, btn in self.period_btns.items():
+            btn.set_color('#ff7700' if days == self.days else self.color)
+        self.canvas.delete('all')
+        self._row(0, self.COLUMNS, self.color)
+
+        rows = self.store.summary(self.days)
+        if not rows:
+            self.canvas.create_text(0, self._row_h, anchor='nw', text='No jobs recorded yet.', fill=self.color, font=self._font_row)
+            return
+        for i, s in enumerate(rows):
+            self._row(i + 1, (
+                s['printer'],
+                s['jobs'],
+                s['completed'],
+                s['failed'],
+                s['cancelled'],
+                f"{s['print_seconds'] / 3600:.1f}",
+                f"{s['utilization'] * 100:.0f}%",
+                f"{s['failure_rate'] * 100:.0f}%",
+            ), '#ffcc66')
+
+    def _row(self, row, values, color):
+        y = row * self._row_h
+        for i, (x, value) in enumerate(zip(self._col_x, values)):
+            # numbers are right aligned to the end of their column
+            if i == 0: self.canvas.create_text(x, y, anchor='nw', text=str(value), fill=color, font=self._font_row)
+            else: self.canvas.create_text(x, y, anchor='ne', text=str(value), fill=color, font=self._font_row)
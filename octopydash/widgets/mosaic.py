@@ -0,0 +1,126 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import math
+import queue
+import tkinter as tk
+
+from PIL import ImageTk
+
+from octopydash.snapshots import SnapshotScheduler
+from octopydash.widgets import resources
+from octopydash.widgets.button import ButtonBase
+
+class WebcamMosaic(tk.Toplevel):
+    """
+    A fullscreen mosaic of webcam snapshots from many printers.
+
+    Snapshots are polled by a SnapshotScheduler while the mosaic is
+    shown. The window is built once and hidden when closed, use `show`
+    to show it again.
+
+    Methods
+    -------
+    show : show the mosaic and start polling
+    hide : hide the mosaic and stop polling
+    """
+
+    def __init__(self, parent, printers, color='#7788ff', **budget):
+        """
+        A fullscreen mosaic of webcam snapshots.
+
+        The window starts hidden, see `show`.
+
+        Parameters
+        ----------
+        parent : widget
+            the parent widget/window for this window
+        printers : list of Printer
+            the printers to show
+        color : str
+            the color of the printer names, default '#7788ff'
+        budget :
+            extra arguments for the SnapshotScheduler, ie. bytes_per_second
+        """
+        super().__init__(parent, bg='#000000')
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(__name__)
+        self.printers = printers
+        self.color = color
+        self._budget = budget
+        self._scheduler = None
+        self._photos = {}
+        self._images = {}
+        self._after_id = None
+        self._font = resources.font(self, 14)
+        self.canvas = None
+        self.bind('<Map>', self.on_map, '+')
+
+    def show(self):
+        """Show the mosaic and start polling."""
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the mosaic and stop polling."""
+        if self._scheduler is not None: self._scheduler.stop()
+        if self._after_id is not None: self.after_cancel(self._after_id)
+        self._after_id = None
+        self.grab_release()
+        self.withdraw()
+
+    def on_map(self, event):
+        if event.widget is not self: return
+        if self.canvas is None: self._build()
+        self.grab_set()
+        self._scheduler.start()
+        self._after_id = self.after(100, self._poll)
+
+    def _build(self):
+        width = self.winfo_width()
+        height = self.winfo_height() - 50
+        cols = max(1, math.ceil(math.sqrt(len(self.printers) * width / max(height, 1))))
+        rows = max(1, math.ceil(len(self.printers) / cols))
+        self._tile_w = width // cols
+        self._tile_h = height // rows
+
+        self.canvas = tk.Canvas(self, width=width, height=height, bg='#000000', bd=0, highlightthickness=0, relief='solid')
+        self.canvas.place(x=0, y=50)
+        for i, p in enumerate(self.printers):
+            x = (i % cols) * self._tile_w
+            y = (i // cols) * self._tile_h
+            self._images[i] = self.canvas.create_image(x + self._tile_w / 2, y + self._tile_h / 2, anchor='center')
+            self.canvas.create_text(x + 6, y + 4, anchor='nw', text=p.name, fill=self.color, font=self._font)
+
+        self.close_btn = ButtonBase(self, "EXIT", color=self.color, font_scale=1.0)
+        self.close_btn.bind("<<ButtonClick>>", lambda e: self.hide())
+        self.close_btn.place(x=width-10, y=0, anchor='ne')
+
+        self._scheduler = SnapshotScheduler(self.printers, self._tile_w - 4, self._tile_h - 4, **self._budget)
+
+    def _poll(self):
+        while True:
+            try: (i, img) = self._scheduler.results.get_nowait()
+            except queue.Empty: break
+            photo = self._photos.get(i)
+            if photo is not None and (photo.width(), photo.height()) == img.size:
+                photo.paste(img)
+            else:
+                self._photos[i] = ImageTk.PhotoImage(img)
+                self.canvas.itemconfig(self._images[i], image=self._photos[i])
+        self._after_id = self.after(100, self._poll)
@@ -0,0 +1,206 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import math
+import threading
+import tkinter as tk
+
+from octopydash.widgets import resources
+from octopydash.widgets.button import ButtonBase
+
+class OverviewGrid(tk.Toplevel):
+    """
+    A fullscreen overview of many printers, one tile each.
+
+    Every tile is a handful of items on one shared canvas (PSU/online
+    bar, name, state and a progress bar), so a large farm costs a few
+    canvas items per printer rather than a tree of widgets. State
+    changes only mark the fields of a tile as dirty. They are drawn once
+    per tick, and only the items those fields affect are changed, and
+    only if what they show actually differs.
+
+    Tapping a tile hides the overview and calls `on_select` with the
+    printer. The window is built once and hidden when closed, use
+    `show` to show it again. While hidden, the tiles aren't updated.
+
+    Methods
+    -------
+    show : show the overview
+    hide : hide the overview
+    """
+
+    FIELDS = ('state.text', 'flags', 'progress', 'psu', 'online', 'stale')
+
+    def __init__(self, parent, printers, on_select=None, color='#7788ff', tick=100):
+        """
+        A fullscreen overview of many printers.
+
+        The window starts hidden, see `show`.
+
+        Parameters
+        ----------
+        parent : widget
+            the parent widget/window for this window
+        printers : list of Printer
+            the printers to show
+        on_select : function
+            called as on_select(printer) when a tile is tapped, default None
+        color : str
+            the color of the printer names, default '#7788ff'
+        tick : int
+            milliseconds between redraws of changed tiles, default 100
+        """
+        super().__init__(parent, bg='#000000')
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(__name__)
+        self.printers = printers
+        self.on_select = on_select
+        self.color = color
+        self.tick = tick
+        self.canvas = None
+        self._subs = []
+        self._tiles = []
+        # tile index -> fields changed since the last redraw
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._after_id = None
+        self.bind('<Map>', self.on_map, '+')
+
+    def show(self):
+        """Show the overview."""
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the overview."""
+        for sub in self._subs: sub.pause()
+        if self._after_id is not None: self.after_cancel(self._after_id)
+        self._after_id = None
+        self.grab_release()
+        self.withdraw()
+
+    def on_map(self, event):
+        if event.widget is not self: return
+        if self.canvas is None: self._build()
+        self.grab_set()
+        # changes made while hidden are marked dirty now, in one go
+        for sub in self._subs: sub.resume()
+        self._redraw()
+
+    def _build(self):
+        width = self.winfo_width()
+        height = self.winfo_height() - 50
+        cols = max(1, math.ceil(math.sqrt(len(self.printers) * width / max(height, 1) / 2.5)))
+        rows = max(1, math.ceil(len(self.printers) / cols))
+        self._cols = cols
+        self._tile_w = width // cols
+        self._tile_h = height // rows
+        tw = self._tile_w
+        th = self._tile_h
+
+        self.canvas = tk.Canvas(self, width=width, height=height, bg='#000000', bd=0, highlightthickness=0, relief='solid')
+        self.canvas.place(x=0, y=50)
+        self.canvas.bind('<ButtonRelease-1>', self.on_tap)
+
+        self.title_lbl = tk.Label(self, text='Overview', bg='#000000', fg=self.color, font=resources.font(self, 22))
+        self.title_lbl.place(x=10, y=0, height=40)
+
+        self.close_btn = ButtonBase(self, "EXIT", color=self.color, font_scale=1.0)
+        self.close_btn.bind("<<ButtonClick>>", lambda e: self.hide())
+        self.close_btn.place(x=width-10, y=0, anchor='ne')
+
+        font_name = resources.font(self, min(20, max(8, th * 0.18)))
+        font_state = resources.font(self, min(16, max(7, th * 0.14)))
+        bar_h = max(4, th // 8)
+        for i, p in enumerate(self.printers):
+            x = (i % cols) * tw
+            y = (i // cols) * th
+            tile = {
+                'bar': self.canvas.create_rectangle(x + 4, y + 4, x + 16, y + th - 4, fill='#666688', outline=''),
+                'name': self.canvas.create_text(x + 24, y + 4, anchor='nw', text=p.name, fill=self.color, font=font_name),
+                'state': self.canvas.create_text(x + 24, y + th / 2, anchor='w', text='Unknown', fill='#ffcc66', font=font_state),
+                'track': self.canvas.create_rectangle(x + 24, y + th - 6 - bar_h, x + tw - 10, y + th - 6, fill='', outline='#333344'),
+                'fill': self.canvas.create_rectangle(x + 24, y + th - 6 - bar_h, x + 24, y + th - 6, fill='#33cc99', outline=''),
+                'pct': self.canvas.create_text(x + tw - 10, y + th / 2, anchor='e', text='', fill='#ffcc66', font=font_state),
+                # the bar spans x0..x1, the rest is the last shown values
+                'x0': x + 24,
+                'x1': x + tw - 10,
+                'y0': y + th - 6 - bar_h,
+                'y1': y + th - 6,
+                'shown': {},
+            }
+            self._tiles.append(tile)
+            sub = p.state.subscribe(self.FIELDS, lambda state, changed, i=i: self._mark(i, changed), initial=True).bind_to(self)
+            self._subs.append(sub)
+
+    def _mark(self, i, changed):
+        with self._lock:
+            dirty = self._dirty.get(i)
+            if dirty is None: self._dirty[i] = set(changed)
+            else: dirty |= changed
+
+    def _redraw(self):
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = {}
+        for i, changed in dirty.items(): self._draw(i, changed)
+        self._after_id = self.after(self.tick, self._redraw)
+
+    def _set(self, tile, item, **kw):
+        # only talk to Tk when the item would actually change
+        key = (item, tuple(kw))
+        value = tuple(kw.values())
+        if tile['shown'].get(key) == value: return
+        tile['shown'][key] = value
+        self.canvas.itemconfig(tile[item], **kw)
+
+    def _draw(self, i, changed):
+        tile = self._tiles[i]
+        state = self.printers[i].state
+        online = state.online
+
+        if 'psu' in changed or 'online' in changed:
+            if not online or state.psu_on is None: color = '#666688' if online else '#555555'
+            else: color = '#33cc99' if state.psu_on else '#dd4444'
+            self._set(tile, 'bar', fill=color)
+
+        if 'state.text' in changed or 'online' in changed or 'stale' in changed:
+            if not online: self._set(tile, 'state', text='Unreachable', fill='#555555')
+            elif state.stale: self._set(tile, 'state', text=f'{state.state_text} (stale)', fill='#555555')
+            else: self._set(tile, 'state', text=state.state_text, fill='#ffcc66')
+
+        if 'progress' in changed or 'flags' in changed:
+            flags = state.flags
+            completion = (state.progress or {}).get('completion')
+            if completion is None or not (flags.get('printing') or flags.get('paused')): completion = None
+            if completion is None:
+                self._set(tile, 'pct', text='')
+                x = tile['x0']
+            else:
+                self._set(tile, 'pct', text=f'{completion:.0f}%')
+                x = tile['x0'] + int((tile['x1'] - tile['x0']) * min(completion, 100) / 100)
+            if tile['shown'].get('fill_x') != x:
+                tile['shown']['fill_x'] = x
+                self.canvas.coords(tile['fill'], tile['x0'], tile['y0'], x, tile['y1'])
+            self._set(tile, 'fill', fill='#ff7700' if flags.get('paused') else '#33cc99')
+
+    def on_tap(self, event):
+        i = (event.y // self._tile_h) * self._cols + event.x // self._tile_w
+        if i >= len(self.printers) or event.x >= self._tile_w * self._cols: return
+        self.hide()
+        if self.on_select is not None: self.on_select(self.printers[i])
@@ -49,24 +49,29 @@ class PSUControlPower(ButtonBase):
         self._color_off = '#dd4444'
         self._color_on = '#33cc99'
       
-        self.printer.socket.add_callback('plugin', self.on_socket_plugin)
+        self._sub = self.printer.state.subscribe(('psu', 'online', 'stale'), self.on_state, initial=True).bind_to(self)
 
-    def on_socket_plugin(self, data):
-        if data['plugin'] == 'psucontrol':
-            self._is_on = data['data']['isPSUOn']
-            if self._is_on: 
-                self.canvas.itemconfig(self._rect, fill=self._color_on, outline=self._color_on)
-            else:
-                self.canvas.itemconfig(self._rect, fill=self._color_off, outline=self._color_off)
+    def suspend(self):
+        """Stop updating, ie. while not shown. See `resume`."""
+        self._sub.pause()
+
+    def resume(self):
+        """Catch up with changes made while suspended and update again."""
+        self._sub.resume()
+
+    def on_state(self, state, changed):
+        self._is_on = bool(state.psu_on)
+        if not state.online or state.stale or state.psu_on is None: self.set_color(self._color_unk)
+        else: self.set_color(self._color_on if self._is_on else self._color_off)
         
     def on_click(self, event):
+        if not self.printer.state.online or self.printer.state.stale: return
         if self._is_on:
-            def turnoff(event):
+            def turnoff():
                 self.printer.client.psucontrol_turn_off()
                 self._log.info("%s: On -> Off", self.printer.name)
             
-            c = ConfirmAction(None, f'TURN OFF {self.printer.name}?', f'Turn off printer:\n{self.printer.name}?\nThis will terminate any active jobs.', '#dd4444')
-            c.bind("<<Confirm>>", turnoff)
+            ConfirmAction.get(self).show(f'TURN OFF {self.printer.name}?', f'Turn off printer:\n{self.printer.name}?\nThis will terminate any active jobs.', '#dd4444', turnoff)
                 
         else:
             t = threading.Thread(target=self.printer.client.psucontrol_turn_on)
@@ -0,0 +1,102 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import tkinter as tk
+
+from octopydash.widgets.current_job import CurrentJob
+from octopydash.widgets.frame import Frame
+from octopydash.widgets.power import PSUControlPower
+from octopydash.widgets.printer_status import PrinterStatus
+
+class PrinterPanel(tk.Frame):
+    """
+    Everything shown for one printer: its frame, status, power button
+    and current job.
+
+    A suspended panel does no Tk work at all. The printer state is still
+    kept up to date, and the panel catches up with it in one update when
+    it is resumed.
+
+    Methods
+    -------
+    suspend : stop updating, ie. while not shown
+    resume : catch up with the printer state and update again
+    """
+
+    def __init__(self, parent, printer, width, height, side_loc='right', color='#88ccff', last_state=None):
+        """
+        Everything shown for one printer.
+
+        Parameters
+        ----------
+        parent : widget
+            the widget this panel will be contained in
+        printer : Printer
+            the printer shown
+        width : int
+
+        height : int
+
+        side_loc : str
+            the location of the closed side of the frame, 'left' or
+            'right'. default 'right'
+        color : str
+            the color of the frame and status, default '#88ccff'
+        last_state : LastStateStore
+            where the job thumbnail is kept between runs, default None
+        """
+        super().__init__(parent, bg='#000000', width=width, height=height)
+        self.printer = printer
+        self.suspended = False
+        self._log = logging.getLogger(f'{__name__} - {printer.name}')
+        right = side_loc == 'right'
+
+        self.frame = Frame(self, width-2, height, side_loc, color=color)
+        self.frame.place(x=0 if right else 2, y=0)
+
+        self.status = PrinterStatus(self, printer, 40, color=color)
+        if right: self.status.place(x=20, y=0)
+        else: self.status.place(x=width-20, y=0, anchor='ne')
+
+        # other buttons can be added to this
+        self.buttons = tk.Frame(self, bg='#000000')
+        if right: self.buttons.place(x=20, y=height-80)
+        else: self.buttons.place(x=width-20, y=height-80, anchor='ne')
+
+        self.power = PSUControlPower(self.buttons, printer, 80, 0)
+        self.power.pack(side='left', padx=(2,2))
+
+        # the job is shown and hidden through a box that exists before it
+        self.job_box = tk.Frame(self, bg='#000000')
+        if right: job_place = dict(x=10, y=50)
+        else: job_place = dict(x=width-10, y=50, anchor='ne')
+        self.job = CurrentJob(self.job_box, printer, width-32, height-140, 'left' if right else 'right',
+            show_command=lambda: self.job_box.place(**job_place),
+            hide_command=lambda: self.job_box.place_forget(),
+            last_state=last_state)
+        self.job.pack()
+
+    def suspend(self):
+        """Stop updating, ie. while not shown. See `resume`."""
+        if self.suspended: return
+        self.suspended = True
+        for widget in (self.status, self.power, self.job): widget.suspend()
+
+    def resume(self):
+        """Catch up with the changes made while suspended and update again."""
+        if not self.suspended: return
+        self.suspended = False
+        for widget in (self.status, self.power, self.job): widget.resume()
@@ -15,7 +15,8 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 import tkinter as tk
-from tkinter.font import Font
+
+from octopydash.widgets import resources
 
 class PrinterStatus(tk.Canvas):
     """Current Printer Status Label"""
@@ -39,8 +40,6 @@ class PrinterStatus(tk.Canvas):
         super().__init__(parent)
         self.printer = printer
         self._log = logging.getLogger(f'{__name__} - {printer.name}')
-        self.printer.socket.add_callback('current', self.on_current)
-        self.printer.socket.add_callback('history', self.on_current)
         self._status_text = ''
 
         self['bg'] = '#000000'
@@ -49,10 +48,11 @@ class PrinterStatus(tk.Canvas):
         self['relief'] = 'solid'
         self['height'] = height
         self._color = color
-        self._font = Font(self.master, size=int((height-10) * 0.75))
+        self._color_offline = '#555555'
+        self._font = resources.font(self, (height-10) * 0.75)
         self._name = self.create_text(10, height/2, anchor='w', text=self.printer.name, fill=self._color, font=self._font)
 
-        name_width = self._font.measure(text=self.printer.name)
+        name_width = resources.measure(self._font, self.printer.name)
         sep_center = (10 + name_width + 15, height/2)
 
         self._sep = self.create_oval(sep_center[0]-5, sep_center[1]-5, sep_center[0]+5, sep_center[1]+5, fill=self._color)
@@ -61,14 +61,29 @@ class PrinterStatus(tk.Canvas):
 
         self._status = self.create_text(self._status_x, height/2, anchor='w', text='', fill=self._color, font=self._font)
         self.set_status_text('Unknown')
+        self._sub = self.printer.state.subscribe(('state.text', 'online', 'stale'), self.on_state, initial=True).bind_to(self)
+
+    def suspend(self):
+        """Stop updating, ie. while not shown. See `resume`."""
+        self._sub.pause()
+
+    def resume(self):
+        """Catch up with changes made while suspended and update again."""
+        self._sub.resume()
 
     def set_status_text(self, text):
         if text==self._status_text: return
         self._log.info(f'New Status: {text}')
         self.dchars(self._status, 0, 'end')
         self.insert(self._status, 0, text)
-        self['width'] = self._status_x + self._font.measure(text=text) + 10
+        self['width'] = self._status_x + resources.measure(self._font, text) + 10
         self._status_text = text
 
-    def on_current(self, data):
-        self.set_status_text(data['state']['text'])
\ No newline at end of file
+    def on_state(self, state, changed):
+        if 'online' in changed or 'stale' in changed:
+            color = self._color if state.online and not state.stale else self._color_offline
+            for item in (self._name, self._sep, self._status): self.itemconfig(item, fill=color)
+        if not state.online: self.set_status_text('Unreachable')
+        # restored from the last run, until the printer answers
+        elif state.stale: self.set_status_text(f'{state.state_text} (stale)')
+        else: self.set_status_text(state.state_text)
\ No newline at end of file
@@ -0,0 +1,90 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Shared rendering resources for widgets.
+
+Tk fonts are interned by size and style, text measurements are memoized
+and the LCARS polygon geometry is cached, so creating many widgets of
+the same kind doesn't create many Tk fonts or recompute coordinates.
+
+Functions
+---------
+font : return a shared font
+measure : return the (cached) width of text in a font
+frame_coords : return the polygon for a Frame
+job_bar_coords : return the polygon for the bar around a job thumbnail
+file_item_bar_coords : return the polygon for the right bar of a file item
+"""
+from tkinter.font import Font
+
+# the geometry has no Tk in it, it lives outside of the widgets
+from octopydash.geometry import frame_coords, job_bar_coords, file_item_bar_coords
+
+_fonts = {}
+_measures = {}
+_MAX_MEASURES = 1024
+
+def font(master, size, weight='normal', slant='roman', family=None):
+    """
+    Return a shared font.
+
+    Parameters
+    ----------
+    master : widget
+        any widget, used to find the Tk instance the font belongs to
+    size : int
+        the font size
+    weight : str
+        'normal' or 'bold', default 'normal'
+    slant : str
+        'roman' or 'italic', default 'roman'
+    family : str
+        the font family, ie. 'Courier'. default None, the Tk default
+
+    Returns
+    -------
+    Font
+    """
+    root = master._root()
+    key = (root, int(size), weight, slant, family)
+    f = _fonts.get(key)
+    if f is None:
+        if family is None: f = Font(root, size=int(size), weight=weight, slant=slant)
+        else: f = Font(root, family=family, size=int(size), weight=weight, slant=slant)
+        _fonts[key] = f
+    return f
+
+def measure(f, text):
+    """
+    Return the width of `text` in font `f`, in pixels.
+
+    Parameters
+    ----------
+    f : Font
+        a font, usually from `font`
+    text : str
+
+    Returns
+    -------
+    int
+    """
+    key = (f.name, text)
+    w = _measures.get(key)
+    if w is None:
+        if len(_measures) >= _MAX_MEASURES: _measures.clear()
+        w = f.measure(text=text)
+        _measures[key] = w
+    return w
@@ -0,0 +1,168 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import tkinter as tk
+
+from octopydash.terminal import TerminalBuffer
+from octopydash.widgets import resources
+from octopydash.widgets.frame import Frame
+from octopydash.widgets.button import ButtonBase
+
+class Terminal(tk.Toplevel):
+    """
+    A fullscreen view of a printer's terminal.
+
+    Lines are collected by a TerminalBuffer while the terminal is shown.
+    New lines are added to the view in one batch per tick, and old lines
+    are trimmed in one batch, so a busy printer doesn't cause a redraw
+    per line. The view is only kept in sync while it is shown.
+
+    The window is built once and hidden when closed, use `show` to
+    show it again.
+
+    Methods
+    -------
+    show : show the terminal
+    hide : hide the terminal
+    """
+
+    def __init__(self, parent, printer, color='#7788ff', frame_loc='right', max_lines=2000, tick=250):
+        """
+        A fullscreen view of a printer's terminal.
+
+        The window starts hidden, see `show`.
+
+        Parameters
+        ----------
+        parent : widget
+            the parent widget/window for this window
+        printer : Printer
+            the printer whose terminal is shown
+        color : str
+            the color of the frame, default '#7788ff'
+        frame_loc : str
+            the location of the frame, either 'left' or 'right'. default 'right'
+        max_lines : int
+            the maximum number of lines kept and shown, default 2000
+        tick : int
+            milliseconds between updates of the view, default 250
+        """
+        super().__init__(parent, bg='#000000')
+        self.withdraw()
+        self.wm_attributes('-topmost', True)
+        self.wm_attributes('-fullscreen',True)
+        self._log = logging.getLogger(f'{__name__} - {printer.name}')
+        self.printer = printer
+        self.color = color
+        self.frame_loc = frame_loc
+        self.max_lines = max_lines
+        self.tick = tick
+        self.buffer = TerminalBuffer(printer, max_lines)
+        self.frame = None
+        self._count = 0
+        self._after_id = None
+        self._font_title = resources.font(self, 22)
+        self._font_text = resources.font(self, 11, family='Courier')
+        self.bind('<Map>', self.on_map, '+')
+        self.bind('<Destroy>', self.on_destroy, '+')
+
+    def show(self):
+        """Show the terminal."""
+        self.deiconify()
+        self.lift()
+
+    def hide(self):
+        """Hide the terminal."""
+        self.buffer.stop()
+        if self._after_id is not None: self.after_cancel(self._after_id)
+        self._after_id = None
+        self.grab_release()
+        self.withdraw()
+
+    def on_map(self, event):
+        if event.widget is not self: return
+        if self.frame is None: self._build()
+        self.grab_set()
+        self.buffer.start()
+        # nothing is collected while hidden, the buffer only still holds
+        # the lines from before. new lines follow once subscribed again
+        self._set_lines(self.buffer.lines())
+        self._after_id = self.after(self.tick, self._update)
+
+    def on_destroy(self, event):
+        if event.widget is not self: return
+        self.buffer.close()
+
+    def _build(self):
+        width = self.winfo_width()
+        height = self.winfo_height()
+        self.frame = Frame(self, width, height, self.frame_loc, color=self.color, bottom_width=20, side_width=60)
+        self.frame.pack(fill='both', expand=True)
+
+        self.title_lbl = tk.Label(self, text=f'{self.printer.name}: Terminal', bg='#000000', fg=self.color, font=self._font_title)
+        self.title_lbl.place(x=35 if self.frame_loc=='right' else width-35, y=0, anchor='nw' if self.frame_loc=='right' else 'ne', height=40)
+
+        self.close_btn = ButtonBase(self, "EXIT", color=self.color, font_scale=1.0)
+        self.close_btn.bind("<<ButtonClick>>", lambda e: self.hide())
+        self.close_btn.place(x=width-85, y=0, anchor='ne')
+
+        self.text = tk.Text(self, bg='#000000', fg=self.color, font=self._font_text, bd=0, highlightthickness=0, wrap='none', undo=False)
+        self.text.place(x=20 if self.frame_loc=='right' else 80, y=50, width=width-100, height=height-80)
+        self.text['state'] = 'disabled'
+
+        self.filter_btns = {}
+        for i, name in enumerate(self.buffer.filters):
+            btn = ButtonBase(self, name.upper(), height=60, x_inset=0, y_inset=2, font_scale=0.5, color=self.color, width=60)
+            btn.bind("<<ButtonClick>>", lambda e, n=name: self.on_filter(n))
+            btn.place(x=width if self.frame_loc=='right' else 0, y=60 + i * 60, anchor='ne' if self.frame_loc=='right' else 'nw')
+            self.filter_btns[name] = btn
+        self._update_filter_buttons()
+
+    def _update_filter_buttons(self):
+        for name, btn in self.filter_btns.items():
+            # highlighted while those lines are hidden
+            btn.set_color('#ff7700' if self.buffer.filter_enabled(name) else self.color)
+
+    def on_filter(self, name):
+        self.buffer.set_filter(name, not self.buffer.filter_enabled(name))
+        self._update_filter_buttons()
+
+    def _at_bottom(self):
+        return self.text.yview()[1] >= 0.999
+
+    def _set_lines(self, lines):
+        self.text['state'] = 'normal'
+        self.text.delete('1.0', 'end')
+        if lines: self.text.insert('end', '\n'.join(lines))
+        self.text['state'] = 'disabled'
+        self.text.see('end')
+        self._count = len(lines)
+
+    def _update(self):
+        lines = self.buffer.drain()
+        if lines:
+            follow = self._at_bottom()
+            self.text['state'] = 'normal'
+            self.text.insert('end', ('\n' if self._count else '') + '\n'.join(lines))
+            self._count += len(lines)
+            excess = self._count - self.max_lines
+            if excess > 0:
+                self.text.delete('1.0', f'{excess + 1}.0')
+                self._count -= excess
+            self.text['state'] = 'disabled'
+            # don't yank the view away from someone scrolling back
+            if follow: self.text.see('end')
+        self._after_id = self.after(self.tick, self._update)
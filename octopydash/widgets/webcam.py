@@ -0,0 +1,137 @@
+# OctoPyDash - An OctoPrint Dashboard written in Python
+# Copyright (C) 2022 Taylor Talkington
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import logging
+import threading
+import tkinter as tk
+
+from PIL import ImageTk
+
+from octopydash.thumbnails import decode
+from octopydash.webcam import MjpegStream
+
+class WebcamView(tk.Label):
+    """
+    A live view of a printer's webcam stream.
+
+    Frames are decoded at the display size, one at a time and only
+    the newest one, at no more than `max_fps` frames per second. The
+    same PhotoImage is updated in place for each frame.
+
+    Methods
+    -------
+    start : start showing the stream
+    stop : stop showing the stream
+    """
+
+    def __init__(self, parent, printer, width, height, max_fps=5, url=None):
+        """
+        A live view of a printer's webcam stream.
+
+        Parameters
+        ----------
+        parent : widget
+            the widget this view will be contained in
+        printer : Printer
+            the OctoPrint client and socket
+        width : int
+
+        height : int
+
+        max_fps : float
+            the maximum number of frames shown per second, default 5
+        url : str
+            the stream url, or None to use the url from OctoPrint's settings
+        """
+        super().__init__(parent, bg='#000000')
+        self.printer = printer
+        self.max_fps = max_fps
+        self.url = url
+        self._width = int(width)
+        self._height = int(height)
+        self._log = logging.getLogger(f'{__name__} - {printer.name}')
+        self._stream = None
+        self._running = False
+        self._seq = 0
+        # bumped by every start, a resolve from an earlier start is dropped
+        self._start_seq = 0
+        self._lock = threading.Lock()
+        self._decoding = None
+        self._photo = None
+        self._after_id = None
+        self._decoder = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='webcam-decode')
+
+    def start(self):
+        """Start showing the stream."""
+        with self._lock:
+            if self._running: return
+            self._running = True
+            self._start_seq += 1
+            start_seq = self._start_seq
+        self._seq = 0
+
+        def resolve():
+            (r, url) = (True, self.url)
+            if url is None: (r, url) = self.printer.client.webcam_stream_url()
+            with self._lock:
+                # stopped, or stopped and started again, while resolving
+                if not self._running or start_seq != self._start_seq: return
+                if url is None:
+                    if r: self._log.warning("No webcam stream configured")
+                    else: self._log.warning("Couldn't read the webcam settings")
+                    self._running = False
+                    return
+                self.url = url
+                self._stream = MjpegStream(url)
+                self._stream.start()
+
+        threading.Thread(target=resolve, daemon=True).start()
+        self._after_id = self.after(0, self._tick)
+
+    def stop(self):
+        """Stop showing the stream."""
+        with self._lock:
+            self._running = False
+            stream = self._stream
+            self._stream = None
+        if self._after_id is not None: self.after_cancel(self._after_id)
+        self._after_id = None
+        if stream is not None: stream.stop()
+
+    def _tick(self):
+        self._after_id = None
+        if not self._running: return
+
+        if self._decoding is not None and self._decoding.done():
+            try:
+                self._show(self._decoding.result())
+            except Exception:
+                self._log.exception("Couldn't decode webcam frame")
+            self._decoding = None
+
+        if self._decoding is None and self._stream is not None:
+            (self._seq, data) = self._stream.latest(self._seq)
+            if data is not None:
+                self._decoding = self._decoder.submit(decode, data, self._width, self._height)
+
+        self._after_id = self.after(max(int(1000 / self.max_fps), 10), self._tick)
+
+    def _show(self, img):
+        if self._photo is not None and (self._photo.width(), self._photo.height()) == img.size:
+            self._photo.paste(img)
+        else:
+            self._photo = ImageTk.PhotoImage(img)
+            self['image'] = self._photo